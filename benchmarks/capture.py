@@ -0,0 +1,156 @@
+"""Benchmarks of the log capture pipeline, of reading the recent output of a script, and of
+merging the logs of scripts."""
+
+import os
+import subprocess
+import sys
+import time as _t
+import tracemalloc
+
+from common import launcher, request, summarize
+
+from tray_launcher import log_capture, log_merge
+
+WRITER = """
+import sys
+line = b"x" * 99 + b"\\n"
+block = line * 1024
+for _ in range({blocks}):
+    sys.stdout.buffer.write(block)
+"""
+
+
+# Writes lines, then keeps running so the script can be tailed.
+TAIL_WRITER = WRITER + """
+sys.stdout.buffer.write(b"end\\n")
+sys.stdout.flush()
+import time
+time.sleep(3600)
+"""
+
+
+def capture(environment, args):
+    """Copies the output of a process writing as fast as it can into 16 MB log segments."""
+    blocks = args.capture_mb * (1 << 20) // (100 * 1024)
+    logs = environment.user_home / "logs"
+    logs.mkdir(parents=True)
+
+    process = subprocess.Popen(
+        [sys.executable, "-c", WRITER.format(blocks=blocks)], stdout=subprocess.PIPE
+    )
+    started = _t.perf_counter()
+    pipeline = log_capture.LogCapture(process.stdout, logs / "writer-00_00_00.log", 16 << 20)
+    pipeline.start()
+    process.wait()
+    pipeline.join()
+    elapsed = _t.perf_counter() - started
+    # The compressor has one worker, so this waits for all closed segments to be compressed.
+    log_capture.compressor().submit(lambda: None).result()
+    compressed = _t.perf_counter() - started
+
+    return {
+        "bytes": pipeline.bytes_written,
+        "seconds": elapsed,
+        "mb_per_s": pipeline.bytes_written / (1 << 20) / elapsed,
+        "seconds_until_compressed": compressed,
+    }
+
+
+def tail(environment, args):
+    """Reads the last 200 lines of a running script with a large log, from the memory of the
+    launcher (`launcher tail`) and from the end of its log (`launcher log --lines`).
+    """
+    blocks = max(args.capture_mb // 4, 1) * (1 << 20) // (100 * 1024)
+    writer = environment.home / "writer.py"
+    writer.write_text(TAIL_WRITER.format(blocks=blocks))
+    command = '"{}" "{}"'.format(sys.executable, writer)
+    script = environment.scripts / "writer.bat"
+    script.write_text(command if os.name == "nt" else "#!/bin/sh\nexec " + command + "\n")
+    script.chmod(0o755)
+
+    results = {}
+    with launcher(environment):
+        request("start", ["writer"])
+        deadline = _t.monotonic() + 60
+        while request("tail", ["1", "writer"])[1] != ["end"]:
+            if _t.monotonic() > deadline:
+                raise RuntimeError("the writer did not finish")
+            _t.sleep(0.1)
+
+        for name, command, data in [
+            ("memory", "tail", ["200", "writer"]),
+            ("log", "follow_log", ["200", "0", "writer"]),
+        ]:
+            samples = []
+            for _ in range(args.rounds):
+                elapsed, messages = request(command, data)
+                if len(messages) != 200:
+                    raise RuntimeError("{} returned {} lines".format(command, len(messages)))
+                samples.append(elapsed)
+            results[name] = summarize(samples)
+    results["log_mb"] = blocks * 100 * 1024 / (1 << 20)
+    return results
+
+
+def write_runs(logs, count, size_mb):
+    """Writes the logs of count scripts with interleaved capture times, size_mb in total, in
+    chunks of 64 lines. Returns the times of the first and last chunk, and the number of lines.
+    """
+    day = logs / "2021_06_30"
+    day.mkdir(parents=True)
+    started = _t.mktime((2021, 6, 30, 0, 0, 0, 0, 0, -1))
+    chunks = max(size_mb * (1 << 20) // (count * 64 * 100), 2)
+    for run in range(count):
+        segment = day / "s{}-00_00_00.log".format(run)
+        with open(segment, "wb") as log, open(log_capture.times_path(segment), "wb") as times:
+            for chunk in range(chunks):
+                lines = [b"%-98d\n" % (chunk * 64 + line) for line in range(64)]
+                log.write(b"".join(lines))
+                times.write(
+                    log_capture.TIMES_RECORD.pack(log.tell(), started + chunk + run / count)
+                )
+    return started, started + chunks - 1, count * chunks * 64
+
+
+def _merge(logs, since=None, until=None):
+    worker = log_merge.MergeWorker(logs, [], since, until, False)
+    lines = []
+    worker.found.connect(lambda batch: lines.append(len(batch)))
+    started = _t.perf_counter()
+    worker.run()
+    return _t.perf_counter() - started, sum(lines)
+
+
+def merge(environment, args):
+    """Merges the logs of 4 scripts (capture_mb in total) in the order of their capture times,
+    and a one-second window in the middle of them, as `launcher log --merge` does.
+    """
+    logs = environment.user_home / "logs"
+    first, last, lines = write_runs(logs, 4, args.capture_mb)
+
+    # The merged lines start with a line with the day.
+    elapsed, count = _merge(logs)
+    if count != lines + 1:
+        raise RuntimeError("merged {} of {} lines".format(count - 1, lines))
+
+    middle = (first + last) // 2
+    window_ms = []
+    for _ in range(args.rounds // 10 or 1):
+        window_elapsed, window_count = _merge(logs, middle, middle + 0.99)
+        if window_count != 4 * 64 + 1:
+            raise RuntimeError("merged {} lines in the window".format(window_count))
+        window_ms.append(window_elapsed * 1000)
+
+    tracemalloc.start()
+    _merge(logs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "log_mb": args.capture_mb,
+        "lines": lines,
+        "lines_per_s": lines / elapsed,
+        "mb_per_s": args.capture_mb / elapsed,
+        "window": summarize(window_ms),
+        "peak_traced_mb": peak / (1 << 20),
+    }
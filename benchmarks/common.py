@@ -0,0 +1,171 @@
+"""Helpers shared by the benchmarks: an isolated home directory with stand-in scripts, a
+launcher running in a subprocess, a quiet client, and latency summaries.
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time as _t
+from contextlib import contextmanager
+from pathlib import Path
+
+from tray_launcher import protocol, transport, tray_launcher_client
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+if os.name == "nt":
+    STAND_IN = "@echo off\r\nping -n 3600 127.0.0.1 > nul\r\n"
+else:
+    STAND_IN = "#!/bin/sh\nexec sleep 3600\n"
+
+
+def percentile(sorted_values, q):
+    """Returns the q-th percentile (0 to 100) of sorted values, by the nearest-rank method."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(q / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples_ms):
+    """Returns the count, p50, p99, mean and maximum of latencies in milliseconds."""
+    values = sorted(samples_ms)
+    return {
+        "n": len(values),
+        "p50_ms": percentile(values, 50),
+        "p99_ms": percentile(values, 99),
+        "mean_ms": sum(values) / len(values) if values else None,
+        "max_ms": values[-1] if values else None,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Environment:
+    """A temporary home directory for one benchmark. apply() points this process at it, and
+    env is passed to the launcher subprocess.
+    """
+
+    def __init__(self):
+        self.home = Path(tempfile.mkdtemp(prefix="tray_launcher_bench_"))
+        self.user_home = self.home / ".tray_launcher"
+        self.scripts = self.user_home / "scripts"
+        self.scripts.mkdir(parents=True)
+        self.env = dict(
+            os.environ,
+            HOME=str(self.home),
+            USERPROFILE=str(self.home),
+            TRAY_LAUNCHER_PORT=str(free_port()),
+            TRAY_LAUNCHER_TRANSPORT=os.environ.get("TRAY_LAUNCHER_TRANSPORT", transport.LOCAL),
+            QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+            PYTHONPATH=os.pathsep.join(
+                [str(SRC)] + [p for p in [os.environ.get("PYTHONPATH")] if p]
+            ),
+        )
+        self._saved = None
+
+    def apply(self):
+        self._saved = dict(os.environ)
+        self.use_transport(self.env["TRAY_LAUNCHER_TRANSPORT"])
+        os.environ.update({k: self.env[k] for k in ("HOME", "USERPROFILE", "TRAY_LAUNCHER_PORT")})
+
+    def use_transport(self, name):
+        """Selects the transport of the launchers started afterwards, and of this process."""
+        self.env["TRAY_LAUNCHER_TRANSPORT"] = name
+        os.environ["TRAY_LAUNCHER_TRANSPORT"] = name
+
+    def cleanup(self):
+        if self._saved is not None:
+            os.environ.clear()
+            os.environ.update(self._saved)
+        shutil.rmtree(self.home, ignore_errors=True)
+
+    def write_scripts(self, count, prefix="s"):
+        """Writes stand-in scripts that wait for an hour, and returns their stems."""
+        stems = ["{}{:05d}".format(prefix, i) for i in range(count)]
+        for stem in stems:
+            path = self.scripts / (stem + ".bat")
+            path.write_text(STAND_IN)
+            path.chmod(0o755)
+        return stems
+
+    def spawn_stand_in(self):
+        """Starts a stand-in process outside of the launcher."""
+        if os.name == "nt":
+            arguments = ["ping", "-n", "3600", "127.0.0.1"]
+        else:
+            arguments = ["sleep", "3600"]
+        return subprocess.Popen(arguments, stdout=subprocess.DEVNULL)
+
+
+class QuietClient(tray_launcher_client.TrayLauncherClient):
+    """A client that collects the messages of the response instead of printing them."""
+
+    def __init__(self, command, data, stream=False):
+        super().__init__(command, data, stream)
+        self.messages = []
+
+    def read_from_server(self, received):
+        for frame_type, payload in self.decoder.feed(received):
+            if frame_type == protocol.FRAME_DATA:
+                self.messages.append(payload.decode(protocol.ENCODING))
+
+
+def request(command, data=(), stream=True):
+    """Sends one command to the launcher over a new connection.
+
+    Returns:
+        (float, list of str), the round trip in milliseconds and the messages of the response.
+    """
+    client = QuietClient(command, list(data), stream=stream)
+    started = _t.perf_counter()
+    client.attempt_connect()
+    return (_t.perf_counter() - started) * 1000, client.messages
+
+
+@contextmanager
+def launcher(environment, headless=True, timeout=30.0):
+    """Runs the launcher in a subprocess for the duration of the block. Scripts still running
+    at the end are terminated before the launcher quits.
+    """
+    arguments = [sys.executable, "-m", "tray_launcher.cli"] + (["--headless"] if headless else [])
+    process = subprocess.Popen(
+        arguments,
+        env=environment.env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = _t.monotonic() + timeout
+    while True:
+        try:
+            transport.connect(1).close()
+            break
+        except OSError:
+            if process.poll() is not None or _t.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("the launcher did not start")
+            _t.sleep(0.05)
+    try:
+        yield process
+    finally:
+        request("terminate_all")
+        request("quit")
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def qt_application():
+    """Returns the QApplication of this process, created on the offscreen platform."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
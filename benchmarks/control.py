@@ -0,0 +1,164 @@
+"""Benchmarks of the control plane: client start-up, command round trips and many
+concurrent clients.
+"""
+
+import subprocess
+import sys
+import threading
+import time as _t
+from concurrent.futures import ThreadPoolExecutor
+
+from common import launcher, request, summarize
+
+from tray_launcher import transport
+
+
+def import_time(environment, args):
+    """Cumulative import time of the client (launcher_parser), which every one-shot command
+    pays before sending its request. Fails if it exceeds the budget or imports Qt.
+    """
+    samples = []
+    imports_qt = False
+    for _ in range(args.import_rounds):
+        output = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import tray_launcher.launcher_parser"],
+            env=environment.env,
+            stderr=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).stderr
+        for line in output.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if len(fields) != 3:
+                continue
+            imports_qt = imports_qt or fields[2].startswith("PyQt5")
+            if fields[2] == "tray_launcher.launcher_parser":
+                samples.append(int(fields[1]) / 1000)
+    best = min(samples)
+    return {
+        "cumulative_ms": best,
+        "samples": summarize(samples),
+        "imports_qt": imports_qt,
+        "budget_ms": args.import_budget_ms,
+        "passed": best <= args.import_budget_ms and not imports_qt,
+    }
+
+
+def round_trip(environment, args):
+    """Latency of single commands, each over a new connection, and of a whole `launcher`
+    process sending one command.
+    """
+    with launcher(environment):
+        return round_trip_samples(environment, args, ["test", "list_current", "status"])
+
+
+def round_trip_samples(environment, args, commands):
+    results = {}
+    for command in commands:
+        samples = [request(command)[0] for _ in range(args.rounds)]
+        results[command] = summarize(samples)
+
+    samples = []
+    for _ in range(args.cli_rounds):
+        started = _t.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "tray_launcher.launcher_parser", "list", "-r"],
+            env=environment.env,
+            stdout=subprocess.DEVNULL,
+        )
+        samples.append((_t.perf_counter() - started) * 1000)
+    results["cli_process"] = summarize(samples)
+    return results
+
+
+def transports(environment, args):
+    """Latency of single commands, and of a whole `launcher` process, over the local socket
+    and over TCP.
+    """
+    results = {}
+    for name in (transport.TCP, transport.LOCAL):
+        environment.use_transport(name)
+        with launcher(environment):
+            results[name] = round_trip_samples(environment, args, ["test", "list_current"])
+    for command in ("test", "list_current", "cli_process"):
+        results[command + "_p50_speedup"] = (
+            results[transport.TCP][command]["p50_ms"] / results[transport.LOCAL][command]["p50_ms"]
+        )
+    return results
+
+
+def load(environment, args):
+    """Many clients sending commands at the same time. All clients start together and each
+    sends its requests back to back.
+    """
+    barrier = threading.Barrier(args.clients)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        barrier.wait()
+        for _ in range(args.requests):
+            elapsed, messages = request("list_current")
+            with lock:
+                if messages:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(elapsed)
+
+    with launcher(environment):
+        request("start", environment.write_scripts(args.load_scripts))
+        started = _t.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            for future in [pool.submit(client) for _ in range(args.clients)]:
+                future.result()
+        elapsed = _t.perf_counter() - started
+
+    result = summarize(latencies)
+    result.update(
+        {
+            "clients": args.clients,
+            "requests_per_client": args.requests,
+            "errors": len(errors),
+            "throughput_per_s": len(latencies) / elapsed,
+        }
+    )
+    return result
+
+
+def metrics_overhead(environment, args):
+    """Cost of recording a counter and a histogram observation, and of rendering all metrics
+    in the Prometheus text format.
+    """
+    from tray_launcher import metrics
+
+    counter = metrics.Counter("benchmark_total", "")
+    histogram = metrics.Histogram("benchmark_seconds", "", ("command",))
+    rounds = args.rounds * 1000
+
+    started = _t.perf_counter()
+    for _ in range(rounds):
+        counter.inc()
+    inc_ns = (_t.perf_counter() - started) * 1e9 / rounds
+
+    child = histogram.labels("test")
+    started = _t.perf_counter()
+    for _ in range(rounds):
+        child.observe(0.003)
+    observe_ns = (_t.perf_counter() - started) * 1e9 / rounds
+
+    started = _t.perf_counter()
+    for _ in range(rounds):
+        histogram.labels("test").observe(0.003)
+    labelled_ns = (_t.perf_counter() - started) * 1e9 / rounds
+
+    with launcher(environment):
+        request("start", environment.write_scripts(args.load_scripts))
+        samples = [request("metrics", ["prometheus"])[0] for _ in range(args.rounds // 10 or 1)]
+
+    return {
+        "inc_ns": inc_ns,
+        "observe_ns": observe_ns,
+        "labelled_observe_ns": labelled_ns,
+        "exposition": summarize(samples),
+    }
@@ -0,0 +1,96 @@
+"""Benchmarks of the process lifecycle: starting and terminating scripts through the launcher,
+reattaching scripts from the journal, and the full check of running scripts.
+"""
+
+import json
+import time as _t
+
+import psutil
+from common import launcher, qt_application, request, summarize
+
+
+def start_terminate(environment, args):
+    """Starts N stand-in scripts with one command, then terminates them all with another."""
+    stems = environment.write_scripts(args.scripts)
+    start_ms, terminate_ms = [], []
+    with launcher(environment):
+        for _ in range(args.cycles):
+            elapsed, messages = request("start", stems)
+            started = sum(1 for message in messages if message.startswith("SUCCESS"))
+            if started != len(stems):
+                raise RuntimeError("only {} of {} scripts started".format(started, len(stems)))
+            start_ms.append(elapsed)
+
+            elapsed, messages = request("terminate_all")
+            terminated = sum(1 for message in messages if message.startswith("SUCCESS"))
+            if terminated != len(stems):
+                raise RuntimeError(
+                    "only {} of {} scripts terminated".format(terminated, len(stems))
+                )
+            terminate_ms.append(elapsed)
+
+    return {
+        "scripts": len(stems),
+        "start": summarize(start_ms),
+        "terminate": summarize(terminate_ms),
+        "starts_per_s": len(stems) / (min(start_ms) / 1000),
+        "terminations_per_s": len(stems) / (min(terminate_ms) / 1000),
+    }
+
+
+def reattach(environment, args):
+    """Reattaches scripts recorded in a synthetic journal, half of which are still running,
+    with the tray menu connected. Also times check_active_processes() on the result.
+    """
+    app = qt_application()
+    from tray_launcher import gui, launcher_core
+
+    stems = environment.write_scripts(args.reattach)
+    processes = [environment.spawn_stand_in() for _ in stems]
+    track = environment.user_home / "track"
+    track.mkdir(parents=True)
+    try:
+        with open(track / "journal.jsonl", "w") as f:
+            for index, (stem, process) in enumerate(zip(stems, processes)):
+                # Stand-ins started within one clock tick share a creation time, so the keys are
+                # made unique the way the script manager does.
+                create_time = psutil.Process(process.pid).create_time()
+                key = create_time + index * 1e-6
+                entry = {"pid": process.pid, "create_time": create_time, "key": key}
+                f.write(json.dumps(dict(entry, event="start", stem=stem, log=None)) + "\n")
+            for index, stem in enumerate(stems):
+                entry = {"pid": 0x3FFFFFFF - index, "create_time": 1.0 + index, "key": 1.0 + index}
+                f.write(json.dumps(dict(entry, event="start", stem=stem + "x", log=None)) + "\n")
+
+        core = launcher_core.LauncherCore()
+        tray = gui.TrayLauncherGUI(core)
+        started = _t.perf_counter()
+        core.check_leftover()
+        reattach_ms = (_t.perf_counter() - started) * 1000
+        app.processEvents()
+        if len(core.running_scripts) != len(stems):
+            raise RuntimeError(
+                "reattached {} of {} scripts".format(len(core.running_scripts), len(stems))
+            )
+
+        check_ms = []
+        for _ in range(args.rounds // 10 or 1):
+            started = _t.perf_counter()
+            core.check_active_processes()
+            check_ms.append((_t.perf_counter() - started) * 1000)
+
+        core.journal.close()
+        tray.deleteLater()
+        core.deleteLater()
+        app.processEvents()
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
+
+    return {
+        "entries": 2 * len(stems),
+        "running": len(stems),
+        "reattach_ms": reattach_ms,
+        "check_active_processes": summarize(check_ms),
+    }
@@ -0,0 +1,192 @@
+"""Runs the benchmarks of the tray launcher and stores the results as JSON.
+
+The benchmarks run on Linux (and Windows) with stand-in scripts that wait, and Qt's offscreen
+platform for the tray menu. Each benchmark gets its own temporary home directory, so the
+launcher under test never touches ~/.tray_launcher.
+
+    python benchmarks/run.py                      # all benchmarks
+    python benchmarks/run.py load round_trip      # selected benchmarks
+    python benchmarks/run.py --quick              # smaller sizes, e.g. for CI
+    python benchmarks/run.py --compare a.json b.json
+
+Results are written to benchmarks/results/<time>-<commit>.json. The exit code is 1 if a
+benchmark failed or a budget (the import time of the client) was exceeded.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import traceback
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+
+import capture  # noqa: E402
+import control  # noqa: E402
+import lifecycle  # noqa: E402
+import tray  # noqa: E402
+import viewer  # noqa: E402
+from common import Environment  # noqa: E402
+
+BENCHMARKS = {
+    "import_time": control.import_time,
+    "round_trip": control.round_trip,
+    "transports": control.transports,
+    "load": control.load,
+    "metrics": control.metrics_overhead,
+    "start_terminate": lifecycle.start_terminate,
+    "reattach": lifecycle.reattach,
+    "catalog": tray.catalog,
+    "menu": tray.menu,
+    "capture": capture.capture,
+    "tail": capture.tail,
+    "merge": capture.merge,
+    "viewer": viewer.log_viewer,
+}
+
+QUICK = {
+    "rounds": 50,
+    "cli_rounds": 3,
+    "clients": 20,
+    "requests": 5,
+    "load_scripts": 5,
+    "scripts": 10,
+    "cycles": 2,
+    "reattach": 50,
+    "catalog": 500,
+    "menu_rounds": 10,
+    "capture_mb": 32,
+    "viewer_mb": 64,
+}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks of the tray launcher")
+    parser.add_argument(
+        "benchmarks", nargs="*", metavar="benchmark", help=", ".join(BENCHMARKS) + " (default: all)"
+    )
+    parser.add_argument("--quick", action="store_true", help="Use small sizes")
+    parser.add_argument("--output", type=Path, default=HERE / "results", help="Directory")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar="JSON", help="Compare results")
+    parser.add_argument("--rounds", type=int, default=200, help="Requests per latency sample")
+    parser.add_argument("--cli-rounds", type=int, default=10, help="`launcher` processes")
+    parser.add_argument("--clients", type=int, default=100, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--load-scripts", type=int, default=20, help="Scripts during load")
+    parser.add_argument("--scripts", type=int, default=50, help="Scripts started at once")
+    parser.add_argument("--cycles", type=int, default=3, help="Start/terminate cycles")
+    parser.add_argument("--reattach", type=int, default=300, help="Scripts to reattach")
+    parser.add_argument("--catalog", type=int, default=5000, help="Loaded scripts")
+    parser.add_argument("--menu-rounds", type=int, default=30, help="Menu openings")
+    parser.add_argument("--capture-mb", type=int, default=256, help="Output to capture")
+    parser.add_argument("--viewer-mb", type=int, default=1024, help="Log opened in the viewer")
+    parser.add_argument("--import-rounds", type=int, default=5, help="Import time samples")
+    parser.add_argument(
+        "--import-budget-ms", type=float, default=50.0, help="Budget of the client import time"
+    )
+    return parser
+
+
+def run(args):
+    results = {}
+    failed = False
+    for name in args.benchmarks or list(BENCHMARKS):
+        environment = Environment()
+        environment.apply()
+        print("{} ...".format(name), flush=True)
+        try:
+            results[name] = BENCHMARKS[name](environment, args)
+        except Exception:
+            traceback.print_exc()
+            results[name] = {"error": traceback.format_exc(limit=1).strip()}
+            failed = True
+        finally:
+            environment.cleanup()
+        print(json.dumps(results[name], indent=2))
+        failed = failed or results[name].get("passed") is False
+    return results, failed
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=str(HERE),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def flatten(values, prefix=""):
+    """Returns the numbers in nested results, keyed by their dotted paths."""
+    numbers = {}
+    for key, value in values.items():
+        if isinstance(value, dict):
+            numbers.update(flatten(value, prefix + key + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            numbers[prefix + key] = value
+    return numbers
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = flatten(json.load(f)["results"])
+    with open(new_path) as f:
+        new = flatten(json.load(f)["results"])
+    print(
+        "{:<56}{:>14}{:>14}{:>9}".format("metric", old_path.stem[-8:], new_path.stem[-8:], "ratio")
+    )
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key] / old[key] if old[key] else float("nan")
+        print("{:<56}{:>14.3f}{:>14.3f}{:>9.2f}".format(key, old[key], new[key], ratio))
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - BENCHMARKS.keys()
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(", ".join(sorted(unknown))))
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.quick:
+        for key, value in QUICK.items():
+            if getattr(args, key) == parser.get_default(key):
+                setattr(args, key, value)
+
+    started = datetime.datetime.now()
+    results, failed = run(args)
+    revision = commit()
+    args.output.mkdir(parents=True, exist_ok=True)
+    path = args.output / "{}-{}.json".format(started.strftime("%Y%m%d-%H%M%S"), revision or "local")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "commit": revision,
+                "time": started.isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "parameters": {
+                    key: value
+                    for key, value in vars(args).items()
+                    if key not in ("benchmarks", "output", "compare")
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print("Results written to {}.".format(path))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
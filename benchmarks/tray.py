@@ -0,0 +1,83 @@
+"""Benchmarks of the script catalog and the tray menu, on Qt's offscreen platform."""
+
+import time as _t
+
+from common import qt_application, summarize
+
+
+def catalog(environment, args):
+    """Scans, revalidates and looks up a catalog of many loaded scripts."""
+    qt_application()
+    from tray_launcher import script_catalog
+
+    stems = environment.write_scripts(args.catalog)
+
+    started = _t.perf_counter()
+    scripts = script_catalog.ScriptCatalog(environment.scripts)
+    scan_ms = (_t.perf_counter() - started) * 1000
+
+    revalidate_ms = []
+    for _ in range(args.rounds):
+        started = _t.perf_counter()
+        scripts.revalidate()
+        revalidate_ms.append((_t.perf_counter() - started) * 1000)
+
+    started = _t.perf_counter()
+    found = sum(1 for stem in stems if stem in scripts)
+    lookup_us = (_t.perf_counter() - started) * 1e6 / len(stems)
+    scripts.deleteLater()
+
+    return {
+        "scripts": found,
+        "scan_ms": scan_ms,
+        "revalidate": summarize(revalidate_ms),
+        "lookup_us": lookup_us,
+    }
+
+
+def menu(environment, args):
+    """Builds the tray menu for a large catalog, opens it repeatedly, and adds and removes
+    the submenus of many running scripts.
+    """
+    app = qt_application()
+    from tray_launcher import gui, launcher_core
+
+    environment.write_scripts(args.catalog)
+
+    core = launcher_core.LauncherCore()
+    started = _t.perf_counter()
+    tray = gui.TrayLauncherGUI(core)
+    build_ms = (_t.perf_counter() - started) * 1000
+
+    open_ms = []
+    for _ in range(args.menu_rounds):
+        started = _t.perf_counter()
+        tray.context_menu.aboutToShow.emit()
+        tray.view_all.popup(tray.view_all.pos())
+        app.processEvents()
+        tray.view_all.hide()
+        open_ms.append((_t.perf_counter() - started) * 1000)
+
+    running = ["running{:05d}".format(i) for i in range(args.reattach)]
+    started = _t.perf_counter()
+    for index, stem in enumerate(running):
+        core.script_started.emit(stem, float(index))
+    add_ms = (_t.perf_counter() - started) * 1000
+    started = _t.perf_counter()
+    for index, stem in enumerate(running):
+        core.script_stopped.emit(stem, float(index))
+    remove_ms = (_t.perf_counter() - started) * 1000
+
+    core.journal.close()
+    tray.deleteLater()
+    core.deleteLater()
+    app.processEvents()
+
+    return {
+        "scripts": args.catalog,
+        "build_ms": build_ms,
+        "open": summarize(open_ms),
+        "process_menus": len(running),
+        "add_process_menus_ms": add_ms,
+        "remove_process_menus_ms": remove_ms,
+    }
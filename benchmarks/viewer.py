@@ -0,0 +1,99 @@
+"""Benchmarks of the log viewer, on Qt's offscreen platform."""
+
+import random
+import time as _t
+
+from common import qt_application, summarize
+
+LINES_PER_SECOND = 1000
+
+
+def write_log(path, size_mb):
+    """Writes a log of lines starting with increasing timestamps, with one line "NEEDLE" in
+    the middle. Returns the time of the first line.
+    """
+    started = _t.mktime((2021, 6, 30, 0, 0, 0, 0, 0, -1))
+    seconds = size_mb * (1 << 20) // (100 * LINES_PER_SECOND)
+    with open(path, "wb") as f:
+        for second in range(seconds):
+            stamp = _t.strftime("%Y-%m-%d %H:%M:%S", _t.localtime(started + second)).encode()
+            f.write((stamp + b" " + b"x" * 79 + b"\n") * LINES_PER_SECOND)
+            if second == seconds // 2:
+                f.write(b"NEEDLE\n")
+    return started
+
+
+def _wait(app, condition, timeout=120.0):
+    deadline = _t.monotonic() + timeout
+    while not condition():
+        if _t.monotonic() > deadline:
+            raise RuntimeError("the log viewer did not finish in time")
+        app.processEvents()
+        _t.sleep(0.001)
+
+
+def log_viewer(environment, args):
+    """Opens a large log in the log viewer, and measures the time until its last lines are
+    shown, the event loop while the lines are indexed, scrolling, searching and jumping to a
+    time.
+    """
+    app = qt_application()
+    from tray_launcher import log_viewer
+
+    path = environment.home / "large.log"
+    started = write_log(path, args.viewer_mb)
+
+    opened = _t.perf_counter()
+    window = log_viewer.LogViewerWindow(path)
+    window.show()
+    app.processEvents()
+    window.view.viewport().repaint()
+    open_ms = (_t.perf_counter() - opened) * 1000
+
+    event_loop_ms = []
+    while not window.index.complete:
+        iteration = _t.perf_counter()
+        app.processEvents()
+        event_loop_ms.append((_t.perf_counter() - iteration) * 1000)
+        _t.sleep(0.005)
+    index_s = _t.perf_counter() - opened
+
+    paint_ms = []
+    for _ in range(args.rounds):
+        window.view.scroll_to(random.randrange(window.index.first_line, window.index.end_line))
+        painted = _t.perf_counter()
+        window.view.viewport().repaint()
+        paint_ms.append((_t.perf_counter() - painted) * 1000)
+
+    window.view.set_follow(True)
+    window.search_edit.setText("NEEDLE")
+    searched = _t.perf_counter()
+    window.find_previous()
+    _wait(app, lambda: window.locate_worker is None)
+    search_ms = (_t.perf_counter() - searched) * 1000
+    if window.index.lines(window.view.current, 1) != ["NEEDLE"]:
+        raise RuntimeError("the search did not find the line")
+
+    jump_ms = []
+    seconds = args.viewer_mb * (1 << 20) // (100 * LINES_PER_SECOND)
+    for _ in range(args.rounds):
+        target = _t.strftime("%Y-%m-%d %H:%M:%S", _t.localtime(started + random.randrange(seconds)))
+        window.time_edit.setText(target)
+        jumped = _t.perf_counter()
+        window.jump_to_time()
+        _wait(app, lambda: window.locate_worker is None)
+        jump_ms.append((_t.perf_counter() - jumped) * 1000)
+        if not window.index.lines(window.view.current, 1)[0].startswith(target):
+            raise RuntimeError("jumped to the wrong line for {}".format(target))
+
+    window.close()
+    app.processEvents()
+    return {
+        "log_mb": path.stat().st_size / (1 << 20),
+        "open_ms": open_ms,
+        "index_s": index_s,
+        "event_loop_while_indexing": summarize(event_loop_ms),
+        "paint": summarize(paint_ms),
+        "search_ms": search_ms,
+        "jump": summarize(jump_ms),
+    }
@@ -3,7 +3,7 @@ import shutil
 import nox
 
 nox.options.sessions = ("lint",)
-src_paths = ("src", "noxfile.py")
+src_paths = ("src", "benchmarks", "tests", "noxfile.py")
 
 
 @nox.session
@@ -44,6 +44,24 @@ def lint(session: nox.Session) -> None:
         raise nox.command.CommandFailed
 
 
+@nox.session
+def tests(session: nox.Session) -> None:
+    """Run the tests."""
+    # pywin32 is not needed on Linux, so the package is not installed (see bench).
+    session.install("PyQt5", "psutil", "pytest")
+    session.run("pytest", *session.posargs, env={"QT_QPA_PLATFORM": "offscreen"})
+
+
+@nox.session
+def bench(session: nox.Session) -> None:
+    """Run the benchmarks (see benchmarks/run.py for the arguments)."""
+    # pywin32 is not needed (and not available on Linux), so the package is not installed.
+    session.install("PyQt5", "psutil")
+    session.run(
+        "python", "benchmarks/run.py", *session.posargs, env={"QT_QPA_PLATFORM": "offscreen"}
+    )
+
+
 @nox.session
 def build(session: nox.Session) -> None:
     """Build an sdist and a wheel (by default)."""
@@ -1,17 +1,23 @@
 import logging
-import os
-import signal
 import subprocess
 import time as _t
 from pathlib import Path
 
 import psutil as _ps
 
+from tray_launcher import log_capture, metrics, process_inventory
+
+_SPAWN_SECONDS = metrics.histogram(
+    "tray_launcher_spawn_seconds", "Time to start the process of a script and its log capture"
+)
+
 
 class ChildScript:
     ENCODING = "utf-8"
 
-    def __init__(self, pid, create_time, script_path, logging_log):
+    def __init__(
+        self, pid, create_time, script_path, inventory=None, log_path=None, capture_process=None
+    ):
         """Create a ChildScript instance.
 
         This instance is used in reattaching processes when the tray launcher restarts.
@@ -20,27 +26,51 @@ class ChildScript:
             pid: int, process id
             create_time: float, epoch time at the process' beginning
             script_path: Path, path to the script in the .tray_launcher folder
-            logging_log: Path, path to the log of the tray launcher itself
+            inventory: ProcessInventory, shared snapshot of the process table used to find
+                child processes. A private inventory is created if not given.
+            log_path: str, path of the first log file of a reattached process, as recorded when
+                it started. The log is otherwise found from the creation time.
+            capture_process: (int, float), pid and creation time of the capture process of a
+                reattached process, as recorded when it started, or None.
         """
 
-        logging.basicConfig(
-            filename=logging_log,
-            level=logging.INFO,
-            format="%(asctime)s %(message)s",
-        )
-
         self.script_path_str = str(script_path)
         self.script_path = script_path
         self.child_script = None
         self.child_script_PID = pid
         self.current_PIDs = []
         self.create_time = create_time
+        # Key of the script in the tray launcher, unique even if two scripts were created
+        # within the resolution of the process creation time.
+        self.timestamp = create_time
+        self.inventory = (
+            inventory if inventory is not None else process_inventory.ProcessInventory()
+        )
+        self.capture = None
+        # Pid and creation time of the process capturing the output (see
+        # log_capture.CaptureProcess), or None if the script writes to its log itself.
+        self.capture_process = capture_process
+        self.outputs_file = None
+        # Path of the first log segment, from which the latest one is found.
+        self.first_log_path = None
+        # OutputRing receiving the output of a script started by this instance, if any.
+        self.recent_output = None
 
         if self.create_time != -1:
-            self.access_file(_t.localtime(self.create_time))
-
-    def access_file(self, t):
-        """Use the creation time of the process to open its log file."""
+            self.access_file(_t.localtime(self.create_time), open_file=False)
+            if log_path is not None:
+                self.first_log_path = Path(log_path)
+
+    @property
+    def log_path(self):
+        """Path of the log file (segment) the output of the script is currently written to."""
+        if self.capture is not None:
+            return self.capture.path
+        # The capture process of a reattached script may have rotated the log since.
+        return log_capture.latest_segment(self.first_log_path)
+
+    def access_file(self, t, open_file=True):
+        """Use the creation time of the process to find, and optionally open, its log file."""
         log_file = self.get_log_path()
 
         try:
@@ -53,59 +83,82 @@ class ChildScript:
             logging.error(err + ": Failed to create new directory for ChildScript outputs.")
             raise
 
-        self.log_path = log_directory / "{}-{}_{}_{}.log".format(
+        self._log_path = log_directory / "{}-{}_{}_{}.log".format(
             self.script_path.stem,
             str(t.tm_hour).zfill(2),
             str(t.tm_min).zfill(2),
             str(t.tm_sec).zfill(2),
         )
+        self.first_log_path = self._log_path
+
+        if not open_file:
+            return
 
         try:
-            self.outputs_file = open(self.log_path, "a+")
+            self.outputs_file = open(self._log_path, "a+")
         except Exception as err:
             logging.error(err + ": Failed to open a file for ChildScript outputs.")
             raise
 
     def start_script(self):
-        """Uses subprocess.Popen() to start the .bat file."""
-        self.access_file(_t.localtime(_t.time()))
-
-        self.child_script = subprocess.Popen(
-            # TODO: Python >= 3.8: Drop str cast (https://github.com/python/cpython/issues/76142).
-            (self.script_path_str,),
-            encoding=self.ENCODING,
-            stdout=self.outputs_file,
-            stderr=self.outputs_file,
-            creationflags=subprocess.CREATE_NO_WINDOW,
-        )
+        """Uses subprocess.Popen() to start the .bat file.
 
-        self.child_script_PID = self.child_script.pid
+        Unless the capture pipeline is disabled (see log_capture.segment_size()), the output of
+        the script is written to a pipe, which a capture process reads into rotated log segments
+        (see log_capture.CaptureProcess). The capture process keeps logging after the tray
+        launcher quits.
+        """
+        started = _t.perf_counter()
+        max_segment_size = log_capture.segment_size()
+        self.access_file(_t.localtime(_t.time()), open_file=not max_segment_size)
 
-        p = _ps.Process(self.child_script_PID)
-        self.create_time = p.create_time()
+        if max_segment_size:
+            self.capture = log_capture.CaptureProcess(
+                self._log_path, max_segment_size, self.recent_output
+            )
+            output = {"stdout": self.capture.pipe, "stderr": subprocess.STDOUT}
+        else:
+            output = {
+                "encoding": self.ENCODING,
+                "stdout": self.outputs_file,
+                "stderr": self.outputs_file,
+            }
 
-    def terminate_script(self):
-        self.update_current_PIDs()
         try:
-            for pid in self.current_PIDs:
-                subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)])
-        except Exception:
-            logging.error(
-                "Child Script PID: "
-                + str(self.child_script_PID)
-                + ": Error when terminating child processes."
+            self.child_script = subprocess.Popen(
+                # TODO: Python >= 3.8: Drop str cast
+                # (https://github.com/python/cpython/issues/76142).
+                (self.script_path_str,),
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+                **output,
             )
+        finally:
+            if self.capture is not None:
+                self.capture.close_pipe()
+        if self.capture is not None:
+            try:
+                pid = self.capture.process.pid
+                self.capture_process = (pid, _ps.Process(pid).create_time())
+            except _ps.Error:
+                # It already exited with the script.
+                self.capture_process = None
 
-        try:
+        self.child_script_PID = self.child_script.pid
+        self.inventory.invalidate()
+
+        p = _ps.Process(self.child_script_PID)
+        self.create_time = p.create_time()
+        self.timestamp = self.create_time
+        _SPAWN_SECONDS.observe(_t.perf_counter() - started)
+
+    def close_output(self):
+        """Closes the log file handed to the script, if any, and frees its recent output.
+        A capture process closes its segment by itself once the pipe is closed.
+        """
+        if self.outputs_file is not None:
             self.outputs_file.close()
-            os.kill(self.child_script_PID, signal.SIGTERM)
-        except OSError:
-            logging.error(
-                "Child Script PID: "
-                + str(self.child_script_PID)
-                + ": The Popen process is not running."
-            )
-            return
+        if self.recent_output is not None:
+            self.recent_output.release()
 
     def get_log_path(self):
         user_home = Path.home() / ".tray_launcher"
@@ -122,22 +175,16 @@ class ChildScript:
             return True
         return False
 
+    def returncode(self):
+        """Returns the exit code of the script, or None if it is running or was reattached."""
+        if self.child_script is None:
+            return None
+        return self.child_script.poll()
+
     def update_current_PIDs(self):
-        """Populate the self.current_PIDs array with pids of child processes."""
-        self.current_PIDs = []
-        wmic_ = subprocess.run(
-            (
-                "wmic",
-                "process",
-                "where",
-                f"(ParentProcessId={self.child_script_PID})",
-                "get",
-                "ProcessId",
-            ),
-            encoding=self.ENCODING,
-            stdout=subprocess.PIPE,
-            shell=True,
-        )
-        for line in wmic_.stdout.split("\n"):
-            if line != "" and line.split(" ")[0] != "ProcessId":
-                self.current_PIDs.append(int(line))
+        """Populate the self.current_PIDs array with pids of child processes.
+
+        The pids are read from the shared process table snapshot, which is only refreshed
+        once its TTL has expired.
+        """
+        self.current_PIDs = self.inventory.children(self.child_script_PID)
@@ -1,16 +1,36 @@
+import logging
+import time as _t
+from pathlib import Path
+
+import psutil as _ps
 from PyQt5.QtCore import QObject
-from win32con import (
-    HWND_NOTOPMOST,
-    HWND_TOPMOST,
-    SW_RESTORE,
-    SWP_NOMOVE,
-    SWP_NOSIZE,
-    SWP_SHOWWINDOW,
+
+from tray_launcher import (
+    child_script,
+    log_capture,
+    output_buffer,
+    process_inventory,
+    process_terminator,
+    resource_sampler,
 )
-from win32gui import EnumWindows, IsWindowEnabled, IsWindowVisible, SetWindowPos, ShowWindow
-from win32process import GetWindowThreadProcessId
 
-from tray_launcher import child_script
+
+def _output_state(entry):
+    """Describes whether the output of a reattached script is still written to its log."""
+    capture = entry.get("capture")
+    if capture is not None:
+        try:
+            process = _ps.Process(capture[0])
+            running = process.create_time() == capture[1] and process.status() != _ps.STATUS_ZOMBIE
+        except _ps.Error:
+            running = False
+        if running:
+            return "its output is still logged"
+        return "its output is lost since its capture process exited"
+    if entry.get("log") is not None and log_capture.times_path(Path(entry["log"])).exists():
+        # Captured by a thread of a launcher that did not use capture processes.
+        return "its output is lost since it was captured by the previous launcher"
+    return "it writes its output to its log"
 
 
 class ChildScriptManager(QObject):
@@ -18,39 +38,110 @@ class ChildScriptManager(QObject):
         super().__init__()
 
         self.running_child_scripts = {}
-
-    def start_new_script(self, args):
+        self.inventory = process_inventory.ProcessInventory()
+        self.sampler = resource_sampler.ResourceSampler(
+            self.inventory, lambda: self.running_child_scripts, self
+        )
+        self.sampler.start()
+        self.terminator = process_terminator.ProcessTerminator(self.inventory)
+        self.recent_output = output_buffer.OutputPool()
+
+    def start_new_script(self, script_path):
         """Starts a new script by creating a ChildScript object and
             invoking the subprocess.Popen().
 
         Args:
-            args: tuple of Path and Path, the path to the script;
-                the path to the log file for the TRAY LAUNCHER, not this process.
+            script_path: Path, the path to the script.
+
+        Returns:
+            ChildScript, the started script.
         """
-        child = child_script.ChildScript(-1, -1.0, args[0], args[1])
+        child = child_script.ChildScript(-1, -1.0, script_path, self.inventory)
+        child.recent_output = self.recent_output.create()
         child.start_script()
-        self.running_child_scripts[child.create_time] = child
+        while child.timestamp in self.running_child_scripts:
+            child.timestamp += 1e-6
+        self.running_child_scripts[child.timestamp] = child
+        return child
+
+    def reattach(self, entries, script_path_of):
+        """Reattaches scripts that are still running after the tray launcher restarted.
+
+        All entries are matched against one snapshot of the process table, and the process
+        tree of each script is rebuilt from it. A failure only affects its own entry.
 
-    def show(self, args):
+        Args:
+            entries: list of dict, the journal entries of the scripts that were running.
+            script_path_of: callable taking a stem and returning the Path of the script.
+
+        Returns:
+            list of (dict, ChildScript, list of int, str), for every entry: the entry, the
+                reattached ChildScript (None if it was not reattached), the pids of its process
+                tree, and a description of the outcome.
+        """
+        started = _t.perf_counter()
+        snapshot = self.inventory.refresh()
+        snapshot_time = _t.perf_counter() - started
+
+        results = []
+        for entry in entries:
+            pids = snapshot.tree(entry["pid"], entry["create_time"])
+            if not pids:
+                results.append((entry, None, [], "no longer running"))
+                continue
+            try:
+                child = child_script.ChildScript(
+                    entry["pid"],
+                    entry["create_time"],
+                    script_path_of(entry["stem"]),
+                    self.inventory,
+                    entry.get("log"),
+                    None if entry.get("capture") is None else tuple(entry["capture"]),
+                )
+                child.timestamp = entry["key"]
+            except Exception as err:
+                results.append((entry, None, pids, "failed to reattach: {}".format(err)))
+                continue
+            child.current_PIDs = [pid for pid in pids if pid != entry["pid"]]
+            self.running_child_scripts[entry["key"]] = child
+            outcome = "reattached {} process(es), {}".format(len(pids), _output_state(entry))
+            results.append((entry, child, pids, outcome))
+
+        logging.info(
+            "Reattached {} of {} scripts in {:.1f} ms ({:.1f} ms reading processes).".format(
+                sum(1 for result in results if result[1] is not None),
+                len(entries),
+                (_t.perf_counter() - started) * 1000,
+                snapshot_time * 1000,
+            )
+        )
+        return results
+
+    def show(self, timestamp):
         """Brings windows associated with a script to the foreground.
 
         Args:
-            args: ((Path, int), str), the path to the script,
-                the timestamp of the ChildScript.
-                Plus the path to the log file for the tray launcher.
+            timestamp: float, the timestamp of the ChildScript.
         """
-        self.running_child_scripts[args[0][1]].update_current_PIDs()
-        self.bring_to_front(self.running_child_scripts[args[0][1]].current_PIDs)
+        self.running_child_scripts[timestamp].update_current_PIDs()
+        self.bring_to_front(self.running_child_scripts[timestamp].current_PIDs)
 
-    def terminate(self, timestamp):
-        """Terminates the script started at the time specified
-            by the argument timestamp. Plus the path to the log file for the tray launcher.
+    def terminate(self, timestamps):
+        """Starts terminating the scripts started at the given times. Their process trees are
+        collected from one snapshot and terminated in parallel.
 
         Args:
-            args: (int, str), the timestamp of the ChildScript.
+            timestamps: list of float, the timestamps of the ChildScripts.
+
+        Returns:
+            list of Future of TerminationResult, one per script.
         """
-        self.running_child_scripts[timestamp[0]].terminate_script()
-        del self.running_child_scripts[timestamp[0]]
+        children = [self.running_child_scripts.pop(timestamp) for timestamp in timestamps]
+        for child in children:
+            child.close_output()
+        return self.terminator.submit(
+            [(child.child_script_PID, child.create_time) for child in children]
+        )
 
     def get_hwnds_for_PID(self, pid):
         """Get WINDOW handles for windows associated with the given PID.
@@ -58,6 +149,9 @@ class ChildScriptManager(QObject):
         Args:
             pid: int, the PID whose window handles are to be found.
         """
+        # Imported here, so the tray launcher starts without loading pywin32.
+        from win32gui import EnumWindows, IsWindowEnabled, IsWindowVisible
+        from win32process import GetWindowThreadProcessId
 
         def callback(hwnd, hwnds):
             if IsWindowVisible(hwnd) and IsWindowEnabled(hwnd):
@@ -77,6 +171,16 @@ class ChildScriptManager(QObject):
             pids: list of int, PIDs of the processes whose windows are
                 to be brought to the foreground.
         """
+        from win32con import (
+            HWND_NOTOPMOST,
+            HWND_TOPMOST,
+            SW_RESTORE,
+            SWP_NOMOVE,
+            SWP_NOSIZE,
+            SWP_SHOWWINDOW,
+        )
+        from win32gui import SetWindowPos, ShowWindow
+
         for pid in pids:
             for window_handle in self.get_hwnds_for_PID(pid):
                 ShowWindow(window_handle, SW_RESTORE)
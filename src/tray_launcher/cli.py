@@ -1,248 +1,651 @@
+import json
 import logging
-import os
+import re
 import subprocess
 import sys
 import time as _t
 from functools import partial
 from pathlib import Path
 
-from PyQt5.QtCore import QByteArray, QDataStream, QIODevice, QObject
-from PyQt5.QtGui import QIcon
-from PyQt5.QtNetwork import QHostAddress, QTcpServer
-from PyQt5.QtWidgets import QApplication, qApp
-
-from tray_launcher import gui, tray_launcher_client
+from PyQt5.QtCore import QCoreApplication, QObject
+
+from tray_launcher import (
+    control_server,
+    launcher_core,
+    launcher_log,
+    log_follower,
+    log_index,
+    log_merge,
+    metrics,
+    metrics_server,
+    process_terminator,
+    resource_sampler,
+    script_groups,
+    tray_launcher_client,
+)
+
+_COMMAND_SECONDS = metrics.histogram(
+    "tray_launcher_command_seconds",
+    "Time to run a command, until its dispatcher returns",
+    ("command",),
+)
+_COMMAND_ERRORS = metrics.counter(
+    "tray_launcher_command_errors_total", "Commands that reported an error", ("command",)
+)
+_CONNECTIONS = metrics.counter(
+    "tray_launcher_connections_total", "Accepted client connections", ("transport",)
+)
+
+
+def _positive(text):
+    """Returns a number of seconds that must be greater than 0.
+
+    Raises:
+        ValueError: if text is not such a number.
+    """
+    value = float(text)
+    if not 0 < value < float("inf"):
+        raise ValueError(text)
+    return value
+
+
+def _count(text):
+    """Returns a number of lines or matches, which must not be negative.
+
+    Raises:
+        ValueError: if text is not such a number.
+    """
+    value = int(text)
+    if value < 0:
+        raise ValueError(text)
+    return value
+
+
+def _day(text):
+    """Returns a day "YYYY_MM_DD", the first day that grep searches.
+
+    Raises:
+        ValueError: if text is not a day.
+    """
+    if log_index.DAY_NAME.match(text) is None:
+        raise ValueError(text)
+    return text
+
+
+def _flag(text):
+    """Returns True for "1" and False for "0".
+
+    Raises:
+        ValueError: for anything else.
+    """
+    if text not in ["0", "1"]:
+        raise ValueError(text)
+    return text == "1"
+
+
+def _timestamp(text):
+    """Returns a time in seconds since the epoch, 0 for no limit.
+
+    Raises:
+        ValueError: if text is not such a time.
+    """
+    value = float(text)
+    if not 0 <= value < float("inf"):
+        raise ValueError(text)
+    return value
+
+
+def _batch_mode(text):
+    if text not in ["stop", "continue"]:
+        raise ValueError(text)
+    return text
+
+
+def _batch_command(entry):
+    """Returns the command list of a batch entry, or None if it is not a non-empty list of str.
+    An entry that is not JSON is a command without arguments.
+    """
+    try:
+        command = json.loads(entry)
+    except ValueError:
+        command = [entry]
+    if not isinstance(command, list) or not command:
+        return None
+    if not all(isinstance(argument, str) for argument in command):
+        return None
+    return command
 
 
 class TrayLauncherCLI(QObject):
-    def __init__(self):
+    def __init__(self, headless=False):
+        """Create a TrayLauncherCLI instance, which serves the commands of the launcher.
+
+        Args:
+            headless: bool, run without the tray icon. QtWidgets is then never imported, and a
+                QCoreApplication is sufficient.
+        """
         super().__init__()
-        self.message_to_client = []
-
-        self.server = QTcpServer(self)
-        port = int(os.environ.get("TRAY_LAUNCHER_PORT", 7686))
-        address = QHostAddress("127.0.0.1")
-        if not self.server.listen(address, port):
-            logging.warning(
-                "Failed to listen to port: "
-                + str(port)
-                + ". See README.md to switch to an available port."
-            )
+        self.response = None
+
+        self.server = control_server.ControlServer(self)
+        if not self.server.listening:
             return
-        self.server.newConnection.connect(self.connection)
+        self.server.connection_accepted.connect(self.connection)
 
-        self.gui = gui.TrayLauncherGUI()
+        self.core = launcher_core.LauncherCore(self)
+        self.gui = None
+        if not headless:
+            from tray_launcher import gui
 
-    def connection(self):
-        """Processes the list passed from the client, and writes response back."""
-        client_connection = self.server.nextPendingConnection()
+            self.gui = gui.TrayLauncherGUI(self.core)
+        self.core.start()
+        self.log_index = log_index.LogIndex(self.core.LOGS, self.core.INDEX)
 
-        client_connection.waitForReadyRead()
+        self.metrics_server = None
+        port = metrics_server.metrics_port()
+        if port is not None:
+            self.metrics_server = metrics_server.MetricsServer(port, parent=self)
 
-        data = []
-        while not client_connection.atEnd():
-            data.append(str(client_connection.readLine(), encoding="ascii")[0:-1])
+    def connection(self, socket, transport_name):
+        """Accepts a new client. Requests are read without blocking the event loop
+        and handed to dispatch() once complete.
 
+        Args:
+            socket: QTcpSocket or QLocalSocket, the connection of the client.
+            transport_name: str, the transport the client connected over.
+        """
+        _CONNECTIONS.labels(transport_name).inc()
+        client_connection = control_server.ControlConnection(socket, self)
+        client_connection.request_received.connect(self.dispatch)
+
+    def dispatch(self, client_connection, data):
+        """Processes the list passed from the client, and writes response back."""
+        self.response = control_server.Response(client_connection)
+        self.run_command(data)
+        self.response.finish()
+
+    def run_command(self, data):
+        """Runs one command, writing its messages to self.response.
+
+        Args:
+            data: list of str, the command followed by its arguments.
+        """
         dispatchers = {
             "test": self.test,
             "start": self.start,
             "terminate": self.terminate,
+            "terminate_all": self.terminate_all,
             "list": self.list_all,
             "list_current": self.list_current,
             "load": self.load,
             "restart": self.restart,
             "log": self.log,
+            "follow_log": self.follow_log,
+            "tail": self.tail,
             "all_logs": self.all_logs,
+            "grep": self.grep,
+            "merge_log": self.merge_log,
+            "stats": self.stats,
+            "status": self.status,
             "focus": self.focus,
             "quit": self.quit,
+            "batch": self.batch,
+            "metrics": self.metrics,
         }
 
-        try:
-            dispatcher = dispatchers[data[0]]
-            dispatcher(data)
-        except KeyError:
+        started = _t.perf_counter()
+        errors = self.response.errors
+        command = data[0] if data else ""
+        dispatcher = dispatchers.get(command)
+        if dispatcher is None:
             self.process_invalid_command(data)
-
-        self.write_to_client(client_connection)
-        client_connection.disconnected.connect(client_connection.deleteLater)
-        client_connection.disconnectFromHost()
+            command = "invalid"
+        else:
+            try:
+                dispatcher(data)
+            except (IndexError, ValueError, TypeError) as err:
+                # A malformed request must not escape the slot, which would abort the launcher.
+                logging.error("{}: Failed to run {}.".format(err, data))
+                self.response.error("{} has invalid arguments.".format(command))
+        _COMMAND_SECONDS.labels(command).observe(_t.perf_counter() - started)
+        if self.response.errors > errors:
+            _COMMAND_ERRORS.labels(command).inc()
 
     def test(self, data):
         """Processes the "test" command."""
-        self.message_to_client.append(" ")
+        self.response.append(" ")
 
     def start(self, data):
         """Process the "start" command. Start new scripts
-        by sending the scripts' names to the run_new_file() method"""
-        self.gui.check_active_processes()
-
+        by sending the scripts' names to the run_new_file() method.
+        Arguments starting with "@" start a group of scripts, see script_groups."""
         for path_str in data[1:]:
-            file_path = self.gui.to_loaded_path(Path(path_str))
+            if path_str.startswith("@"):
+                self._start_group(path_str[1:])
+                continue
+            file_path = self.core.to_loaded_path(Path(path_str))
             if file_path is not None:
-                if file_path.stem in self.gui.currently_running_scripts:
-                    self.message_to_client.append(
-                        "Cannot run "
-                        + "a script with the same stem as one of the currently running scripts."
+                if file_path.stem in self.core.running_scripts:
+                    self.response.error(
+                        "Cannot run {}: ".format(path_str)
+                        + "a script with the same stem is currently running."
                     )
-                    return
-                if self.gui.run_new_file(file_path):
-                    self.message_to_client.append("SUCCESS: {} is now running.".format(path_str))
+                    continue
+                if self.core.run_new_file(file_path):
+                    self.response.append("SUCCESS: {} is now running.".format(path_str))
                 else:
-                    self.message_to_client.append(
+                    self.response.error(
                         "{} is not valid. Only .bat files are accepted.".format(path_str)
                     )
             else:
-                self.message_to_client.append("{} is not valid.".format(path_str))
+                self.response.error("{} is not valid.".format(path_str))
 
     def terminate(self, data):
-        """Process the "terminate" command. Terminate scripts that are running."""
-        for path_str in data[1:]:
-            self._on_running_script(self.gui.terminate_script, path_str, " is terminated.")
+        """Process the "terminate" command. Terminate scripts that are running, in parallel."""
+        stems = [self._running_script(path_str) for path_str in data[1:]]
+        self._terminate([stem for stem in stems if stem is not None])
+
+    def terminate_all(self, data):
+        """Processes the "terminate --all" command. Terminates all running scripts in parallel."""
+        self._terminate(list(self.core.running_scripts))
 
     def list_all(self, data):
         """Processes the "list -a" command. Writes names of all loaded scripts
-        to the CLI and re-populates the gui view_all menu.
+        to the CLI and brings the script catalog up to date.
         """
-        self.gui.available_scripts.clear()
-        self.gui.view_all.clear()
+        self.core.catalog.revalidate()
 
-        self.gui.check_active_processes()
-
-        for file_path in Path.iterdir(self.gui.AVAILABLE_SCRIPTS):
-            if file_path.is_file() and file_path.suffix == ".bat":
-                st = file_path.stem
-
-                action = self.gui.view_all.addAction(st)
-                action.triggered.connect(partial(self.gui.start_new_script, file_path))
-                self.gui.available_scripts[st] = action
-
-                if st in self.gui.currently_running_scripts:
-                    self.gui.available_scripts[st].setIcon(QIcon(self.gui.check_mark))
-                    self.gui.available_scripts[st].setEnabled(False)
-
-                    self.message_to_client.append(
-                        "{} \t \t \t \t \t \t(currently running)".format(st)
-                    )
-                else:
-                    self.message_to_client.append("{}".format(st))
+        for st in self.core.catalog.stems():
+            if st in self.core.running_scripts:
+                self.response.append("{} \t \t \t \t \t \t(currently running)".format(st))
             else:
-                if file_path.is_file:
-                    file_path.unlink()
+                self.response.append("{}".format(st))
 
     def list_current(self, data):
         """Processes the "list -r" command. Writes currently running scripts' stems to the CLI."""
-        self.gui.check_active_processes()
-
-        for st in self.gui.currently_running_scripts:
-            self.message_to_client.append("{}".format(st))
+        for st in self.core.running_scripts:
+            self.response.append("{}".format(st))
 
     def load(self, data):
         """Processes the "load" command. Loads scripts to the 'scripts' directory"""
         for path_str in data[1:]:
             file_path = Path(path_str)
-            if not (self.gui.load_script(file_path)):
-                self.message_to_client.append(
+            if not (self.core.load_script(file_path)):
+                self.response.error(
                     "{} is not loaded. (Only .bat file is accepted)".format(path_str)
                 )
             else:
-                self.message_to_client.append("SUCCESS: {} is loaded.".format(path_str))
+                self.response.append("SUCCESS: {} is loaded.".format(path_str))
 
     def restart(self, data):
         """Processes the "restart" command. Restarts scripts."""
         for path_str in data[1:]:
-            self._on_running_script(self.gui.restart_script, path_str, " is restarted.")
+            self._on_running_script(self.core.restart_script, path_str, " is restarted.")
 
     def log(self, data):
         """Processes the "log" command. Brings up the log file of the scripts."""
         for path_str in data[1:]:
-            self._on_running_script(self.gui.show_logs, path_str, "")
+            self._on_running_script(self.core.show_current_log, path_str, "")
+
+    def follow_log(self, data):
+        """Processes the "log --lines/--follow" command. Writes the last lines of the scripts'
+        current logs, and with --follow keeps streaming new lines until the client disconnects.
+
+        Args:
+            data: list of str, "follow_log", the number of lines, "1" to follow or "0" not to,
+                then the stems of the scripts.
+        """
+        arguments = self._parse_arguments(data, _count, _flag)
+        if arguments is None:
+            return
+        lines = arguments[0]
+        follow = arguments[1] and self.response.connection.version >= 2
+        stems = [Path(path_str).stem for path_str in data[3:]]
+
+        if follow:
+            log_follower.LogFollower(self.response, stems, self.core.current_log_path, lines, self)
+            return
+
+        for stem in stems:
+            path = self.core.current_log_path(stem)
+            if path is None:
+                self.response.error("{} is not running.".format(stem))
+                continue
+            for line in log_follower.tail_lines(path, lines)[0]:
+                self.response.append("[{}] {}".format(stem, line) if len(stems) > 1 else line)
+
+    def tail(self, data):
+        """Processes the "tail" command. Writes the last lines of output of running scripts,
+        which the tray launcher keeps in memory.
+
+        Args:
+            data: list of str, "tail", the number of lines, then the stems of the scripts.
+        """
+        arguments = self._parse_arguments(data, _count)
+        if arguments is None:
+            return
+        count = arguments[0]
+        stems = [Path(path_str).stem for path_str in data[2:]]
+        for stem in stems:
+            lines = self.core.recent_output(stem, count)
+            if lines is None:
+                self.response.error("{} is not running.".format(stem))
+                continue
+            for line in lines:
+                self.response.append("[{}] {}".format(stem, line) if len(stems) > 1 else line)
+
+    def grep(self, data):
+        """Processes the "grep" command. Searches the logs of all scripts with the log index
+        on a worker thread, streaming matching lines until the search ends.
+
+        Args:
+            data: list of str, "grep", the regular expression, the first day to search
+                ("YYYY_MM_DD"), the maximum number of matches ("0" for no limit), then the
+                stems of the scripts to search (all scripts if none).
+        """
+        arguments = self._parse_arguments(data, str, _day, _count)
+        if arguments is None:
+            return
+        expression, since, max_count = arguments
+        try:
+            pattern = re.compile(expression)
+        except re.error as err:
+            self.response.error("{} is not a valid regular expression: {}.".format(expression, err))
+            return
+
+        worker = log_index.GrepWorker(self.log_index, pattern, data[4:], since, max_count, self)
+        response = self.response
+        response.hold()
+        worker.found.connect(partial(self._append_lines, response))
+        worker.finished.connect(response.release)
+        worker.finished.connect(worker.deleteLater)
+        response.connection.closed.connect(worker.stop)
+        worker.start()
+
+    def merge_log(self, data):
+        """Processes the "log --merge" command. Streams the lines of the logs of scripts in the
+        order they were captured, merged on a worker thread, until the logs end or, with
+        --follow, until the client disconnects.
+
+        Args:
+            data: list of str, "merge_log", the start and end of the time window in seconds
+                since the epoch ("0" for no limit), "1" to follow or "0" not to, then the stems
+                of the scripts (all scripts if none).
+        """
+        arguments = self._parse_arguments(data, _timestamp, _timestamp, _flag)
+        if arguments is None:
+            return
+        since = arguments[0] or None
+        until = arguments[1] or None
+        follow = arguments[2] and self.response.connection.version >= 2
+        stems = [Path(path_str).stem for path_str in data[4:]]
+
+        worker = log_merge.MergeWorker(self.core.LOGS, stems, since, until, follow, self)
+        response = self.response
+        response.hold()
+        worker.found.connect(partial(self._append_lines, response))
+        worker.finished.connect(response.release)
+        worker.finished.connect(worker.deleteLater)
+        response.connection.closed.connect(worker.stop)
+        worker.start()
+
+    def stats(self, data):
+        """Processes the "stats" command. Writes the current resource usage of the scripts'
+        process trees, and its minimum, mean, maximum and 95th percentile over a time window.
+
+        Args:
+            data: list of str, "stats", the window in seconds, then the stems of the scripts
+                (all running scripts if none).
+        """
+        arguments = self._parse_arguments(data, _positive)
+        if arguments is None:
+            return
+        window = arguments[0]
+        sampler = self.core.script_manager.sampler
+        since = _t.monotonic() - window
+        stems = [Path(path_str).stem for path_str in data[2:]] or list(self.core.running_scripts)
+
+        for stem in stems:
+            if stem not in self.core.running_scripts:
+                self.response.error("{} is not running.".format(stem))
+                continue
+            timestamp = self.core.running_scripts[stem]
+            history = sampler.histories.get(timestamp)
+            if history is None or not history.count:
+                self.response.append("{}: no samples yet.".format(stem))
+                continue
+
+            summary = history.summary(since)
+            self.response.append(
+                "{}: {} process(es), {} sample(s) in the last {:g} s".format(
+                    stem,
+                    sampler.process_counts[timestamp],
+                    len(history.window(since)),
+                    window,
+                )
+            )
+            self.response.append(
+                "  {:<12}{:>10}{:>10}{:>10}{:>10}{:>10}".format(
+                    "metric", "now", "min", "mean", "max", "p95"
+                )
+            )
+            latest = history.latest()
+            for metric in resource_sampler.METRICS:
+                values = (latest[metric],) + summary.get(metric, ())
+                self.response.append(
+                    "  {:<12}".format(metric) + "".join("{:>10.1f}".format(v) for v in values)
+                )
+
+    def status(self, data):
+        """Processes the "status" command. Writes the supervision state of running scripts
+        and of scripts that have exited."""
+        rows = self.core.supervisor.status(self.core.running_scripts)
+        if not rows:
+            self.response.append("No scripts are running.")
+            return
+        self.response.append(
+            "{:<24}{:<24}{:<12}{:>10}{:>12}".format(
+                "script", "state", "policy", "restarts", "exit code"
+            )
+        )
+        for stem, state, policy, restarts, returncode in rows:
+            self.response.append(
+                "{:<24}{:<24}{:<12}{:>10}{:>12}".format(
+                    stem, state, policy, restarts, "-" if returncode is None else returncode
+                )
+            )
+
+    def metrics(self, data):
+        """Processes the "metrics" command. Writes the counters and histograms of the tray
+        launcher, either summarized or in the Prometheus text format.
+
+        Args:
+            data: list of str, "metrics", then "prometheus" or "summary".
+        """
+        if data[1:] == ["prometheus"]:
+            lines = metrics.REGISTRY.exposition().splitlines()
+        else:
+            lines = metrics.REGISTRY.summary()
+        for line in lines:
+            self.response.append(line)
 
     def all_logs(self, data):
-        self.gui.show_logs(self.gui.LOGS)
-        self.message_to_client.append("SUCCESS: all logs are shown.")
+        if self.core.show_logs(self.core.LOGS):
+            self.response.append("SUCCESS: all logs are shown.")
+        else:
+            self.response.error("Logs cannot be shown on this machine.")
 
     def focus(self, data):
         """Processes the "focus" command. Brings the scripts to the foreground."""
         for path_str in data[1:]:
-            self._on_running_script(self.gui.show_script, path_str, " is brought to the front.")
+            self._on_running_script(self.core.show_script, path_str, " is brought to the front.")
 
     def quit(self, data):
         """Processes the "quit" command. Quits the tray launcher without prompting."""
-        self.gui.check_active_processes()
+        self.core.quit()
+
+    def batch(self, data):
+        """Processes the "batch" command. Runs a sequence of commands in order over one
+        connection, reporting the messages of each command under its own header.
+
+        Args:
+            data: list of str, "batch", then "stop" or "continue" to select whether to stop
+                at the first failing command, then one JSON-encoded command list per entry.
+        """
+        arguments = self._parse_arguments(data, _batch_mode)
+        if arguments is None:
+            return
+        stop_on_error = arguments[0] == "stop"
+        entries = data[2:]
+
+        for index, entry in enumerate(entries, 1):
+            command = _batch_command(entry)
+            self.response.append(
+                "[{}/{}] {}".format(
+                    index, len(entries), entry if command is None else " ".join(command)
+                )
+            )
+
+            errors = self.response.errors
+            if command is None:
+                self.response.error("{} is not a valid command.".format(entry))
+            elif command[0] in ["batch", "follow_log", "grep", "merge_log"]:
+                self.process_invalid_command(command)
+            else:
+                self.run_command(command)
 
-        logging.info("Tray Launcher Exited.")
-        self.gui.script_manager.deleteLater()
-        qApp.quit()
+            if stop_on_error and self.response.errors > errors:
+                self.response.append(
+                    "Stopped at the first error. {} command(s) skipped.".format(
+                        len(entries) - index
+                    )
+                )
+                return
 
     def process_invalid_command(self, data):
         """Processes an invalid command."""
-        self.message_to_client.append("{} is an invalid command.".format(data[0]))
+        self.response.error("{} is an invalid command.".format(data[0] if data else ""))
 
-    def _on_running_script(self, func, path_str, success_message):
-        self.gui.check_active_processes()
-
-        file_path = self.gui.to_loaded_path(Path(path_str))
-        if file_path is not None:
-            if (
-                file_path.is_file()
-                and file_path.parent == self.gui.AVAILABLE_SCRIPTS
-                and file_path.stem in self.gui.currently_running_scripts
-            ):
-                if func == self.gui.show_logs:
-                    self.gui.show_logs(
-                        self.gui.script_manager.running_child_scripts[
-                            self.gui.currently_running_scripts[file_path.stem][0]
-                        ].log_path
-                    )
-                    self.message_to_client.append(
-                        "SUCCESS: log of {} is shown.".format(file_path.stem)
-                    )
-                else:
-                    func(
-                        (
-                            (file_path, self.gui.currently_running_scripts[file_path.stem][0]),
-                            self.gui.currently_running_scripts[file_path.stem][1],
-                        )
-                    )
-                    self.message_to_client.append(
-                        "SUCCESS: {}".format(file_path.stem) + success_message
-                    )
-            elif file_path.is_file() and file_path.parent == self.gui.AVAILABLE_SCRIPTS:
-                self.message_to_client.append("{} is not running.".format(path_str))
-            else:
-                self.message_to_client.append("{} is not valid.".format(path_str))
-        else:
-            self.message_to_client.append("{} is not valid.".format(path_str))
+    def _parse_arguments(self, data, *parsers):
+        """Returns the first arguments of a command converted by parsers, or None after writing
+        an error if they are missing or invalid.
+
+        Args:
+            data: list of str, the command followed by its arguments.
+            parsers: callables, e.g. int, converting the arguments in order. They raise
+                ValueError for an invalid argument.
+        """
+        if len(data) <= len(parsers):
+            self.response.error("{} needs at least {} argument(s).".format(data[0], len(parsers)))
+            return None
+        arguments = []
+        for parse, argument in zip(parsers, data[1:]):
+            try:
+                arguments.append(parse(argument))
+            except ValueError:
+                self.response.error("{} is not a valid argument of {}.".format(argument, data[0]))
+                return None
+        return arguments
+
+    def _append_lines(self, response, lines):
+        for line in lines:
+            response.append(line)
+
+    def _start_group(self, name):
+        """Starts a group of scripts, holding the response until all of them are ready
+        or have failed.
+
+        Args:
+            name: str, the name of the group in the group configuration.
+        """
+        try:
+            entries = script_groups.load_group(self.core.GROUPS, name)
+        except ValueError as err:
+            self.response.error("Cannot start @{}: {}.".format(name, err))
+            return
 
-    def write_to_client(self, connection):
-        """Passes the string (self.message_to_client) created by the server to the client."""
+        response = self.response
+        response.hold()
+        starter = script_groups.GroupStarter(name, entries, self.core, self)
+        starter.message.connect(response.append)
+        starter.error.connect(response.error)
+        starter.finished.connect(response.release)
+        starter.start()
 
-        if not self.message_to_client:
+    def _terminate(self, scripts):
+        """Terminates scripts, holding the response until all of them are terminated.
+
+        Args:
+            scripts: list of str, the stems of the scripts.
+        """
+        futures = self.core.terminate_scripts(scripts)
+        if not futures:
             return
+        response = self.response
+        response.hold()
+        batch = process_terminator.TerminationBatch(futures, self)
+        batch.terminated.connect(partial(self._report_termination, response))
+        batch.finished.connect(response.release)
+
+    def _report_termination(self, response, stem, result):
+        if result is None or result.survivors:
+            response.error("{} could not be terminated completely.".format(stem))
+        else:
+            response.append(
+                "SUCCESS: {} is terminated ({} process(es) exited, {} killed).".format(
+                    stem, len(result.graceful), len(result.killed)
+                )
+            )
 
-        message = "\n".join(self.message_to_client)
-        self.message_to_client = []
+    def _running_script(self, path_str):
+        """Returns the stem of a running script. Writes an error and returns None if path_str
+        is not a running script.
+        """
+        file_path = self.core.to_loaded_path(Path(path_str))
+        if file_path is None or not (
+            file_path.stem in self.core.catalog and file_path.parent == self.core.AVAILABLE_SCRIPTS
+        ):
+            self.response.error("{} is not valid.".format(path_str))
+            return None
+        if file_path.stem not in self.core.running_scripts:
+            self.response.error("{} is not running.".format(path_str))
+            return None
+        return file_path.stem
 
-        block = QByteArray()
-        out = QDataStream(block, QIODevice.ReadWrite)
-        out.setVersion(QDataStream.Qt_5_0)
-        out.writeUInt16(0)
-        message = bytes(message, encoding="ascii")
-        out.writeString(message)
-        out.device().seek(0)
-        out.writeUInt16(block.size() - 2)
-        connection.write(block)
+    def _on_running_script(self, func, path_str, success_message):
+        stem = self._running_script(path_str)
+        if stem is None:
+            return
+        if func == self.core.show_current_log:
+            if func(stem):
+                self.response.append("SUCCESS: log of {} is shown.".format(stem))
+            else:
+                self.response.error("The log of {} cannot be shown on this machine.".format(stem))
+        else:
+            func(stem)
+            self.response.append("SUCCESS: {}".format(stem) + success_message)
 
 
 def main():
-    app = QApplication(sys.argv)
-    app.setStyle("Fusion")
-    lc = TrayLauncherCLI()
+    headless = "--headless" in sys.argv[1:]
+    if headless:
+        app = QCoreApplication(sys.argv)
+    else:
+        from PyQt5.QtWidgets import QApplication
+
+        app = QApplication(sys.argv)
+        app.setStyle("Fusion")
+    lc = TrayLauncherCLI(headless)
     sys.exit(app.exec_())
     lc.deleteLater()
 
 
-def run_pythonw():
+def run_pythonw(headless=False):
+    """Starts the tray launcher in a new process without a console window.
+
+    Args:
+        headless: bool, run without the tray icon, see TrayLauncherCLI.
+    """
     instance_already_exists = tray_launcher_client.TrayLauncherClient.check_connection()
     if instance_already_exists:
         print("There is already an instance of tray launcher running. Terminating now.")
@@ -250,27 +653,21 @@ def run_pythonw():
 
     HOME_PATH = Path(__file__).parent / "cli.py"
 
-    t = _t.localtime(_t.time())
-
-    log_directory = (
-        Path.home()
-        / ".tray_launcher"
-        / "logs"
-        / (str(t.tm_year) + "_" + str(t.tm_mon).zfill(2) + "_" + str(t.tm_mday).zfill(2))
-    )
+    logs_directory = Path.home() / ".tray_launcher" / "logs"
 
     try:
-        log_directory.mkdir(parents=True, exist_ok=True)
+        logs_directory.mkdir(parents=True, exist_ok=True)
     except Exception as err:
         print(err + ": Failed to create new directory for tray launcher outputs")
         raise
-    with open(log_directory / "tray_launcher.log", "a") as launcher_log:
+    # Not tray_launcher.log, which the launcher writes itself (see launcher_log.LauncherLog).
+    with open(logs_directory / launcher_log.STDIO_NAME, "a") as launcher_output:
         subprocess.Popen(
-            (sys.executable, HOME_PATH),
+            (sys.executable, HOME_PATH) + (("--headless",) if headless else ()),
             encoding="utf-8",
-            creationflags=subprocess.CREATE_NO_WINDOW,
-            stdout=launcher_log,
-            stderr=launcher_log,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+            stdout=launcher_output,
+            stderr=launcher_output,
         )
 
     print("Tray Launcher is running...")
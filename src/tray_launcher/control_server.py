@@ -0,0 +1,273 @@
+import logging
+from functools import partial
+from pathlib import Path
+
+from PyQt5.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal
+from PyQt5.QtNetwork import QAbstractSocket, QHostAddress, QLocalServer, QLocalSocket, QTcpServer
+
+from tray_launcher import protocol, transport
+
+
+class ControlServer(QObject):
+    """Listens for the connections of clients on the transport selected in the transport
+    module: a local socket (QLocalServer, a Unix domain socket or a named pipe on Windows) that
+    only the current user can connect to, or TCP on 127.0.0.1. TCP is also used if the local
+    socket cannot be created.
+    """
+
+    connection_accepted = pyqtSignal(object, str)
+
+    def __init__(self, parent=None):
+        """Create a ControlServer instance. Check listening before using it.
+
+        Args:
+            parent: QObject, the parent of the server.
+        """
+        super().__init__(parent)
+
+        self.listening = False
+        if transport.transport() == transport.LOCAL:
+            in_use = self._listen_local()
+            if self.listening or in_use:
+                return
+            logging.warning("Falling back to TCP for the control channel.")
+        self._listen_tcp()
+
+    def _listen_local(self):
+        """Listens on the local socket, replacing a socket file left behind by a tray launcher
+        that did not quit normally.
+
+        Returns:
+            bool, True if another tray launcher is listening on the local socket.
+        """
+        name = transport.local_name()
+        server = QLocalServer(self)
+        server.setSocketOptions(QLocalServer.UserAccessOption)
+        if not transport.LOCAL_IS_PIPE:
+            Path(name).parent.mkdir(parents=True, exist_ok=True)
+        if not server.listen(name) and server.serverError() == QAbstractSocket.AddressInUseError:
+            probe = QLocalSocket()
+            probe.connectToServer(name)
+            if probe.waitForConnected(1000):
+                probe.abort()
+                logging.warning("Another tray launcher is listening on {}.".format(name))
+                return True
+            QLocalServer.removeServer(name)
+            server.listen(name)
+
+        if not server.isListening():
+            logging.warning("Failed to listen on {}: {}".format(name, server.errorString()))
+            server.deleteLater()
+            return False
+        server.newConnection.connect(partial(self._accept, server, transport.LOCAL))
+        # Removes the socket file. It would otherwise be left behind and replaced at the next start.
+        QCoreApplication.instance().aboutToQuit.connect(server.close)
+        self.listening = True
+        return False
+
+    def _listen_tcp(self):
+        host, port = transport.tcp_address()
+        server = QTcpServer(self)
+        if not server.listen(QHostAddress(host), port):
+            logging.warning(
+                "Failed to listen to port: "
+                + str(port)
+                + ". See README.md to switch to an available port."
+            )
+            return
+        server.newConnection.connect(partial(self._accept, server, transport.TCP))
+        self.listening = True
+
+    def _accept(self, server, name):
+        while server.hasPendingConnections():
+            self.connection_accepted.emit(server.nextPendingConnection(), name)
+
+
+class ControlConnection(QObject):
+    """One client connection of the control server.
+
+    Bytes are collected as they arrive (readyRead) into a per-connection buffer, so a slow
+    client never blocks the event loop. A request is a sequence of lines, the first being the
+    command. It ends with an empty line; clients that do not send one are served once no
+    more bytes have arrived for IDLE_MS. See the protocol module for the wire format.
+    """
+
+    READING, DISPATCHED, CLOSED = range(3)
+
+    READ_TIMEOUT_MS = 5000
+    IDLE_MS = 50
+    MAX_REQUEST_SIZE = 1 << 20
+
+    request_received = pyqtSignal(object, list)
+    closed = pyqtSignal()
+
+    def __init__(self, socket, parent=None):
+        """Create a ControlConnection instance.
+
+        Args:
+            socket: QTcpSocket or QLocalSocket, the accepted connection.
+            parent: QObject, the parent of the connection.
+        """
+        super().__init__(parent)
+
+        self.socket = socket
+        self.state = self.READING
+        self.version = 1
+        self._buffer = bytearray()
+        self._lines = []
+
+        self._read_timer = QTimer(self)
+        self._read_timer.setSingleShot(True)
+        self._read_timer.timeout.connect(self._on_read_timeout)
+        self._read_timer.start(self.READ_TIMEOUT_MS)
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self._finish_request)
+
+        self.socket.readyRead.connect(self._on_ready_read)
+        self.socket.disconnected.connect(self._on_disconnected)
+
+        if self.socket.bytesAvailable():
+            self._on_ready_read()
+
+    def close(self):
+        """Closes the connection once all queued data has been written."""
+        if self.state == self.CLOSED:
+            return
+        self.state = self.CLOSED
+        self._read_timer.stop()
+        self._idle_timer.stop()
+        if isinstance(self.socket, QLocalSocket):
+            self.socket.disconnectFromServer()
+        else:
+            self.socket.disconnectFromHost()
+
+    def _on_ready_read(self):
+        if self.state != self.READING:
+            self.socket.readAll()
+            return
+
+        self._buffer += bytes(self.socket.readAll())
+        if len(self._buffer) > self.MAX_REQUEST_SIZE:
+            logging.warning("A client request exceeded the maximum size. Connection dropped.")
+            self._abort()
+            return
+
+        while self.state == self.READING:
+            end = self._buffer.find(b"\n")
+            if end == -1:
+                break
+            line = protocol.decode_line(bytes(self._buffer[:end]))
+            del self._buffer[: end + 1]
+            if line == "":
+                self._finish_request()
+            elif line == protocol.HELLO and not self._lines:
+                self.version = protocol.VERSION
+            else:
+                self._lines.append(line)
+
+        if self.state == self.READING and self._lines:
+            self._idle_timer.start(self.IDLE_MS)
+
+    def _finish_request(self):
+        if self.state != self.READING:
+            return
+        self.state = self.DISPATCHED
+        self._read_timer.stop()
+        self._idle_timer.stop()
+
+        if self._lines:
+            self.request_received.emit(self, self._lines)
+        else:
+            self.close()
+
+    def _on_read_timeout(self):
+        logging.warning("A client did not complete its request in time. Connection dropped.")
+        self._abort()
+
+    def _abort(self):
+        self.state = self.CLOSED
+        self._read_timer.stop()
+        self._idle_timer.stop()
+        self.socket.abort()
+        self.socket.deleteLater()
+        self.deleteLater()
+        self.closed.emit()
+
+    def _on_disconnected(self):
+        self.state = self.CLOSED
+        self._read_timer.stop()
+        self._idle_timer.stop()
+        self.socket.deleteLater()
+        self.deleteLater()
+        self.closed.emit()
+
+
+class Response:
+    """The response to one request.
+
+    Messages are written to a version 2 client as soon as they are appended. For a version 1
+    client they are collected and sent as a single block when the response is closed.
+
+    The response is closed when the dispatcher returns, unless it is held by a command that
+    keeps producing output afterwards, e.g. one following a log.
+    """
+
+    def __init__(self, connection):
+        """Create a Response instance.
+
+        Args:
+            connection: ControlConnection, the connection the request was received on.
+        """
+        self.connection = connection
+        self.closed = False
+        self.errors = 0
+        self._messages = []
+        self._holds = 0
+        self._finished = False
+
+    def append(self, message):
+        """Sends (version 2) or queues (version 1) one message."""
+        if self.closed or self.connection.state == ControlConnection.CLOSED:
+            return
+        if self.connection.version >= 2:
+            self.connection.socket.write(protocol.encode_data(message))
+        else:
+            self._messages.append(message)
+
+    def error(self, message):
+        """Sends or queues a message reporting that (part of) the command failed."""
+        self.errors += 1
+        self.append(message)
+
+    def hold(self):
+        """Keeps the response open after the dispatcher returns, until release() is called."""
+        self._holds += 1
+
+    def release(self):
+        self._holds -= 1
+        if self._finished and self._holds == 0:
+            self.close()
+
+    def finish(self):
+        """Called when the dispatcher returns. Closes the response unless it is held."""
+        self._finished = True
+        if self._holds == 0:
+            self.close()
+
+    def close(self):
+        """Ends the response and closes the connection."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.connection.state == ControlConnection.CLOSED:
+            return
+        if self.connection.version >= 2:
+            self.connection.socket.write(protocol.encode_end())
+        elif self._messages:
+            message = "\n".join(self._messages)
+            if len(message) > protocol.V1_MAX_MESSAGE_SIZE:
+                logging.warning("Response truncated for a version 1 client.")
+            self.connection.socket.write(protocol.encode_v1(message))
+        self.connection.close()
@@ -0,0 +1,429 @@
+import logging
+import os
+import shutil as _su
+import time as _t
+from functools import partial
+from pathlib import Path
+
+from PyQt5.QtCore import QCoreApplication, QObject, pyqtSignal
+
+from tray_launcher import (
+    child_script_manager,
+    launcher_log,
+    log_follower,
+    metrics,
+    process_terminator,
+    process_watcher,
+    script_catalog,
+    state_journal,
+    supervisor,
+)
+
+_STARTED = metrics.counter("tray_launcher_scripts_started_total", "Scripts started")
+_RESTARTED = metrics.counter(
+    "tray_launcher_script_restarts_total", "Scripts started again, by hand or by the supervisor"
+)
+_TERMINATED = metrics.counter(
+    "tray_launcher_scripts_terminated_total", "Scripts terminated through the tray launcher"
+)
+
+
+class LauncherCore(QObject):
+    """The scripts, processes, logs and state of the tray launcher, without any GUI.
+
+    The core only needs QtCore, so it also runs headless. Frontends such as the tray icon
+    subscribe to script_started and script_stopped, and to the signals of the catalog, instead
+    of keeping their own copy of the state.
+    """
+
+    script_started = pyqtSignal(str, float)
+    script_stopped = pyqtSignal(str, float)
+
+    def __init__(self, parent=None):
+        """Create a LauncherCore instance. Call start() once the frontends are connected.
+
+        Args:
+            parent: QObject, the parent of the core.
+        """
+        super().__init__(parent)
+
+        user_home = Path.home() / ".tray_launcher"
+
+        self.LOGS = user_home / "logs"
+        self.AVAILABLE_SCRIPTS = user_home / "scripts"
+        self.TRACK = user_home / "track"
+        self.INDEX = user_home / "index"
+        self.GROUPS = user_home / "groups.json"
+        self.RESTART = user_home / "restart.json"
+
+        self.running_scripts = {}
+        metrics.gauge(
+            "tray_launcher_running_scripts",
+            "Scripts currently running",
+            lambda: len(self.running_scripts),
+        )
+        # Called with the Path of a script whose stem is already loaded; returns True to
+        # replace the loaded script. Scripts are never replaced if it is None.
+        self.confirm_replace = None
+        # Called with the Path of a log file to show it in a frontend. Log files are opened with
+        # the default application of the desktop if it is None.
+        self.open_log = None
+        self._restarting = False
+
+        self.script_manager = child_script_manager.ChildScriptManager()
+        self.process_watcher = process_watcher.ProcessWatcher(self.script_manager.inventory, self)
+        self.process_watcher.script_exited.connect(self.on_script_exited)
+        QCoreApplication.instance().aboutToQuit.connect(self.process_watcher.stop)
+        self.supervisor = supervisor.Supervisor(self.RESTART, self.start_script_again, self)
+
+        # Written by a background thread, to logs/<day>/tray_launcher.log of the current day.
+        self.launcher_log = launcher_log.LauncherLog(self.LOGS)
+        self.launcher_log.install()
+
+        try:
+            self.AVAILABLE_SCRIPTS.mkdir(parents=True, exist_ok=True)
+        except Exception as err:
+            logging.error("{}: Failed to create new directory for available scripts".format(err))
+            raise
+
+        try:
+            self.TRACK.mkdir(parents=True, exist_ok=True)
+        except Exception as err:
+            logging.error(
+                "{}: Failed to create new directory to track processes started".format(err)
+            )
+            raise
+
+        self.journal = state_journal.StateJournal(
+            self.TRACK / "journal.jsonl", legacy_track_file=self.TRACK / "running_processes.log"
+        )
+
+        logging.info("Tray Launcher Started.")
+
+        self.catalog = script_catalog.ScriptCatalog(self.AVAILABLE_SCRIPTS, self)
+
+    def start(self):
+        """Reattaches the scripts that are still running and starts watching processes."""
+        self.check_leftover()
+        self.process_watcher.start()
+
+    def check_leftover(self):
+        """Reattaches the scripts recorded in the journal that are still running. Each process
+        is matched by both its pid and its creation time. Scripts that are no longer running
+        are recorded as exited.
+        """
+        started = _t.perf_counter()
+        results = self.script_manager.reattach(self.journal.entries(), self.to_loaded_path)
+        exited = []
+        for entry, child, pids, outcome in results:
+            if child is not None and entry["stem"] in self.running_scripts:
+                del self.script_manager.running_child_scripts[entry["key"]]
+                outcome = "not reattached, another run of the script is already attached"
+            elif child is not None:
+                self.insert_leftover(child, pids)
+            elif pids:
+                outcome += ", the processes are left running"
+            else:
+                exited.append(entry["key"])
+            logging.info("{} (pid {}): {}.".format(entry["stem"], entry["pid"], outcome))
+        self.journal.record_exits(exited)
+        logging.info(
+            "Reattach phase finished in {:.1f} ms.".format((_t.perf_counter() - started) * 1000)
+        )
+
+    def insert_leftover(self, child, pids):
+        """Adds processes back to the tray launcher as if they are started
+            by it.
+
+        Args:
+            child: ChildScript, the reattached script.
+            pids: list of int, the pids of its process tree.
+        """
+        stem = child.script_path.stem
+        timestamp = child.timestamp
+        self.process_watcher.watch(timestamp, child.child_script_PID, child.create_time, pids)
+        self.running_scripts[stem] = timestamp
+        self.script_started.emit(stem, timestamp)
+
+    def to_loaded_path(self, path_given):
+        """Returns a Path that resembles one pointing to the "scripts" directory.
+            Changes the parent of the path_given to the "scripts" directory and modifies its
+            suffix to .bat
+
+        Args:
+            path_given: Path
+        """
+        try:
+            loaded_path = Path(self.AVAILABLE_SCRIPTS / path_given).with_suffix(".bat")
+        except ValueError:
+            return None
+        return loaded_path
+
+    def current_log_path(self, stem):
+        """Returns the Path of the log of a running script, or None if it is not running.
+
+        Args:
+            stem: str, the stem of the script.
+        """
+        if stem not in self.running_scripts:
+            return None
+        return self.script_manager.running_child_scripts[self.running_scripts[stem]].log_path
+
+    def recent_output(self, stem, count):
+        """Returns the last lines of output of a running script. They are read from memory,
+        or from the end of its log if the output is not captured by the tray launcher, e.g.
+        after the script was reattached.
+
+        Args:
+            stem: str, the stem of the script.
+            count: int, the maximum number of lines.
+
+        Returns:
+            list of str, the lines, or None if the script is not running.
+        """
+        if stem not in self.running_scripts:
+            return None
+        child = self.script_manager.running_child_scripts[self.running_scripts[stem]]
+        if child.recent_output is not None:
+            return child.recent_output.lines(count)
+        try:
+            return log_follower.tail_lines(child.log_path, count)[0]
+        except OSError:
+            return []
+
+    def start_script(self, script_path):
+        """Starts a loaded script, unless a script with the same stem is running.
+
+        Args:
+            script_path: Path, path to the script to be started.
+
+        Returns:
+            bool, True if the script was started, False if it was already running.
+        """
+        self.catalog.revalidate()
+        stem = script_path.stem
+        if stem in self.running_scripts:
+            return False
+
+        self.supervisor.script_started(stem)
+        child = self.script_manager.start_new_script(script_path)
+        timestamp = child.timestamp
+        self.process_watcher.watch(timestamp, child.child_script_PID, child.create_time)
+        self.running_scripts[stem] = timestamp
+
+        logging.info("{} is started.".format(stem))
+
+        self.journal.record_start(child, restart=self._restarting)
+        _STARTED.inc()
+        if self._restarting:
+            _RESTARTED.inc()
+        self.script_started.emit(stem, timestamp)
+        return True
+
+    def start_script_again(self, script_path):
+        """Starts a script that was terminated or has exited, recording it as a restart.
+
+        Args:
+            script_path: Path, path to the script to be started.
+
+        Returns:
+            bool, True if the script was started, False if it was already running.
+        """
+        self._restarting = True
+        try:
+            return self.start_script(script_path)
+        finally:
+            self._restarting = False
+
+    def show_script(self, stem):
+        """Brings windows associated with a running script to the foreground, if any.
+
+        Args:
+            stem: str, the stem of the script.
+        """
+        timestamp = self.running_scripts[stem]
+        self.script_manager.show(timestamp)
+
+        logging.info(
+            "{} was brought to the front.".format(stem)
+            + " Processes with PIDs {} are running.".format(
+                self.script_manager.running_child_scripts[timestamp].current_PIDs
+            )
+        )
+
+    def terminate_scripts(self, stems):
+        """Terminates running scripts. They are removed from the state immediately, while their
+        process trees are terminated in parallel by the script manager.
+
+        Args:
+            stems: list of str, the stems of the scripts.
+
+        Returns:
+            dict of Future of TerminationResult, keyed by the stems of the scripts
+                that were running.
+        """
+        stems = [stem for stem in dict.fromkeys(stems) if stem in self.running_scripts]
+        timestamps = [self.running_scripts.pop(stem) for stem in stems]
+        for stem, timestamp in zip(stems, timestamps):
+            self.process_watcher.unwatch(timestamp)
+            logging.info("{} was terminated through Tray Launcher.".format(stem))
+            self.script_stopped.emit(stem, timestamp)
+
+        futures = self.script_manager.terminate(timestamps)
+        self.journal.record_exits(timestamps)
+        _TERMINATED.inc(len(stems))
+        return dict(zip(stems, futures))
+
+    def restart_script(self, stem):
+        """Restarts a running script. The script is started again once its old process tree
+        has exited, so the two never run side by side.
+
+        Args:
+            stem: str, the stem of the script.
+        """
+        script_path = self.script_manager.running_child_scripts[
+            self.running_scripts[stem]
+        ].script_path
+        futures = self.terminate_scripts([stem])
+        batch = process_terminator.TerminationBatch(futures, self)
+        batch.finished.connect(partial(self._start_restarted_script, stem, script_path))
+
+    def _start_restarted_script(self, stem, script_path):
+        if not self.start_script_again(script_path):
+            logging.info("{} was not restarted, it was started again meanwhile.".format(stem))
+            return
+        logging.info("{} was restarted.".format(stem))
+
+    def check_active_processes(self):
+        """Checks if scripts are still running, and removes those that are not.
+
+        Exits are normally reported by the process watcher, so this full check is only needed
+        to resynchronize, e.g. before quitting.
+        """
+        to_del = [
+            timestamp
+            for timestamp, child_script_obj in self.script_manager.running_child_scripts.items()
+            if not child_script_obj.is_active()
+        ]
+        for ts in to_del:
+            self.process_watcher.unwatch(ts)
+            self.remove_exited_script(ts)
+
+    def on_script_exited(self, timestamp, returncode):
+        """Removes a script whose process tree has exited, as reported by the process watcher,
+        and lets the supervisor restart it if its restart policy asks for it.
+
+        Args:
+            timestamp: float, the timestamp of the ChildScript.
+            returncode: int, the exit code of the script, or None if the watcher did not get it.
+        """
+        if timestamp in self.script_manager.running_child_scripts:
+            child_script_obj = self.script_manager.running_child_scripts[timestamp]
+            if returncode is None:
+                returncode = child_script_obj.returncode()
+            self.remove_exited_script(timestamp)
+            self.supervisor.script_exited(child_script_obj.script_path, returncode)
+
+    def remove_exited_script(self, timestamp):
+        """Removes a script that is no longer running.
+
+        Args:
+            timestamp: float, the timestamp of the ChildScript.
+        """
+        child_script_obj = self.script_manager.running_child_scripts.pop(timestamp)
+        child_script_obj.close_output()
+        self.journal.record_exit(timestamp)
+        stem = child_script_obj.script_path.stem
+
+        if self.running_scripts.get(stem) == timestamp:
+            del self.running_scripts[stem]
+            self.script_stopped.emit(stem, timestamp)
+
+        logging.info(
+            "{} has already been terminated. Now removed from the menu.".format(
+                child_script_obj.script_path_str
+            )
+        )
+
+    def run_new_file(self, file_path):
+        """Attempts to run the given argument as a .bat script.
+            If the file is already loaded, run it. If not,
+            load it and then run it.
+
+        Args:
+            file_path: Path
+        """
+        if not (file_path.is_file()):
+            logging.info("Only .bat file is accepted.")
+            return False
+
+        elif file_path.parent == self.AVAILABLE_SCRIPTS:
+            self.start_script(file_path)
+            return True
+        else:
+            if self.load_script(file_path):
+                self.start_script(self.to_loaded_path(file_path.stem))
+            return True
+
+    def load_script(self, script_path):
+        """Loads the specified file to the \\scripts directory. If there is a file with the
+            same name, it is only replaced if confirm_replace returns True.
+
+        Args:
+            script_path: Path, the path to the file to be loaded.
+        """
+        if not (script_path.is_file() and script_path.suffix == ".bat"):
+            return False
+
+        if script_path.stem not in self.catalog:
+            _su.copy(script_path, self.AVAILABLE_SCRIPTS)
+            self.catalog.add(self.to_loaded_path(script_path.stem))
+            logging.info("{} was loaded to \\scripts.".format(str(script_path)))
+            return True
+
+        if self.confirm_replace is None or not self.confirm_replace(script_path):
+            return False
+        try:
+            _su.copy(script_path, self.AVAILABLE_SCRIPTS)
+            logging.info("{} was replaced in \\scripts.".format(str(script_path)))
+        except _su.SameFileError:
+            logging.info("Same file was uploaded!")
+        return True
+
+    def show_logs(self, log_path):
+        """Displays the file specified, in the log viewer of the frontend if log_path is a file
+        and there is one, or with the default application of the desktop.
+
+        Args:
+            log_path: Path, the path to the file or directory to be opened.
+
+        Returns:
+            bool, whether the file was opened.
+        """
+        try:
+            if self.open_log is not None and log_path.is_file():
+                self.open_log(log_path)
+            else:
+                os.startfile(log_path)
+        except (AttributeError, OSError) as err:
+            logging.error("{}: Failed to open {}.".format(err, log_path))
+            return False
+        logging.info("Logs {} were opened.".format(log_path))
+        return True
+
+    def show_current_log(self, stem):
+        """Displays the log file a running script is currently writing to.
+
+        Args:
+            stem: str, the stem of the script.
+        """
+        log_path = self.current_log_path(stem)
+        return log_path is not None and self.show_logs(log_path)
+
+    def quit(self):
+        """Quits the tray launcher without prompting."""
+        self.check_active_processes()
+
+        logging.info("Tray Launcher Exited.")
+        self.script_manager.deleteLater()
+        QCoreApplication.quit()
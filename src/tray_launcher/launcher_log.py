@@ -0,0 +1,161 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time as _t
+
+from tray_launcher import metrics
+
+LOG_NAME = "tray_launcher.log"
+# Receives the stdout and stderr of a launcher started by `launcher run`, e.g. tracebacks and Qt
+# warnings. It is in the logs directory itself, since the launcher can run for several days.
+STDIO_NAME = "tray_launcher.stdout.log"
+FORMAT = "%(asctime)s %(message)s"
+
+_WRITE_SECONDS = metrics.histogram(
+    "tray_launcher_own_log_write_seconds", "Time to write and flush a batch of the launcher's log"
+)
+_DROPPED = metrics.counter(
+    "tray_launcher_own_log_dropped_total", "Records of the launcher's log dropped on a full queue"
+)
+
+_installed = None
+
+
+def day_directory(logs_directory, timestamp):
+    """Returns the directory of the logs of the day of a timestamp, e.g. logs/2021_06_30."""
+    t = _t.localtime(timestamp)
+    return logs_directory / (
+        str(t.tm_year) + "_" + str(t.tm_mon).zfill(2) + "_" + str(t.tm_mday).zfill(2)
+    )
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Puts records on a bounded queue, dropping them if the queue is full rather than
+    blocking the thread that logs.
+    """
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DROPPED.inc()
+
+
+class DailyLogWriter:
+    """Writes the records of the launcher's log to logs/<day>/tray_launcher.log, opening the
+    file of the next day when the day of the records changes.
+    """
+
+    def __init__(self, logs_directory):
+        self.logs_directory = logs_directory
+        self.formatter = logging.Formatter(FORMAT)
+        self.path = None
+        self._file = None
+
+    def write(self, records):
+        """Writes a batch of records and flushes the file once.
+
+        A failure is reported on stderr and the batch is lost, since the log cannot be used.
+        """
+        started = _t.perf_counter()
+        try:
+            for record in records:
+                path = day_directory(self.logs_directory, record.created) / LOG_NAME
+                if path != self.path:
+                    self._open(path)
+                self._file.write(self.formatter.format(record) + "\n")
+            self._file.flush()
+        except (OSError, ValueError) as err:
+            print("{}: Failed to write to {}.".format(err, self.path), file=sys.stderr)
+            self.close()
+        _WRITE_SECONDS.observe(_t.perf_counter() - started)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self.path = None
+
+    def _open(self, path):
+        self.close()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self.path = path
+
+
+class LauncherLog:
+    """Sends the records logged in this process through a queue to a writer thread.
+
+    Logging only formats the message and puts the record on the queue, so a slow disk never
+    blocks the event loop. The writer takes all records that are queued at once, up to
+    MAX_BATCH, and writes them with one flush. If the writer falls behind by more than
+    MAX_QUEUED records, new records are dropped and counted in the metrics.
+    """
+
+    MAX_QUEUED = 10000
+    MAX_BATCH = 500
+    STOP_TIMEOUT = 5.0
+
+    def __init__(self, logs_directory):
+        """Create a LauncherLog instance. Call install() to start logging to it.
+
+        Args:
+            logs_directory: Path, the directory of the logs, which has a directory per day.
+        """
+        self.queue = queue.Queue(self.MAX_QUEUED)
+        self.handler = _DroppingQueueHandler(self.queue)
+        self.writer = DailyLogWriter(logs_directory)
+        self._thread = threading.Thread(target=self._run, name="tray_launcher_log", daemon=True)
+        self._stopped = False
+
+    def install(self):
+        """Starts the writer and makes it the only handler of the root logger. A LauncherLog
+        installed before, e.g. by another LauncherCore in the same process, is stopped.
+        """
+        global _installed
+        if _installed is not None:
+            _installed.stop()
+        _installed = self
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(logging.INFO)
+        self._thread.start()
+        # Writes the records still queued when the interpreter exits.
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Writes the queued records and stops the writer. Records logged afterwards are
+        dropped.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        logging.getLogger().removeHandler(self.handler)
+        atexit.unregister(self.stop)
+        try:
+            self.queue.put(None, timeout=self.STOP_TIMEOUT)
+        except queue.Full:
+            pass
+        self._thread.join(self.STOP_TIMEOUT)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is None
+            records = batch[:-1] if stopping else batch
+            if records:
+                self.writer.write(records)
+            if stopping:
+                self.writer.close()
+                return
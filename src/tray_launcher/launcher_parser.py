@@ -1,6 +1,10 @@
 import argparse
+import datetime
+import json
+import shlex
+import sys
 
-from tray_launcher import cli, tray_launcher_client
+from tray_launcher import tray_launcher_client
 
 
 def get_parser():
@@ -13,7 +17,11 @@ def get_parser():
 
     p_start = launcher.add_parser("start", help="Starts scripts")
     p_start.add_argument(
-        "scripts", type=str, nargs="*", metavar="script_stem", help="Scripts to be started"
+        "scripts",
+        type=str,
+        nargs="*",
+        metavar="script_stem",
+        help="Scripts to be started, or @group to start a group of scripts",
     )
 
     launcher.add_parser("quit", help="Quits the tray launcher")
@@ -26,8 +34,16 @@ def get_parser():
         type=str,
         help="Scripts to be terminated",
     )
+    p_terminate.add_argument(
+        "-a", "--all", action="store_true", help="Terminate all running scripts"
+    )
 
-    launcher.add_parser("run", help="Runs the tray launcher")
+    p_run = launcher.add_parser("run", help="Runs the tray launcher")
+    p_run.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run without the tray icon, e.g. on a machine without a desktop session",
+    )
 
     p_load = launcher.add_parser("load", help="Loads scripts")
     p_load.add_argument(
@@ -55,6 +71,50 @@ def get_parser():
         help="Scripts whose log is to be viewed",
     )
     p_log.add_argument("-a", "--all", action="store_true", help="View all logs")
+    p_log.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="Print new lines of the logs as they are written, also across restarts",
+    )
+    p_log.add_argument(
+        "-n",
+        "--lines",
+        type=int,
+        metavar="N",
+        help="Print the last N lines of the logs in the terminal (default with --follow: 10)",
+    )
+    p_log.add_argument(
+        "--merge",
+        action="store_true",
+        help="Print the lines of the logs (of all scripts if none are given) merged in the"
+        " order they were written",
+    )
+    p_log.add_argument(
+        "--since",
+        type=str,
+        metavar="TIME",
+        help="With --merge, start at YYYY-MM-DD [HH:MM[:SS]], HH:MM[:SS] (today) or a duration"
+        " ago such as 10m (default: today, or now with --follow)",
+    )
+    p_log.add_argument(
+        "--until", type=str, metavar="TIME", help="With --merge, stop at this time (see --since)"
+    )
+
+    p_tail = launcher.add_parser(
+        "tail", help="Prints the last lines of output of running scripts, kept in memory"
+    )
+    p_tail.add_argument(
+        "scripts", nargs="+", metavar="script_stem", type=str, help="Scripts to show"
+    )
+    p_tail.add_argument(
+        "-n",
+        "--lines",
+        type=int,
+        default=20,
+        metavar="N",
+        help="Print the last N lines (default: 20)",
+    )
 
     p_focus = launcher.add_parser("focus", help="Focus scripts")
     p_focus.add_argument(
@@ -65,6 +125,65 @@ def get_parser():
     p_list.add_argument("-r", "--running", action="store_true", help="View all running scripts")
     p_list.add_argument("-a", "--all", action="store_true", help="View all scripts")
 
+    p_grep = launcher.add_parser("grep", help="Searches the logs of all scripts")
+    p_grep.add_argument("pattern", type=str, help="Regular expression to search for")
+    p_grep.add_argument(
+        "-s",
+        "--script",
+        action="append",
+        default=[],
+        metavar="script_stem",
+        help="Only search the logs of this script (can be repeated)",
+    )
+    p_grep.add_argument(
+        "--since", type=str, metavar="YYYY-MM-DD", help="Only search logs from this day on"
+    )
+    p_grep.add_argument(
+        "-m", "--max-count", type=int, default=0, metavar="N", help="Stop after N matches"
+    )
+
+    launcher.add_parser(
+        "status", help="Shows the state and restart policy of running and exited scripts"
+    )
+
+    p_stats = launcher.add_parser(
+        "stats", help="Shows the CPU, memory, handle and I/O usage of running scripts"
+    )
+    p_stats.add_argument(
+        "scripts", nargs="*", metavar="script_stem", type=str, help="Scripts to show"
+    )
+    p_stats.add_argument(
+        "-w",
+        "--window",
+        type=str,
+        default="10m",
+        metavar="DURATION",
+        help="Summarize the samples of this period, e.g. 30s, 10m or 1h (default: 10m)",
+    )
+
+    p_metrics = launcher.add_parser(
+        "metrics", help="Shows the command latencies and lifecycle counters of the tray launcher"
+    )
+    p_metrics.add_argument(
+        "-p",
+        "--prometheus",
+        action="store_true",
+        help="Print the metrics in the Prometheus text format",
+    )
+
+    p_batch = launcher.add_parser(
+        "batch", help="Runs the commands in a file (one per line) over one connection"
+    )
+    p_batch.add_argument(
+        "file", type=str, metavar="batch_file", help='File with commands, or "-" for stdin'
+    )
+    p_batch.add_argument(
+        "-s",
+        "--stop-on-error",
+        action="store_true",
+        help="Skip the remaining commands after the first command that fails",
+    )
+
     return parser
 
 
@@ -79,49 +198,233 @@ def get_print_pre_command(launcher, scripts):
         print_pre_command = "Loading {}.".format(scripts)
     elif launcher == "focus":
         print_pre_command = "Bringing {} to the top.".format(scripts)
+    elif launcher == "follow_log":
+        print_pre_command = "Printing logs of {}.".format(scripts)
     return print_pre_command
 
 
-def dispatch_command(args):
-    if args.launcher == "run":
-        cli.run_pythonw()
-        return
+def get_commands(args):
+    """Returns the message printed before sending a command, and the command to be sent.
 
-    print_pre_command = ""
-    if args.launcher in ["start", "terminate", "restart", "load", "focus"]:
+    Raises:
+        ValueError: if the arguments do not form a valid command.
+    """
+    if args.launcher == "terminate" and args.all:
+        print_pre_command = "Terminating all scripts."
+        commands = ("terminate_all", [])
+    elif args.launcher in ["start", "terminate", "restart", "load", "focus"]:
         print_pre_command = get_print_pre_command(args.launcher, args.scripts)
         commands = (args.launcher, args.scripts)
-    elif args.launcher == "quit":
-        print_pre_command = "Quitting tray launcher."
-        commands = ("quit", [])
+    elif args.launcher in ["quit", "status"]:
+        print_pre_command = "Quitting tray launcher." if args.launcher == "quit" else "Status:"
+        commands = (args.launcher, [])
     elif args.launcher == "log":
-        if args.all:
-            print_pre_command = "Showing all logs."
-            commands = ("all_logs", [])
-        else:
-            print_pre_command = "Showing logs for {}.".format(args.scripts)
-            commands = ("log", args.scripts)
+        print_pre_command, commands = get_log_commands(args)
+    elif args.launcher == "grep":
+        print_pre_command = "Searching logs for {}.".format(args.pattern)
+        commands = ("grep", get_grep_data(args))
+    elif args.launcher == "stats":
+        print_pre_command = "Resource usage:"
+        commands = ("stats", [str(parse_duration(args.window))] + args.scripts)
+    elif args.launcher == "tail":
+        print_pre_command = "Recent output of {}.".format(args.scripts)
+        commands = ("tail", [str(max(args.lines, 0))] + args.scripts)
+    elif args.launcher == "metrics":
+        print_pre_command = "Metrics:"
+        commands = ("metrics", ["prometheus" if args.prometheus else "summary"])
     elif args.launcher == "list":
-        if args.running:
-            print_pre_command = "Running scripts: "
-            commands = ("list_current", [])
-        elif args.all:
-            print_pre_command = "All available scripts: "
-            commands = ("list", [])
+        print_pre_command, commands = get_list_commands(args)
+    else:
+        raise ValueError(
+            "tray_launcher: error: {} is an unrecognized command".format(args.launcher)
+        )
+    return print_pre_command, commands
+
+
+def get_list_commands(args):
+    """Returns the message printed before sending a "list" command, and the command to be sent.
+
+    Raises:
+        ValueError: if neither --all nor --running is given.
+    """
+    if args.running:
+        print_pre_command = "Running scripts: "
+        commands = ("list_current", [])
+    elif args.all:
+        print_pre_command = "All available scripts: "
+        commands = ("list", [])
+    else:
+        raise ValueError(
+            "tray_launcher list: error: at least one of the following"
+            " arguments are required: -a/--all, -r/--running"
+        )
+    return print_pre_command, commands
+
+
+def get_log_commands(args):
+    """Returns the message printed before sending a "log" command, and the command to be sent."""
+    if args.merge:
+        print_pre_command = "Merging logs of {}.".format(args.scripts or "all scripts")
+        commands = ("merge_log", get_merge_data(args))
+    elif args.all:
+        print_pre_command = "Showing all logs."
+        commands = ("all_logs", [])
+    elif args.follow or args.lines is not None:
+        print_pre_command = get_print_pre_command("follow_log", args.scripts)
+        lines = 10 if args.lines is None else max(args.lines, 0)
+        commands = ("follow_log", [str(lines), "1" if args.follow else "0"] + args.scripts)
+    else:
+        print_pre_command = "Showing logs for {}.".format(args.scripts)
+        commands = ("log", args.scripts)
+    return print_pre_command, commands
+
+
+def get_merge_data(args):
+    """Returns the arguments of the "merge_log" command.
+
+    Raises:
+        ValueError: if --since or --until is not a time.
+    """
+    if args.since is not None:
+        since = parse_time(args.since)
+    elif args.follow:
+        since = datetime.datetime.now().timestamp()
+    else:
+        since = datetime.datetime.combine(datetime.date.today(), datetime.time()).timestamp()
+    until = 0 if args.until is None else parse_time(args.until)
+    return [str(since), str(until), "1" if args.follow else "0"] + args.scripts
+
+
+def parse_time(text):
+    """Returns the seconds since the epoch of a time such as "2021-06-30 12:00", "12:00:30"
+    (today) or "10m" (ago).
+
+    Raises:
+        ValueError: if text is not a time.
+    """
+    now = datetime.datetime.now()
+    for time_format in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%H:%M:%S", "%H:%M"]:
+        try:
+            parsed = datetime.datetime.strptime(text.strip(), time_format)
+        except ValueError:
+            continue
+        if not time_format.startswith("%Y"):
+            parsed = datetime.datetime.combine(now.date(), parsed.time())
+        return parsed.timestamp()
+    try:
+        return now.timestamp() - parse_duration(text)
+    except ValueError:
+        raise ValueError(
+            "tray_launcher log: error: {} is not a time"
+            " (e.g. 2021-06-30 12:00, 12:00 or 10m)".format(text)
+        ) from None
+
+
+def parse_duration(text):
+    """Returns the number of seconds in a duration such as "90", "30s", "10m" or "1h".
+
+    Raises:
+        ValueError: if text is not a duration.
+    """
+    units = {"s": 1, "m": 60, "h": 3600}
+    try:
+        if text[-1:] in units:
+            seconds = float(text[:-1]) * units[text[-1]]
         else:
-            print(
-                (
-                    "tray_launcher list: error: at least one of the following"
-                    " arguments are required: -a/--all, -r/--running"
+            seconds = float(text)
+    except ValueError:
+        seconds = -1
+    if not seconds > 0:
+        raise ValueError("tray_launcher: error: {} is not a duration (e.g. 10m)".format(text))
+    return seconds
+
+
+def get_grep_data(args):
+    """Returns the arguments of the "grep" command.
+
+    Raises:
+        ValueError: if --since is not a date.
+    """
+    since = "0000_00_00"
+    if args.since is not None:
+        try:
+            since = datetime.datetime.strptime(args.since, "%Y-%m-%d").strftime("%Y_%m_%d")
+        except ValueError:
+            raise ValueError(
+                "tray_launcher grep: error: {} is not a date (YYYY-MM-DD)".format(args.since)
+            ) from None
+    return [args.pattern, since, str(max(args.max_count, 0))] + args.script
+
+
+def get_batch_commands(args):
+    """Parses a batch file into a single "batch" command.
+
+    Each non-empty line that does not start with "#" is parsed like the arguments of
+    the launcher command. Backslashes are kept as-is so Windows paths need no escaping.
+
+    Raises:
+        ValueError: if the file cannot be read or a line is not a valid command.
+    """
+    try:
+        if args.file == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(args.file, "r") as f:
+                lines = f.read().splitlines()
+    except OSError as err:
+        raise ValueError("tray_launcher batch: error: {}".format(err))
+
+    parser = get_parser()
+    entries = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        lexer = shlex.shlex(line, posix=True)
+        lexer.whitespace_split = True
+        lexer.escape = ""
+        try:
+            sub_args = parser.parse_args(list(lexer))
+            if sub_args.launcher in ["run", "batch", "grep"] or any(
+                getattr(sub_args, name, False) for name in ["follow", "merge"]
+            ):
+                raise ValueError()
+            command, data = get_commands(sub_args)[1]
+        except (SystemExit, ValueError):
+            raise ValueError(
+                "tray_launcher batch: error: line {} is not a valid command: {}".format(
+                    number, line
                 )
-            )
-            return
-    else:
-        print("tray_launcher: error: {} is an unrecognized command".format(args.launcher))
+            ) from None
+        entries.append(json.dumps([command] + data))
+
+    mode = "stop" if args.stop_on_error else "continue"
+    return "Running {} command(s).".format(len(entries)), ("batch", [mode] + entries)
+
+
+def dispatch_command(args):
+    if args.launcher == "run":
+        # Imported here, so other commands start without importing Qt.
+        from tray_launcher import cli
+
+        cli.run_pythonw(args.headless)
+        return
+
+    try:
+        if args.launcher == "batch":
+            print_pre_command, commands = get_batch_commands(args)
+        else:
+            print_pre_command, commands = get_commands(args)
+    except ValueError as err:
+        print(err)
         return
 
     print(print_pre_command)
-    tray_launcher_client.TrayLauncherClient(*commands).attempt_connect()
+    stream = args.launcher in ["grep", "start", "terminate", "batch"] or any(
+        getattr(args, name, False) for name in ["follow", "merge"]
+    )
+    tray_launcher_client.TrayLauncherClient(*commands, stream=stream).attempt_connect()
 
 
 def main():
@@ -0,0 +1,391 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time as _t
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from tray_launcher import metrics, protocol
+
+DEFAULT_SEGMENT_SIZE_MB = 64
+
+_BYTES_WRITTEN = metrics.counter(
+    "tray_launcher_log_bytes_written_total", "Bytes of script output written to log segments"
+)
+_SEGMENTS_ROTATED = metrics.counter(
+    "tray_launcher_log_segments_rotated_total", "Log segments closed because they were full"
+)
+_COMPRESSION_SECONDS = metrics.histogram(
+    "tray_launcher_log_compression_seconds", "Time to compress a closed log segment"
+)
+
+# A record of a "<segment>.times" file: the offset of the end of a chunk of output in the
+# segment, and the time the chunk was read from the pipe.
+TIMES_RECORD = struct.Struct("<Qd")
+
+# Frames a capture process sends to the launcher on its stdout (see protocol.encode_frame).
+FRAME_OUTPUT = 1  # A chunk of output.
+FRAME_SEGMENT = 2  # The UTF-8 path of the segment written to after a rotation.
+FRAME_COMPRESSED = 3  # The seconds it took to compress a closed segment, see _SECONDS.
+FRAME_ERROR = 4  # A UTF-8 error message.
+_SECONDS = struct.Struct("<d")
+
+_compressor = None
+_compressor_lock = threading.Lock()
+
+
+def segment_size():
+    """Returns the maximum size of a log segment in bytes, read from the environment variable
+    TRAY_LAUNCHER_LOG_SEGMENT_MB. 0 disables the capture pipeline, in which case scripts write
+    directly to their log file.
+    """
+    try:
+        size_mb = float(os.environ.get("TRAY_LAUNCHER_LOG_SEGMENT_MB", DEFAULT_SEGMENT_SIZE_MB))
+    except ValueError:
+        size_mb = DEFAULT_SEGMENT_SIZE_MB
+    return max(int(size_mb * (1 << 20)), 0)
+
+
+def compressor():
+    """Returns the worker that compresses closed segments, shared by all captures."""
+    global _compressor
+    with _compressor_lock:
+        if _compressor is None:
+            _compressor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="tray_launcher_compressor"
+            )
+        return _compressor
+
+
+def latest_segment(first_segment):
+    """Returns the path of the segment that was written last, given the path of the first
+    segment of a capture. Compressed segments are skipped, since the last segment is never
+    compressed.
+    """
+    latest = first_segment
+    index = 1
+    while True:
+        path = first_segment.with_name("{}.{}.log".format(first_segment.stem, index))
+        if path.exists():
+            latest = path
+        elif not path.with_name(path.name + ".gz").exists():
+            return latest
+        index += 1
+
+
+def times_path(segment):
+    """Returns the path of the capture times of a segment. They are not compressed with it."""
+    name = segment.name[:-3] if segment.name.endswith(".gz") else segment.name
+    return segment.with_name(name + ".times")
+
+
+def compress_segment(path):
+    """Compresses a closed segment to path.gz and removes the original.
+
+    Returns:
+        Path, the path of the compressed segment.
+    """
+    compressed_path = path.with_name(path.name + ".gz")
+    with open(path, "rb") as source, gzip.open(compressed_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1 << 20)
+    os.remove(path)
+    return compressed_path
+
+
+class LogCapture:
+    """Copies the output of a child process from a pipe into size-capped log segments.
+
+    A worker thread reads the pipe in chunks and appends them to the current segment. When a
+    segment would exceed the segment size, it is closed at the last line break and the next
+    one is opened: "<stem>-HH_MM_SS.log", then "<stem>-HH_MM_SS.1.log", and so on. Closed
+    segments are compressed in the background, and the size and compressed size of every
+    segment are recorded in "<stem>-HH_MM_SS.manifest.json". The last segment is left
+    uncompressed when the process exits.
+
+    The time every chunk was read is recorded in "<segment>.times" (see TIMES_RECORD), so the
+    lines of different logs can be merged in the order they were written.
+
+    The tray launcher runs it in a capture process (see CaptureProcess), so that it outlives
+    the launcher.
+    """
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, pipe, first_segment, max_segment_size, monitor=None):
+        """Create a LogCapture instance.
+
+        Args:
+            pipe: binary file object, the read end of the child's stdout pipe.
+            first_segment: Path, path of the first segment.
+            max_segment_size: int, maximum size of a segment in bytes.
+            monitor: _FrameWriter, is told about the output, rotations and compressions if
+                given. Called from the capture and compressor threads.
+        """
+        self.pipe = pipe
+        self.monitor = monitor
+        self.first_segment = first_segment
+        self.max_segment_size = max_segment_size
+        self.manifest_path = first_segment.with_suffix(".manifest.json")
+        self.path = first_segment
+        self.bytes_written = 0
+
+        self._segments = []
+        self._lock = threading.Lock()
+        self._file = open(self.path, "ab")
+        self._times = open(times_path(self.path), "ab")
+        self._segment_size = self._file.tell()
+        self._thread = threading.Thread(
+            target=self._run, name="capture-" + first_segment.stem, daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        fd = self.pipe.fileno()
+        try:
+            while True:
+                chunk = os.read(fd, self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._write(chunk)
+        except OSError as err:
+            logging.error("{}: Failed to capture output for {}.".format(err, self.first_segment))
+        finally:
+            self._file.close()
+            self._times.close()
+            self.pipe.close()
+            self._record_segment(self.path, self._segment_size)
+
+    def _write(self, chunk):
+        now = _t.time()
+        if self.monitor is not None:
+            self.monitor.output(chunk)
+        if self._segment_size + len(chunk) > self.max_segment_size and self._segment_size > 0:
+            split = chunk.rfind(b"\n", 0, max(self.max_segment_size - self._segment_size, 0)) + 1
+            self._write_segment(chunk[:split], now)
+            self._rotate()
+            chunk = chunk[split:]
+
+        self._write_segment(chunk, now)
+
+    def _write_segment(self, data, now):
+        if not data:
+            return
+        # The time is recorded before the output, so readers never see output without a time.
+        self._segment_size += len(data)
+        self._times.write(TIMES_RECORD.pack(self._segment_size, now))
+        self._times.flush()
+        self._file.write(data)
+        self._file.flush()
+        self.bytes_written += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        self._times.close()
+        closed = self.path
+        self._record_segment(closed, self._segment_size)
+        compressor().submit(self._compress, closed)
+
+        self.path = self.first_segment.with_name(
+            "{}.{}.log".format(self.first_segment.stem, len(self._segments))
+        )
+        self._file = open(self.path, "ab")
+        self._times = open(times_path(self.path), "ab")
+        self._segment_size = 0
+        if self.monitor is not None:
+            self.monitor.rotated(self.path)
+
+    def _compress(self, path):
+        started = _t.perf_counter()
+        try:
+            compressed_path = compress_segment(path)
+        except OSError as err:
+            logging.error("{}: Failed to compress {}.".format(err, path))
+            return
+        if self.monitor is not None:
+            self.monitor.compressed(_t.perf_counter() - started)
+        with self._lock:
+            for segment in self._segments:
+                if segment["name"] == path.name:
+                    segment["compressed_name"] = compressed_path.name
+                    segment["compressed_size"] = compressed_path.stat().st_size
+            self._write_manifest()
+
+    def _record_segment(self, path, size):
+        with self._lock:
+            self._segments.append({"name": path.name, "size": size})
+            self._write_manifest()
+
+    def _write_manifest(self):
+        temporary_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        try:
+            with open(temporary_path, "w") as f:
+                json.dump({"segments": self._segments}, f, indent=1)
+            os.replace(temporary_path, self.manifest_path)
+        except OSError as err:
+            logging.error("{}: Failed to write {}.".format(err, self.manifest_path))
+
+
+class CaptureProcess:
+    """Captures the output of a script in a capture process, which runs a LogCapture.
+
+    The capture process owns the read end of the script's pipe and writes the log segments, so
+    the output of a script is still logged after the tray launcher quits or crashes. While the
+    launcher runs, the capture process also sends it frames (see FRAME_OUTPUT) on its stdout,
+    which a thread of the launcher reads to keep the recent output, the path of the current
+    segment and the metrics up to date. Once the launcher is gone, the frames are dropped.
+    """
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, first_segment, max_segment_size, recent_output=None):
+        """Create a CaptureProcess instance and start the capture process. Hand pipe to the
+        script as its stdout and stderr, then call close_pipe().
+
+        Args:
+            first_segment: Path, path of the first segment.
+            max_segment_size: int, maximum size of a segment in bytes.
+            recent_output: OutputRing, also receives the output if given, so the last lines
+                can be read without reading the log.
+
+        Raises:
+            OSError: if the capture process cannot be started.
+        """
+        self.first_segment = first_segment
+        self.path = first_segment
+        self.recent_output = recent_output
+        self.bytes_written = 0
+
+        read_end, self.pipe = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                (sys.executable, str(Path(__file__)), str(first_segment), str(max_segment_size)),
+                stdin=read_end,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+                # Not in the process group of the launcher, so it is not interrupted with it.
+                start_new_session=True,
+            )
+        except OSError:
+            os.close(self.pipe)
+            raise
+        finally:
+            os.close(read_end)
+        self._thread = threading.Thread(
+            target=self._run, name="capture-" + first_segment.stem, daemon=True
+        )
+        self._thread.start()
+
+    def close_pipe(self):
+        """Closes the write end of the pipe in the launcher, once the script has inherited it.
+        The capture process then exits when the script and its children have exited.
+        """
+        os.close(self.pipe)
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        decoder = protocol.FrameDecoder()
+        fd = self.process.stdout.fileno()
+        try:
+            while True:
+                data = os.read(fd, self.CHUNK_SIZE)
+                if not data:
+                    break
+                for frame_type, payload in decoder.feed(data):
+                    self._receive(frame_type, payload)
+        except OSError as err:
+            logging.error("{}: Failed to read the capture of {}.".format(err, self.first_segment))
+        finally:
+            self.process.stdout.close()
+            returncode = self.process.wait()
+            if returncode:
+                logging.error(
+                    "The capture process of {} exited with code {}.".format(
+                        self.first_segment, returncode
+                    )
+                )
+
+    def _receive(self, frame_type, payload):
+        if frame_type == FRAME_OUTPUT:
+            if self.recent_output is not None:
+                self.recent_output.append(payload)
+            self.bytes_written += len(payload)
+            _BYTES_WRITTEN.inc(len(payload))
+        elif frame_type == FRAME_SEGMENT:
+            self.path = Path(str(payload, encoding="utf-8"))
+            _SEGMENTS_ROTATED.inc()
+        elif frame_type == FRAME_COMPRESSED:
+            _COMPRESSION_SECONDS.observe(_SECONDS.unpack(payload)[0])
+        elif frame_type == FRAME_ERROR:
+            logging.error(str(payload, encoding="utf-8", errors="replace"))
+
+
+class _FrameWriter:
+    """Sends frames from a capture process to the launcher, until the launcher is gone."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self._lock = threading.Lock()
+
+    def output(self, chunk):
+        self.send(FRAME_OUTPUT, chunk)
+
+    def rotated(self, path):
+        self.send(FRAME_SEGMENT, str(path).encode("utf-8"))
+
+    def compressed(self, seconds):
+        self.send(FRAME_COMPRESSED, _SECONDS.pack(seconds))
+
+    def send(self, frame_type, payload):
+        with self._lock:
+            if self.fd is None:
+                return
+            data = memoryview(protocol.encode_frame(frame_type, payload))
+            try:
+                while data:
+                    data = data[os.write(self.fd, data) :]
+            except OSError:
+                # The launcher quit. The output is still written to the log.
+                self.fd = None
+
+
+class _FrameHandler(logging.Handler):
+    """Sends the errors logged in a capture process to the launcher, which logs them."""
+
+    def __init__(self, writer):
+        super().__init__(logging.ERROR)
+        self.writer = writer
+
+    def emit(self, record):
+        self.writer.send(FRAME_ERROR, self.format(record).encode("utf-8"))
+
+
+def main():
+    """Runs a capture process: captures stdin into the segments starting at the path given as
+    the first argument, with the maximum segment size given as the second argument.
+    """
+    first_segment, max_segment_size = Path(sys.argv[1]), int(sys.argv[2])
+    writer = _FrameWriter(sys.stdout.fileno())
+    logging.getLogger().addHandler(_FrameHandler(writer))
+    capture = LogCapture(sys.stdin.buffer, first_segment, max_segment_size, writer)
+    capture.start()
+    capture.join()
+    # Closed segments are compressed before the process exits.
+    compressor().shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
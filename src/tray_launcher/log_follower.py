@@ -0,0 +1,132 @@
+import os
+
+from PyQt5.QtCore import QObject, QTimer
+
+ENCODING = "utf-8"
+
+
+def tail_lines(path, count, block_size=8192):
+    """Returns the last lines of a file without reading the whole file.
+
+    Blocks are read backwards from the end until enough newlines are found.
+
+    Args:
+        path: Path, the file to read.
+        count: int, the maximum number of lines to return.
+        block_size: int, the number of bytes read per seek.
+
+    Returns:
+        (list of str, int), the lines, and the size of the file when it was read.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        position = end
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+
+    lines = data.splitlines()[-count:] if count > 0 else []
+    return [str(line, encoding=ENCODING, errors="replace") for line in lines], end
+
+
+class _FollowedLog:
+    def __init__(self, stem):
+        self.stem = stem
+        self.path = None
+        self.offset = 0
+        self.partial = b""
+
+
+class LogFollower(QObject):
+    """Streams the lines appended to the logs of running scripts to a response.
+
+    The current log path of every script is looked up on each poll, so a script is followed
+    through restarts. With more than one script, lines are prefixed with the script stem.
+    """
+
+    POLL_INTERVAL_MS = 250
+    MAX_READ_SIZE = 1 << 20
+
+    def __init__(self, response, stems, log_path_of, lines, parent=None):
+        """Create a LogFollower instance.
+
+        Args:
+            response: Response, the response the lines are written to. It is held
+                until the client disconnects.
+            stems: list of str, stems of the scripts to follow.
+            log_path_of: callable taking a stem and returning the Path of the current log
+                of the script, or None if the script is not running.
+            lines: int, the number of lines to show from the end of each current log.
+            parent: QObject, the parent of the follower.
+        """
+        super().__init__(parent)
+
+        self.response = response
+        self.log_path_of = log_path_of
+        self.logs = [_FollowedLog(stem) for stem in dict.fromkeys(stems)]
+        self.prefix = len(self.logs) > 1
+
+        for log in self.logs:
+            path = self.log_path_of(log.stem)
+            if path is None:
+                self._write(log, "{} is not running. Waiting for it to start.".format(log.stem))
+                continue
+            log.path = path
+            try:
+                tail, log.offset = tail_lines(path, lines)
+            except OSError:
+                continue
+            for line in tail:
+                self._write(log, line)
+
+        self.response.hold()
+        self.response.connection.closed.connect(self.stop)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(self.POLL_INTERVAL_MS)
+
+    def poll(self):
+        for log in self.logs:
+            path = self.log_path_of(log.stem)
+            if log.path is not None:
+                self._read_new_bytes(log)
+            if path is not None and path != log.path:
+                self._flush_partial(log)
+                log.path = path
+                log.offset = 0
+                self._write(log, "==> {} <==".format(path))
+                self._read_new_bytes(log)
+
+    def stop(self):
+        self.timer.stop()
+        self.response.release()
+        self.deleteLater()
+
+    def _read_new_bytes(self, log):
+        try:
+            if os.stat(log.path).st_size <= log.offset:
+                return
+            with open(log.path, "rb") as f:
+                f.seek(log.offset)
+                data = f.read(self.MAX_READ_SIZE)
+        except OSError:
+            return
+
+        log.offset += len(data)
+        lines = (log.partial + data).split(b"\n")
+        log.partial = lines.pop()
+        for line in lines:
+            self._write(log, str(line.rstrip(b"\r"), encoding=ENCODING, errors="replace"))
+
+    def _flush_partial(self, log):
+        if log.partial:
+            self._write(log, str(log.partial, encoding=ENCODING, errors="replace"))
+            log.partial = b""
+
+    def _write(self, log, line):
+        self.response.append("[{}] {}".format(log.stem, line) if self.prefix else line)
@@ -0,0 +1,398 @@
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time as _t
+import zlib
+from array import array
+from itertools import accumulate
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+ENCODING = "utf-8"
+
+LOG_NAME = re.compile(
+    r"^(?P<stem>.+)-(?P<time>\d\d_\d\d_\d\d)(?:\.(?P<segment>\d+))?\.log(?:\.gz)?$"
+)
+DAY_NAME = re.compile(r"^\d{4}_\d\d_\d\d$")
+# Maps letters to lowercase and digits to "0", and every other byte to a space.
+_WORD_BYTES = bytes.maketrans(
+    bytes(range(256)),
+    bytes(
+        c + 32 if 65 <= c <= 90 else 48 if 48 <= c <= 57 else c if 97 <= c <= 122 or c == 95 else 32
+        for c in range(256)
+    ),
+)
+_REGEX_TOKEN = re.compile(r"\\.|\[\]?(?:\\.|[^\]])*\]?|\{[^}]*\}?|[()|.^$*+?]|[^\\\[{()|.^$*+?]+")
+_REGEX_LITERAL = re.compile(r"^[^\\\[{()|.^$*+?]+$")
+# Lookarounds and \A or \Z, which can fail across a line break where a line on its own matches.
+_LINE_CONTEXT = re.compile(r"\(\?<?[=!]|\\[AZ]")
+
+
+def trigrams(data):
+    """Returns the set of 3-byte substrings of the words of data.
+
+    Words are compared case-insensitively, and all digits are treated as "0" so numbers do not
+    flood the index.
+    """
+    grams = set()
+    for word in set(data.translate(_WORD_BYTES).split()):
+        for i in range(len(word) - 2):
+            grams.add(word[i : i + 3])
+    return grams
+
+
+def required_trigrams(pattern):
+    """Returns trigrams that every line matching the regular expression must contain.
+
+    Only runs of literal characters outside of groups, classes and optional parts are used,
+    and nothing is required when the pattern has alternatives, so the result never excludes a
+    line that could match.
+    """
+    if "|" in pattern:
+        return set()
+
+    runs = [""]
+    depth = 0
+    for token in _REGEX_TOKEN.findall(pattern):
+        if token in ("?", "*") or token.startswith("{"):
+            runs[-1] = runs[-1][:-1]
+            runs.append("")
+        elif token in ("(", ")"):
+            depth += 1 if token == "(" else -1
+            runs.append("")
+        elif depth == 0 and _REGEX_LITERAL.match(token):
+            runs[-1] += token
+        else:
+            runs.append("")
+
+    return trigrams(b" ".join(run.encode(ENCODING) for run in runs))
+
+
+def find_logs(logs_directory, stems=None, since=None):
+    """Yields (day, logical name, path) of the log files, oldest first.
+
+    The logical name of a compressed segment is its name without ".gz".
+
+    Args:
+        logs_directory: Path, the directory with one subdirectory of logs per day.
+        stems: collection of str, only logs of these scripts are returned if given.
+        since: str, only logs of this day ("YYYY_MM_DD") or later are returned if given.
+    """
+    try:
+        days = sorted(
+            entry.name
+            for entry in os.scandir(logs_directory)
+            if entry.is_dir() and DAY_NAME.match(entry.name)
+        )
+    except OSError:
+        return
+
+    for day in days:
+        if since is not None and day < since:
+            continue
+        logs = []
+        for entry in os.scandir(logs_directory / day):
+            match = LOG_NAME.match(entry.name)
+            if match is None or (stems and match.group("stem") not in stems):
+                continue
+            segment = int(match.group("segment") or 0)
+            logical_name = entry.name[:-3] if entry.name.endswith(".gz") else entry.name
+            logs.append((match.group("time"), segment, logical_name, entry.path))
+        for _, _, logical_name, path in sorted(logs):
+            yield day, logical_name, path
+
+
+class _Bloom:
+    BITS = 1 << 15
+    SIZE = BITS // 8
+    MAX_CACHED = 1 << 20
+
+    _bits_of = {}
+
+    @classmethod
+    def bits(cls, gram):
+        """Returns ((byte, mask), (byte, mask)) of the two bits set for the trigram."""
+        bits = cls._bits_of.get(gram)
+        if bits is None:
+            positions = (zlib.crc32(gram) % cls.BITS, zlib.crc32(gram, 0x5BD1E995) % cls.BITS)
+            bits = tuple((position >> 3, 1 << (position & 7)) for position in positions)
+            if len(cls._bits_of) < cls.MAX_CACHED:
+                cls._bits_of[gram] = bits
+        return bits
+
+    @classmethod
+    def build(cls, grams):
+        bloom = bytearray(cls.SIZE)
+        for gram in grams:
+            for byte, mask in cls.bits(gram):
+                bloom[byte] |= mask
+        return bytes(bloom)
+
+    @classmethod
+    def contains_all(cls, bloom, offset, grams):
+        for gram in grams:
+            for byte, mask in cls.bits(gram):
+                if not bloom[offset + byte] & mask:
+                    return False
+        return True
+
+
+class LogIndex:
+    """An incrementally built search index over the logs of all scripts.
+
+    Every log file is split into blocks of BLOCK_LINES lines. For every block, the index
+    stores the byte offset of its first line and a Bloom filter of the trigrams of its words,
+    so a search only reads the blocks that may contain a match. Only bytes appended since the
+    last update are read when a file is indexed again. Log files are found through their day
+    directory and file name, so searches restricted to scripts or dates never open other files.
+
+    The index lives under ~/.tray_launcher/index/<day>/, with one catalog.json per day holding
+    the indexed size and line count of every file.
+    """
+
+    BLOCK_LINES = 1024
+    READ_SIZE = 1 << 22
+
+    def __init__(self, logs_directory, index_directory):
+        """Create a LogIndex instance.
+
+        Args:
+            logs_directory: Path, the directory with one subdirectory of logs per day.
+            index_directory: Path, the directory the index is stored in.
+        """
+        self.logs_directory = logs_directory
+        self.index_directory = index_directory
+        self._lock = threading.Lock()
+
+    def find_logs(self, stems=None, since=None):
+        """Yields (day, logical name, path) of the log files, oldest first, see find_logs()."""
+        return find_logs(self.logs_directory, stems, since)
+
+    def search(self, pattern, stems=None, since=None, stop=None):
+        """Yields "<day>/<file>:<line number>: <line>" for every matching line.
+
+        Args:
+            pattern: re.Pattern, the compiled regular expression.
+            stems: collection of str, only logs of these scripts are searched if given.
+            since: str, only logs of this day ("YYYY_MM_DD") or later are searched if given.
+            stop: threading.Event, the search ends early when it is set.
+        """
+        grams = required_trigrams(pattern.pattern)
+        block_pattern = None
+        if not _LINE_CONTEXT.search(pattern.pattern):
+            block_pattern = re.compile(pattern.pattern, pattern.flags | re.MULTILINE)
+        for day, logical_name, path in self.find_logs(stems, since):
+            if stop is not None and stop.is_set():
+                return
+            try:
+                with self._lock:
+                    starts, blooms = self._update(day, logical_name, path)
+                for number, line in self._search_file(
+                    path, starts, blooms, grams, pattern, block_pattern
+                ):
+                    yield "{}/{}:{}: {}".format(day, logical_name, number, line)
+            except (OSError, EOFError, zlib.error) as err:
+                logging.error("{}: Failed to search {}.".format(err, path))
+
+    def _search_file(self, path, starts, blooms, grams, pattern, block_pattern):
+        """Yields (line number, line) of the lines of candidate blocks that pattern matches.
+        Lines after the last complete line are searched as well.
+
+        The pattern is matched against every line on its own, so a match never spans lines,
+        e.g. for "[^:]*Error". If given, block_pattern (the pattern with re.MULTILINE) first
+        skips blocks in which it finds no match at all, since a line that matches on its own
+        then matches within the block as well.
+        """
+        with self._open(path) as f:
+            for block in range(len(starts)):
+                bloom_offset = block * _Bloom.SIZE
+                if (
+                    grams
+                    and bloom_offset < len(blooms)
+                    and not _Bloom.contains_all(blooms, bloom_offset, grams)
+                ):
+                    continue
+
+                f.seek(starts[block])
+                if block + 1 < len(starts):
+                    data = f.read(starts[block + 1] - starts[block])
+                else:
+                    data = f.read()
+                text = str(data, encoding=ENCODING, errors="replace").replace("\r\n", "\n")
+                if block_pattern is not None and not block_pattern.search(text):
+                    continue
+
+                lines = text.split("\n")
+                if not lines[-1]:
+                    lines.pop()
+                first_number = block * self.BLOCK_LINES + 1
+                for number, line in enumerate(lines, first_number):
+                    if pattern.search(line):
+                        yield number, line
+
+    def _open(self, path):
+        if path.endswith(".gz"):
+            return gzip.open(path, "rb")
+        return open(path, "rb")
+
+    def _update(self, day, logical_name, path):
+        """Indexes the complete lines appended to a log since the last update.
+
+        Returns:
+            (array, bytes), the offsets of the first lines of the blocks,
+            and the Bloom filters of the complete blocks.
+        """
+        directory = self.index_directory / day
+        directory.mkdir(parents=True, exist_ok=True)
+        catalog = self._load_catalog(directory)
+        entry = catalog.get(logical_name, {"size": 0, "lines": 0, "compressed": False})
+
+        starts_path = directory / (logical_name + ".blocks")
+        blooms_path = directory / (logical_name + ".bloom")
+        starts, blooms = self._read_index(starts_path, blooms_path, entry)
+
+        compressed = path.endswith(".gz")
+        if compressed and entry["compressed"]:
+            return starts, blooms
+        if not compressed and os.stat(path).st_size < entry["size"]:
+            starts, blooms = array("Q"), b""
+            entry.update(size=0, lines=0)
+
+        complete_blocks = len(blooms) // _Bloom.SIZE
+        position = starts[complete_blocks] if complete_blocks < len(starts) else entry["size"]
+        del starts[complete_blocks:]
+        with self._open(path) as f:
+            entry["size"], entry["lines"], new_blooms = self._index_from(
+                f, position, complete_blocks * self.BLOCK_LINES, starts
+            )
+        blooms += new_blooms
+        entry["compressed"] = compressed
+        entry["blocks"] = len(starts)
+
+        with open(starts_path, "wb") as f:
+            starts.tofile(f)
+        with open(blooms_path, "wb") as f:
+            f.write(blooms)
+        catalog[logical_name] = entry
+        self._save_catalog(directory, catalog)
+        return starts, blooms
+
+    def _index_from(self, f, position, lines, starts):
+        """Indexes the complete lines of a file from position, the start of a block.
+
+        Args:
+            f: binary file object, the log.
+            position: int, offset of the first line to be indexed.
+            lines: int, the number of lines before position.
+            starts: array, the offsets of the first lines of the blocks before position,
+                which is extended with the offsets of the new blocks.
+
+        Returns:
+            (int, int, bytes), the offset of the end of the last complete line, the number of
+            complete lines, and the Bloom filters of the newly completed blocks.
+        """
+        f.seek(position)
+        blooms = []
+        block = bytearray()
+        pending = b""
+        while True:
+            data = f.read(self.READ_SIZE)
+            if not data:
+                return position, lines, b"".join(blooms)
+            data = pending + data
+            end = data.rfind(b"\n") + 1
+            pending = data[end:]
+            if end == 0:
+                continue
+
+            line_ends = list(accumulate(map((1).__add__, map(len, data[: end - 1].split(b"\n")))))
+            cut = 0
+            for first in range((-lines) % self.BLOCK_LINES, len(line_ends), self.BLOCK_LINES):
+                next_cut = line_ends[first - 1] if first > 0 else 0
+                block += data[cut:next_cut]
+                if block:
+                    blooms.append(_Bloom.build(trigrams(bytes(block))))
+                    block = bytearray()
+                starts.append(position + next_cut)
+                cut = next_cut
+            block += data[cut:end]
+            position += end
+            lines += len(line_ends)
+
+    def _read_index(self, starts_path, blooms_path, entry):
+        starts = array("Q")
+        try:
+            with open(starts_path, "rb") as f:
+                starts.frombytes(f.read())
+            with open(blooms_path, "rb") as f:
+                blooms = f.read()
+        except (OSError, ValueError):
+            starts, blooms = array("Q"), b""
+        if len(starts) != entry.get("blocks", 0) or len(blooms) > len(starts) * _Bloom.SIZE:
+            entry.update(size=0, lines=0, compressed=False)
+            return array("Q"), b""
+        return starts, blooms
+
+    def _load_catalog(self, directory):
+        try:
+            with open(directory / "catalog.json", "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_catalog(self, directory, catalog):
+        temporary_path = directory / "catalog.json.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(catalog, f)
+        os.replace(temporary_path, directory / "catalog.json")
+
+
+class GrepWorker(QThread):
+    """Runs a LogIndex search on a worker thread, emitting matching lines in batches."""
+
+    found = pyqtSignal(list)
+
+    BATCH_SIZE = 100
+    BATCH_DELAY = 0.1
+
+    def __init__(self, index, pattern, stems, since, max_count, parent=None):
+        """Create a GrepWorker instance.
+
+        Args:
+            index: LogIndex, the index to search.
+            pattern: re.Pattern, the compiled regular expression.
+            stems: list of str, only logs of these scripts are searched if not empty.
+            since: str, only logs of this day ("YYYY_MM_DD") or later are searched if given.
+            max_count: int, the search stops after this many matches if not 0.
+            parent: QObject, the parent of the worker.
+        """
+        super().__init__(parent)
+
+        self.index = index
+        self.pattern = pattern
+        self.stems = set(stems)
+        self.since = since
+        self.max_count = max_count
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        batch = []
+        count = 0
+        last_emit = _t.monotonic()
+        for line in self.index.search(self.pattern, self.stems, self.since, self.stop_event):
+            batch.append(line)
+            count += 1
+            if self.stop_event.is_set() or count == self.max_count:
+                break
+            if len(batch) >= self.BATCH_SIZE or _t.monotonic() - last_emit > self.BATCH_DELAY:
+                self.found.emit(batch)
+                batch = []
+                last_emit = _t.monotonic()
+        if batch:
+            self.found.emit(batch)
@@ -0,0 +1,530 @@
+import gzip
+import heapq
+import itertools
+import json
+import re
+import threading
+import time as _t
+from pathlib import Path
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from tray_launcher import log_capture, log_index
+
+ENCODING = "utf-8"
+
+# A date and time in a line, e.g. "2021-06-30 12:00:00.123", used for logs without times.
+TIMESTAMP = re.compile(rb"(\d{4})[-_/](\d\d)[-_/](\d\d)[ T_](\d\d):(\d\d):(\d\d)(?:[.,](\d{1,6}))?")
+TIMESTAMP_SIZE = 64
+
+
+def text_time(line):
+    """Returns the time of a timestamp near the start of a line in seconds since the epoch,
+    or None if the line has no timestamp.
+    """
+    match = TIMESTAMP.search(line, 0, TIMESTAMP_SIZE)
+    if match is None:
+        return None
+    try:
+        seconds = _t.mktime(tuple(int(field) for field in match.groups()[:6]) + (0, 0, -1))
+    except (OverflowError, ValueError):
+        return None
+    fraction = match.group(7)
+    return seconds + int(fraction) / 10 ** len(fraction) if fraction else seconds
+
+
+class CaptureTimes:
+    """The times the chunks of a log segment were captured, read from its ".times" file.
+
+    The records are read in blocks while the lines of the segment are read in order
+    (time_of()), or bisected (offset_of() and time_at()), so the file is never read at once.
+    The file is only open during a call, so any number of segments can be read together.
+    """
+
+    BLOCK_RECORDS = 4096
+
+    def __init__(self, path):
+        self.path = path
+        self.end = 0
+        self.time = None
+        self._records = []
+        self._next = 0
+        self._position = 0
+
+    @classmethod
+    def open(cls, segment):
+        """Returns the CaptureTimes of a segment, or None if its times were not recorded."""
+        path = log_capture.times_path(segment)
+        return cls(path) if path.exists() else None
+
+    def read(self, first, count):
+        """Returns a list of up to count records (end offset, time), from record first on."""
+        size = log_capture.TIMES_RECORD.size
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(first * size)
+                data = f.read(count * size)
+        except OSError:
+            return []
+        # The last record may be partly written.
+        return list(log_capture.TIMES_RECORD.iter_unpack(data[: len(data) - len(data) % size]))
+
+    def count(self):
+        try:
+            return self.path.stat().st_size // log_capture.TIMES_RECORD.size
+        except OSError:
+            return 0
+
+    def last_time(self):
+        """Returns the time of the last chunk, or None if there is none."""
+        count = self.count()
+        return self.read(count - 1, 1)[0][1] if count else None
+
+    def offset_of(self, time):
+        """Returns the offset of the first chunk captured at time or later, or the end of the
+        segment if there is none.
+        """
+        index = self._bisect(1, time)
+        return self.read(index - 1, 1)[0][0] if index else 0
+
+    def time_at(self, offset):
+        """Returns the time of the chunk with the byte at offset, or None if there is none."""
+        records = self.read(self._bisect(0, offset + 1), 1)
+        return records[0][1] if records else None
+
+    def seek(self, offset):
+        """Makes time_of() continue with the line at offset."""
+        self._position = self._bisect(0, offset + 1)
+        self._records = []
+        self._next = 0
+        self.end = 0
+
+    def time_of(self, end):
+        """Returns the capture time of the line that ends at offset end, which is the time of
+        the chunk with its last byte, or None if it was not recorded. Lines must be passed in
+        order.
+        """
+        while self.end < end:
+            if self._next == len(self._records):
+                self._records = self.read(self._position, self.BLOCK_RECORDS)
+                self._next = 0
+                self._position += len(self._records)
+                if not self._records:
+                    return None
+            self.end, self.time = self._records[self._next]
+            self._next += 1
+        return self.time
+
+    def _bisect(self, field, value):
+        """Returns the index of the first record whose field is at least value."""
+        low, high = 0, self.count()
+        while low < high:
+            middle = (low + high) // 2
+            records = self.read(middle, 1)
+            if records and records[0][field] < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class Run:
+    """The log of one run of a script: "<stem>-HH_MM_SS.log" and the segments after it."""
+
+    def __init__(self, stem, first_segment, started):
+        """Create a Run instance.
+
+        Args:
+            stem: str, the stem of the script.
+            first_segment: Path, the path of the first segment, without ".gz".
+            started: float, the time the run started in seconds since the epoch.
+        """
+        self.stem = stem
+        self.first_segment = first_segment
+        self.started = started
+        self.manifest_path = first_segment.with_suffix(".manifest.json")
+
+    def segment(self, index):
+        """Returns the path of a segment, compressed or not, or None if it does not exist."""
+        path = self.first_segment
+        if index:
+            path = path.with_name("{}.{}.log".format(path.stem, index))
+        if path.exists():
+            return path
+        compressed = path.with_name(path.name + ".gz")
+        return compressed if compressed.exists() else None
+
+    def closed(self, index):
+        """Returns whether a segment is complete, as recorded in the manifest of the run."""
+        name = self.first_segment.name
+        if index:
+            name = "{}.{}.log".format(self.first_segment.stem, index)
+        try:
+            with open(self.manifest_path) as f:
+                segments = json.load(f)["segments"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        return any(segment.get("name") == name for segment in segments)
+
+    def modified(self):
+        """Returns the time the run was last written to."""
+        latest = log_capture.latest_segment(self.first_segment)
+        for path in (latest, latest.with_name(latest.name + ".gz")):
+            try:
+                return path.stat().st_mtime
+            except OSError:
+                pass
+        return self.started
+
+
+def find_runs(logs_directory, stems=None, since=None, until=None, first_day=None):
+    """Returns the runs with lines captured in a time window, oldest first.
+
+    Args:
+        logs_directory: Path, the directory with one subdirectory of logs per day.
+        stems: collection of str, only runs of these scripts are returned if given.
+        since: float, only runs written to at this time or later, and the latest run of every
+            script, which may still be written to, are returned if given.
+        until: float, only runs started at this time or earlier are returned if given.
+        first_day: str, only runs of this day ("YYYY_MM_DD") or later are returned if given.
+    """
+    runs = []
+    for day, logical_name, path in log_index.find_logs(logs_directory, stems, first_day):
+        match = log_index.LOG_NAME.match(logical_name)
+        if match.group("segment") is not None:
+            continue
+        try:
+            started = _t.mktime(_t.strptime(day + match.group("time"), "%Y_%m_%d%H_%M_%S"))
+        except (OverflowError, ValueError):
+            continue
+        if until is None or started <= until:
+            runs.append(Run(match.group("stem"), Path(path).with_name(logical_name), started))
+
+    latest = {run.stem: run for run in runs}
+    return [
+        run for run in runs if since is None or latest[run.stem] is run or run.modified() >= since
+    ]
+
+
+class RunReader:
+    """Reads the lines of a run in order, with the times they were captured.
+
+    The time of a line is read from the ".times" file of its segment. For logs written without
+    one, it is taken from a timestamp in the line, or else the line gets the time of the line
+    before it. Times never decrease within a run. The segments are read READ_SIZE bytes at a
+    time, and a plain segment is only open while it is read, so it can be compressed.
+    """
+
+    READ_SIZE = 1 << 16
+    LINE_LOOKBACK = 1 << 16
+    # Output captured up to this long before the end of a segment was read may still be
+    # written to it.
+    GRACE = 0.5
+
+    def __init__(self, run, since=None, until=None, follow=False):
+        """Create a RunReader instance.
+
+        Args:
+            run: Run, the run to read.
+            since: float, lines captured before this time are skipped if given.
+            until: float, lines captured after this time are skipped if given.
+            follow: bool, whether to wait for new lines until the run ends.
+        """
+        self.run = run
+        self.since = since
+        self.until = until
+        self.follow = follow
+        self.index = 0
+        self.offset = 0
+        self.times = None
+        self.last_time = run.started
+        self._file = None
+        self._pending = b""
+        self._draining = False
+
+    def lines(self, stop=None):
+        """Yields (time, line) for the lines of the run, where line is bytes. While waiting
+        for new lines, yields (time, None), where no line captured after the call is earlier
+        than time.
+
+        Args:
+            stop: threading.Event, reading ends early when it is set.
+        """
+        self._seek()
+        try:
+            while stop is None or not stop.is_set():
+                lines = self._read() or self._at_end()
+                if lines is None:
+                    return
+                for time, line in lines:
+                    if self.until is not None and time > self.until:
+                        return
+                    if line is None or self.since is None or time >= self.since:
+                        yield time, line
+        finally:
+            self._close()
+
+    def _at_end(self):
+        """Returns what comes after the end of the segment: [] to read on, a list with the
+        last line of the run if it has no line break, [(time, None)] while waiting for new
+        lines, or None if the run has ended.
+        """
+        if self._draining:
+            # The segment was complete before it was read to its end.
+            self._draining = False
+            if self._next_segment():
+                return []
+            if not self._pending:
+                return None
+            line, self._pending = self._pending, b""
+            return [(self._line_time(self.offset, line), line)]
+        if not self.follow or self._complete():
+            self._draining = True
+            return []
+        return [(max(_t.time() - self.GRACE, self.last_time), None)]
+
+    def _complete(self):
+        return self.run.segment(self.index + 1) is not None or self.run.closed(self.index)
+
+    def _seek(self):
+        """Skips the segments and lines captured before since."""
+        path = self.run.segment(0)
+        self.times = None if path is None else CaptureTimes.open(path)
+        if self.since is None:
+            return
+        while self.times is not None:
+            last_time = self.times.last_time()
+            if last_time is None or last_time >= self.since or not self._next_segment():
+                break
+        if self.times is not None:
+            self.offset = self._line_start(self.times.offset_of(self.since))
+            self.times.seek(self.offset)
+
+    def _line_start(self, offset):
+        """Returns the offset of the line with the byte at offset."""
+        start = max(offset - self.LINE_LOOKBACK, 0)
+        if offset == 0 or not self._open():
+            return offset
+        self._file.seek(start)
+        data = self._file.read(offset - start)
+        self._close()
+        newline = data.rfind(b"\n")
+        if newline != -1:
+            return start + newline + 1
+        return 0 if start == 0 else offset
+
+    def _next_segment(self):
+        """Moves to the next segment. Returns False if there is none."""
+        path = self.run.segment(self.index + 1)
+        if path is None:
+            return False
+        self._close()
+        self.index += 1
+        self.offset = 0
+        self.times = CaptureTimes.open(path)
+        return True
+
+    def _open(self):
+        if self._file is None:
+            path = self.run.segment(self.index)
+            if path is None:
+                return False
+            try:
+                self._file = gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+            except OSError:
+                return False
+        return True
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+
+    def _read(self):
+        """Returns a list of (time, line) of the complete lines read from the segment, which
+        is empty at its end.
+        """
+        if not self._open():
+            return []
+        try:
+            self._file.seek(self.offset)
+            data = self._file.read(self.READ_SIZE)
+        except (OSError, EOFError):
+            data = b""
+        # Compressed segments stay open, as reopening them means decompressing them again.
+        if not data or not isinstance(self._file, gzip.GzipFile):
+            self._close()
+        self.offset += len(data)
+        if data:
+            self._draining = False
+
+        data = self._pending + data
+        end = data.rfind(b"\n") + 1
+        if end == 0 and len(data) >= self.READ_SIZE:
+            # A line longer than READ_SIZE is split rather than kept in memory.
+            end = len(data)
+        self._pending = data[end:]
+        lines = data[:end].split(b"\n")
+        if not lines[-1]:
+            lines.pop()
+
+        position = self.offset - len(data)
+        result = []
+        for line in lines:
+            position = min(position + len(line) + 1, self.offset - len(self._pending))
+            result.append((self._line_time(position, line), line.rstrip(b"\r")))
+        return result
+
+    def _line_time(self, end, line):
+        time = self.times.time_of(end) if self.times is not None else None
+        if time is None:
+            time = text_time(line)
+        if time is None or time < self.last_time:
+            time = self.last_time
+        self.last_time = time
+        return time
+
+
+class MergeWorker(QThread):
+    """Merges the lines of the logs of scripts in the order they were captured on a worker
+    thread, emitting them in batches as "HH:MM:SS.mmm [stem] line", with a line
+    "==> YYYY-MM-DD <==" before the first line of every day.
+
+    Every run is read by a RunReader, and a heap holds the next line of every run, so memory
+    does not grow with the size of the logs. When following, a run that has no new lines holds
+    back the lines of other runs for up to RunReader.GRACE seconds, and runs started later are
+    added as they are found.
+    """
+
+    found = pyqtSignal(list)
+
+    BATCH_SIZE = 100
+    BATCH_DELAY = 0.1
+    POLL_INTERVAL = 0.25
+    RESCAN_INTERVAL = 1.0
+
+    def __init__(self, logs_directory, stems, since, until, follow, parent=None):
+        """Create a MergeWorker instance.
+
+        Args:
+            logs_directory: Path, the directory with one subdirectory of logs per day.
+            stems: list of str, only logs of these scripts are merged if not empty.
+            since: float, lines captured before this time are skipped if given.
+            until: float, lines captured after this time are skipped if given.
+            follow: bool, whether to wait for new lines, until the client disconnects.
+            parent: QObject, the parent of the worker.
+        """
+        super().__init__(parent)
+
+        self.logs_directory = logs_directory
+        self.stems = set(stems)
+        self.since = since
+        self.until = until
+        self.follow = follow
+        self.stop_event = threading.Event()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._known = set()
+        self._batch = []
+        self._last_emit = _t.monotonic()
+        self._day = None
+        self._second = None
+        self._clock = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        scanned = _t.time()
+        self._add_runs(find_runs(self.logs_directory, self.stems, self.since, self.until))
+        waited = scanned
+        while not self.stop_event.is_set():
+            if self.follow and _t.time() - scanned > self.RESCAN_INTERVAL:
+                scanned = self._rescan(scanned)
+            if not self._heap:
+                if not self.follow or (self.until is not None and _t.time() > self.until):
+                    break
+                self._wait()
+                continue
+
+            time, _, stem, line, lines = self._heap[0]
+            if line is not None:
+                self._append(time, stem, line)
+            elif time + RunReader.GRACE >= waited:
+                # Every run was read to its end since the last wait.
+                self._wait()
+                waited = _t.time()
+            entry = next(lines, None)
+            if entry is None:
+                heapq.heappop(self._heap)
+            else:
+                heapq.heapreplace(
+                    self._heap, (entry[0], next(self._sequence), stem, entry[1], lines)
+                )
+        self._emit()
+
+    def _add_runs(self, runs):
+        latest = {run.stem: run for run in runs}
+        for run in runs:
+            self._known.add(run.first_segment)
+            reader = RunReader(run, self.since, self.until, self.follow and latest[run.stem] is run)
+            self._push(run.stem, reader.lines(self.stop_event))
+
+    def _rescan(self, scanned):
+        """Adds the runs started since the last scan. Returns the time of this scan."""
+        now = _t.time()
+        # Names of runs have whole seconds.
+        runs = find_runs(
+            self.logs_directory,
+            self.stems,
+            self.since,
+            self.until,
+            _t.strftime("%Y_%m_%d", _t.localtime(scanned - 1)),
+        )
+        self._add_runs(
+            [
+                run
+                for run in runs
+                if run.started >= int(scanned) - 1 and run.first_segment not in self._known
+            ]
+        )
+        return now
+
+    def _push(self, stem, lines):
+        entry = next(lines, None)
+        if entry is not None:
+            heapq.heappush(self._heap, (entry[0], next(self._sequence), stem, entry[1], lines))
+
+    def _append(self, time, stem, line):
+        second = int(time)
+        if second != self._second:
+            self._second = second
+            local = _t.localtime(second)
+            day = _t.strftime("%Y-%m-%d", local)
+            if day != self._day:
+                self._day = day
+                self._batch.append("==> {} <==".format(day))
+            self._clock = _t.strftime("%H:%M:%S", local)
+        self._batch.append(
+            "{}.{:03d} [{}] {}".format(
+                self._clock,
+                int((time - second) * 1000),
+                stem,
+                str(line, encoding=ENCODING, errors="replace"),
+            )
+        )
+        if (
+            len(self._batch) >= self.BATCH_SIZE
+            or _t.monotonic() - self._last_emit > self.BATCH_DELAY
+        ):
+            self._emit()
+
+    def _emit(self):
+        if self._batch:
+            self.found.emit(self._batch)
+        self._batch = []
+        self._last_emit = _t.monotonic()
+
+    def _wait(self):
+        self._emit()
+        self.stop_event.wait(self.POLL_INTERVAL)
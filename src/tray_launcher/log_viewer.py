@@ -0,0 +1,782 @@
+import mmap
+import os
+import re
+import threading
+import time as _t
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import partial
+
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QFontDatabase, QPainter
+from PyQt5.QtWidgets import (
+    QAbstractScrollArea,
+    QCheckBox,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+from tray_launcher import log_merge
+
+ENCODING = "utf-8"
+
+# A date and time near the start of a line, e.g. "2021-06-30 12:00:00" or "2021_06_30T12:00:00".
+_TIMESTAMP = re.compile(rb"(\d{4})[-_/](\d\d)[-_/](\d\d)[ T_](\d\d):(\d\d):(\d\d)")
+_TIME_INPUT = re.compile(
+    r"^\s*(?:(\d{4})[-_/](\d\d)[-_/](\d\d)[ T_]+)?(\d{1,2}):(\d\d)(?::(\d\d))?\s*$"
+)
+
+
+def parse_time(text):
+    """Returns the key of a time entered by the user, or None if it is not a time.
+
+    Args:
+        text: str, "YYYY-MM-DD HH:MM[:SS]" or "HH:MM[:SS]".
+
+    Returns:
+        bytes, b"YYYYMMDDHHMMSS", or b"HHMMSS" if no date was given.
+    """
+    match = _TIME_INPUT.match(text)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second = match.groups()
+    key = "{:0>2}{}{}".format(hour, minute, second or "00")
+    if year is not None:
+        key = year + month + day + key
+    return key.encode()
+
+
+class LineIndex:
+    """The offsets of the lines of a log file, which is memory-mapped.
+
+    The index is built from the end of the file towards its start one step at a time, so the
+    last lines can be shown before the rest of the file is read, and refresh() extends it with
+    the lines appended since. Lines are numbered relative to the end of the file when it was
+    opened, so the lines before it have negative numbers until the index is complete. Only
+    the offset of one line every CHECKPOINT_SIZE bytes is stored, and the lines between two
+    checkpoints are found by scanning the mapped file.
+
+    index_backward() and extend_to() may be called on worker threads, all other methods must
+    be called on one thread.
+    """
+
+    CHECKPOINT_SIZE = 1 << 16
+    STEP_SIZE = 1 << 20
+    SEARCH_SIZE = 1 << 22
+    MAX_LINE_SIZE = 4096
+    TIMESTAMP_SIZE = 64
+    PROBE_SIZE = 1 << 16
+
+    def __init__(self, path):
+        """Create a LineIndex instance. Nothing is indexed until index_backward() is called.
+
+        Args:
+            path: Path, the log file.
+
+        Raises:
+            OSError: if the file cannot be opened.
+        """
+        self.path = path
+        self.size = 0
+        self._file = open(path, "rb")
+        self._map = b""
+        self._lock = threading.Lock()
+        self._step_lock = threading.Lock()
+        self._generation = 0
+        self._reset(b"", 0)
+        self.refresh()
+
+    @property
+    def line_count(self):
+        """The number of lines indexed, including an incomplete last line."""
+        return self.end_line - self.first_line + (1 if self.size > self.end else 0)
+
+    @property
+    def complete(self):
+        """Whether all lines from the start of the file are indexed."""
+        return self.start == 0
+
+    def progress(self):
+        """Returns the fraction of the file that is indexed."""
+        return (self.size - self.start) / self.size if self.size else 1.0
+
+    def line_number(self, line):
+        """Returns the 1-based number of a line counted from the start of the file, or None if
+        it is not known yet.
+        """
+        return line - self.first_line + 1 if self.complete else None
+
+    def refresh(self):
+        """Indexes the lines appended since the last refresh. The index starts over at the end
+        of the file if it was truncated.
+
+        Returns:
+            bool, whether the file changed.
+        """
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size == self.size:
+                return False
+            mapped = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) if size else b""
+        except (OSError, ValueError):
+            return False
+        if size < self.size or not self.size:
+            with self._lock:
+                self._reset(mapped, size)
+            return True
+
+        offsets, lines, end, end_line = self._scan_forward(mapped, self.end, size, self.end_line)
+        with self._lock:
+            # Mappings are never closed while in use, only replaced; the old one is closed
+            # once no thread refers to it any more.
+            self._map = mapped
+            self.size = size
+            self._forward_offsets.extend(offsets)
+            self._forward_lines.extend(lines)
+            self.end = end
+            self.end_line = end_line
+        return True
+
+    def index_backward(self, step=None, stop=None):
+        """Indexes the lines before the first indexed line.
+
+        Args:
+            step: int, the number of bytes to index, STEP_SIZE by default. The step ends at
+                the start of a line, so a little more may be indexed.
+            stop: threading.Event, indexing ends early when it is set.
+
+        Returns:
+            bool, whether lines before the indexed lines remain.
+        """
+        with self._step_lock:
+            with self._lock:
+                mapped, position, line = self._map, self.start, self.first_line
+                generation = self._generation
+            limit = max(position - (step or self.STEP_SIZE), 0)
+            offsets, lines = array("q"), array("q")
+            while position > limit and not (stop is not None and stop.is_set()):
+                piece_start = max(position - self.CHECKPOINT_SIZE, 0)
+                line_start = mapped.rfind(b"\n", 0, piece_start) + 1 if piece_start else 0
+                line -= mapped[line_start:position].count(b"\n")
+                position = line_start
+                # Stored negated, so that both arrays are in ascending order.
+                offsets.append(-position)
+                lines.append(-line)
+
+            with self._lock:
+                if generation != self._generation:
+                    return True
+                self._backward_offsets.extend(offsets)
+                self._backward_lines.extend(lines)
+                self.start = position
+                self.first_line = line
+            return position > 0
+
+    def extend_to(self, offset, stop=None):
+        """Indexes the lines before the first indexed line until the line at offset is indexed.
+
+        Returns:
+            bool, whether the line at offset is indexed.
+        """
+        while self.start > offset and not (stop is not None and stop.is_set()):
+            self.index_backward(stop=stop)
+        return self.start <= offset
+
+    def offset(self, line):
+        """Returns the offset of the start of a line, or of the end of the file if the line is
+        after the last line.
+        """
+        with self._lock:
+            mapped, size = self._map, self.size
+            line = min(max(line, self.first_line), self.end_line + 1)
+            position, checkpoint_line = self._checkpoint(min(line, self.end_line))
+        for _ in range(line - checkpoint_line):
+            position = mapped.find(b"\n", position, size) + 1
+            if position == 0:
+                return size
+        return position
+
+    def lines(self, first, count):
+        """Returns the text of up to count lines from line first. Lines longer than
+        MAX_LINE_SIZE bytes are cut.
+        """
+        position = self.offset(max(first, self.first_line))
+        with self._lock:
+            mapped, size = self._map, self.size
+        lines = []
+        while len(lines) < count and position < size:
+            end = mapped.find(b"\n", position, size)
+            if end == -1:
+                end = size
+            data = mapped[position : min(end, position + self.MAX_LINE_SIZE)]
+            lines.append(str(data.rstrip(b"\r"), encoding=ENCODING, errors="replace"))
+            position = end + 1
+        return lines
+
+    def line_of(self, offset):
+        """Returns the number of the line containing offset, or None if it is not indexed."""
+        with self._lock:
+            mapped = self._map
+            if offset < self.start:
+                return None
+            if offset >= self._forward_offsets[0]:
+                i = bisect_right(self._forward_offsets, offset) - 1
+                position, line = self._forward_offsets[i], self._forward_lines[i]
+            else:
+                i = bisect_left(self._backward_offsets, -offset)
+                position, line = -self._backward_offsets[i], -self._backward_lines[i]
+        return line + mapped[position:offset].count(b"\n")
+
+    def search(self, pattern, offset, backward=False, stop=None):
+        """Returns the offset of the first match of a regular expression at or after offset,
+        or of the last match before offset if backward.
+
+        Args:
+            pattern: re.Pattern, a compiled bytes pattern. It is matched within lines.
+            offset: int, the offset the search starts at, the start of a line.
+            backward: bool, search towards the start of the file.
+            stop: threading.Event, the search ends early when it is set.
+
+        Returns:
+            int, the offset of the match, or None if there is none.
+        """
+        with self._lock:
+            mapped, size = self._map, self.size
+        while not (stop is not None and stop.is_set()):
+            if backward:
+                if offset <= 0:
+                    return None
+                start = max(offset - self.SEARCH_SIZE, 0)
+                start = mapped.rfind(b"\n", 0, start) + 1 if start else 0
+                found = self._last_match(pattern, mapped, start, offset)
+                if found is not None:
+                    return found
+                offset = start
+            else:
+                if offset >= size:
+                    return None
+                end = min(offset + self.SEARCH_SIZE, size)
+                if end < size:
+                    end = mapped.rfind(b"\n", offset, end) + 1 or end
+                found = self._first_match(pattern, mapped, offset, end)
+                if found is not None:
+                    return found
+                offset = end
+        return None
+
+    @staticmethod
+    def _first_match(pattern, mapped, start, end):
+        """Returns the offset of the first match of pattern within a single line between start
+        and end, which are line boundaries, or None.
+        """
+        while start < end:
+            found = pattern.search(mapped, start, end)
+            if found is None:
+                return None
+            # A match can span lines, so the line it starts in is matched on its own.
+            begin = mapped.rfind(b"\n", start, found.start()) + 1 or start
+            line_end = mapped.find(b"\n", found.start(), end)
+            line_end = end if line_end == -1 else line_end
+            found = pattern.search(mapped, begin, line_end)
+            if found is not None:
+                return found.start()
+            start = line_end + 1
+        return None
+
+    @staticmethod
+    def _last_match(pattern, mapped, start, end):
+        """Returns the offset of a match of pattern within the last line between start and end,
+        which are line boundaries, that has one, or None.
+        """
+        while start < end:
+            found = None
+            for match in pattern.finditer(mapped, start, end):
+                if match.start() < end:
+                    found = match
+            if found is None:
+                return None
+            # A match can span lines and hide matches in the lines it covers, so these lines
+            # are matched on their own, the last first.
+            first = mapped.rfind(b"\n", start, found.start()) + 1 or start
+            line_end = mapped.find(b"\n", max(found.end() - 1, found.start()), end)
+            line_end = end if line_end == -1 else line_end
+            while line_end >= first:
+                begin = mapped.rfind(b"\n", first, line_end) + 1 or first
+                match = pattern.search(mapped, begin, line_end)
+                if match is not None:
+                    return match.start()
+                line_end = begin - 1
+            end = first
+        return None
+
+    def offset_of_time(self, key, near=0, stop=None):
+        """Returns the offset of the first line with a timestamp at or after a time, found by
+        bisecting the file. Lines are expected to start with increasing timestamps, lines
+        without a timestamp are skipped. If the times the lines were captured were recorded
+        (see log_merge.CaptureTimes), they are bisected instead.
+
+        Args:
+            key: bytes, b"YYYYMMDDHHMMSS", or b"HHMMSS" for the day of the first timestamp at
+                or after near.
+            near: int, an offset, where the day is taken from if key has no date.
+            stop: threading.Event, the search ends early when it is set.
+
+        Returns:
+            int, the offset, or None if no timestamp was found.
+        """
+        times = log_merge.CaptureTimes.open(self.path)
+        if times is not None and times.count():
+            return self._offset_of_capture_time(times, key, near)
+
+        with self._lock:
+            mapped, size = self._map, self.size
+        if len(key) == 6:
+            found = self._timestamp_after(mapped, near, size) or self._timestamp_after(
+                mapped, 0, size
+            )
+            if found is None:
+                return None
+            key = found[1][:8] + key
+
+        low, high = 0, size
+        seen = False
+        while high - low > self.PROBE_SIZE and not (stop is not None and stop.is_set()):
+            middle = (low + high) // 2
+            found = self._timestamp_after(mapped, middle, high)
+            if found is None:
+                high = middle
+                continue
+            seen = True
+            if found[1] < key:
+                low = found[0] + 1
+            else:
+                high = found[0]
+
+        found = None
+        while not (stop is not None and stop.is_set()):
+            found = self._timestamp_after(mapped, low, size)
+            if found is None or found[1] >= key:
+                break
+            seen = True
+            low = found[0] + 1
+        if found is not None:
+            return found[0]
+        # The time is after the last timestamp, or after a gap without timestamps.
+        return high if seen else None
+
+    def _offset_of_capture_time(self, times, key, near):
+        if len(key) == 6:
+            day = _t.localtime(times.time_at(near) or times.last_time())
+            key = _t.strftime("%Y%m%d", day).encode() + key
+        try:
+            seconds = _t.mktime(_t.strptime(str(key, encoding="ascii"), "%Y%m%d%H%M%S"))
+        except (OverflowError, ValueError):
+            return None
+        return min(times.offset_of(seconds), self.size)
+
+    def close(self):
+        with self._lock:
+            self._map = b""
+            self.size = 0
+        self._file.close()
+
+    def _reset(self, mapped, size):
+        """Starts the index over at the end of the file. Must be called with the lock."""
+        self._generation += 1
+        self._map = mapped
+        self.size = size
+        # The lines from start to end are indexed; the line at end is line end_line.
+        self.end = mapped.rfind(b"\n") + 1 if size else 0
+        self.start = self.end
+        self.first_line = 0
+        self.end_line = 0
+        self._forward_offsets = array("q", [self.end])
+        self._forward_lines = array("q", [0])
+        self._backward_offsets = array("q")
+        self._backward_lines = array("q")
+
+    def _checkpoint(self, line):
+        """Returns (offset, line) of the last checkpoint at or before an indexed line. Must be
+        called with the lock.
+        """
+        if line >= 0:
+            i = bisect_right(self._forward_lines, line) - 1
+            return self._forward_offsets[i], self._forward_lines[i]
+        i = bisect_left(self._backward_lines, -line)
+        return -self._backward_offsets[i], -self._backward_lines[i]
+
+    def _scan_forward(self, mapped, position, size, line):
+        """Returns the checkpoints of the complete lines from position, and the offset and
+        number of the line after them.
+        """
+        offsets, lines = array("q"), array("q")
+        while position < size:
+            end = mapped.rfind(b"\n", position, min(position + self.CHECKPOINT_SIZE, size))
+            if end == -1:
+                end = mapped.find(b"\n", position + self.CHECKPOINT_SIZE, size)
+                if end == -1:
+                    break
+            line += mapped[position : end + 1].count(b"\n")
+            position = end + 1
+            offsets.append(position)
+            lines.append(line)
+        return offsets, lines, position, line
+
+    def _timestamp_after(self, mapped, offset, limit):
+        """Returns (offset, key) of the first line starting at or after offset with a
+        timestamp, looking at most PROBE_SIZE bytes and not beyond limit, or None.
+        """
+        position = mapped.rfind(b"\n", 0, offset) + 1 if offset else 0
+        if position < offset:
+            position = mapped.find(b"\n", offset, limit) + 1
+            if position == 0:
+                return None
+        limit = min(limit, position + self.PROBE_SIZE)
+        while position < limit:
+            end = mapped.find(b"\n", position, limit)
+            if end == -1:
+                end = limit
+            found = _TIMESTAMP.search(mapped, position, min(end, position + self.TIMESTAMP_SIZE))
+            if found is not None:
+                return position, b"".join(found.groups())
+            position = end + 1
+        return None
+
+
+class IndexWorker(QThread):
+    """Builds a LineIndex from the end of its file to the start on a worker thread."""
+
+    progress = pyqtSignal()
+
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        last_progress = _t.monotonic()
+        while not self.stop_event.is_set() and self.index.index_backward(stop=self.stop_event):
+            if _t.monotonic() - last_progress > self.PROGRESS_INTERVAL:
+                self.progress.emit()
+                last_progress = _t.monotonic()
+        self.progress.emit()
+
+
+class LocateWorker(QThread):
+    """Finds an offset in a log on a worker thread, e.g. of a search match, and emits the
+    number of its line, or None if there is none.
+    """
+
+    located = pyqtSignal(object)
+
+    def __init__(self, index, find, parent=None):
+        """Create a LocateWorker instance.
+
+        Args:
+            index: LineIndex, the index of the log.
+            find: callable taking a threading.Event that is set to stop early, and returning
+                an offset or None.
+            parent: QObject, the parent of the worker.
+        """
+        super().__init__(parent)
+        self.index = index
+        self.find = find
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        offset = self.find(self.stop_event)
+        if offset is None or not self.index.extend_to(offset, self.stop_event):
+            self.located.emit(None)
+            return
+        self.located.emit(self.index.line_of(offset))
+
+
+class LogView(QAbstractScrollArea):
+    """Draws the lines of a LineIndex that are visible, and nothing else.
+
+    While following, the view stays at the end of the log as it grows. Scrolling up stops
+    following, and scrolling to the end starts it again.
+    """
+
+    follow_changed = pyqtSignal(bool)
+
+    MARGIN = 4
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.top = 0
+        self.current = None
+        self.follow = True
+        self._width = 0
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+    def rows(self):
+        """Returns the number of lines that fit into the view."""
+        return max(self.viewport().height() // self.fontMetrics().lineSpacing(), 1)
+
+    def set_follow(self, follow):
+        if follow != self.follow:
+            self.follow = follow
+            self.follow_changed.emit(follow)
+        self.update_range()
+
+    def scroll_to(self, line):
+        """Highlights a line and scrolls it to the middle of the view."""
+        first = self.index.first_line
+        line = max(min(line, first + self.index.line_count - 1), first)
+        self.current = line
+        self.top = line - self.rows() // 2
+        self.set_follow(False)
+
+    def update_range(self):
+        """Updates the scroll bar after lines were indexed or appended."""
+        rows = self.rows()
+        first = self.index.first_line
+        last_top = max(self.index.line_count - rows, 0)
+        if self.follow:
+            self.top = first + last_top
+        self.top = min(max(self.top, first), first + last_top)
+
+        scrollbar = self.verticalScrollBar()
+        scrollbar.blockSignals(True)
+        scrollbar.setRange(0, last_top)
+        scrollbar.setPageStep(rows)
+        scrollbar.setValue(self.top - first)
+        scrollbar.blockSignals(False)
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        metrics = self.fontMetrics()
+        height = metrics.lineSpacing()
+        x = self.MARGIN - self.horizontalScrollBar().value()
+        palette = self.palette()
+        for row, text in enumerate(self.index.lines(self.top, self.rows() + 1)):
+            text = text.expandtabs()
+            if self.top + row == self.current:
+                painter.fillRect(
+                    0, row * height, self.viewport().width(), height, palette.highlight()
+                )
+                painter.setPen(palette.highlightedText().color())
+            else:
+                painter.setPen(palette.text().color())
+            painter.drawText(x, row * height + metrics.ascent(), text)
+            self._width = max(self._width, len(text) * metrics.averageCharWidth())
+        painter.end()
+        self.horizontalScrollBar().setRange(
+            0, max(self._width + 2 * self.MARGIN - self.viewport().width(), 0)
+        )
+        self.horizontalScrollBar().setPageStep(self.viewport().width())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_range()
+
+    def keyPressEvent(self, event):
+        scrollbar = self.verticalScrollBar()
+        if event.key() == Qt.Key_Home:
+            scrollbar.setValue(scrollbar.minimum())
+        elif event.key() == Qt.Key_End:
+            scrollbar.setValue(scrollbar.maximum())
+        else:
+            super().keyPressEvent(event)
+
+    def _on_scrolled(self, value):
+        self.top = self.index.first_line + value
+        follow = value == self.verticalScrollBar().maximum()
+        if follow != self.follow:
+            self.follow = follow
+            self.follow_changed.emit(follow)
+        self.viewport().update()
+
+
+class LogViewerWindow(QWidget):
+    """Shows a log file of any size without reading it into memory.
+
+    The file is memory-mapped and its lines are indexed from the end on a worker thread, so
+    the last lines are shown at once. Searching (a regular expression) and jumping to the first
+    line at or after a time run on worker threads as well. The file is checked for new lines
+    every REFRESH_MS while the window is visible.
+    """
+
+    REFRESH_MS = 500
+    FIRST_STEP = 1 << 18
+
+    def __init__(self, path):
+        """Create a LogViewerWindow instance.
+
+        Args:
+            path: Path, the log file.
+
+        Raises:
+            OSError: if the file cannot be opened.
+        """
+        super().__init__()
+        self.path = path
+        self.setWindowTitle("Log - {}".format(path.name))
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.resize(900, 600)
+
+        self.index = LineIndex(path)
+        # Enough lines to fill the view are indexed before the window is shown.
+        self.index.index_backward(self.FIRST_STEP)
+        self.locate_worker = None
+
+        self.view = LogView(self.index, self)
+        self.search_edit = QLineEdit(self)
+        self.search_edit.setPlaceholderText("Search (regular expression)")
+        self.search_edit.returnPressed.connect(self.find_next)
+        previous_button = QPushButton("Previous", self)
+        previous_button.clicked.connect(self.find_previous)
+        next_button = QPushButton("Next", self)
+        next_button.clicked.connect(self.find_next)
+        self.time_edit = QLineEdit(self)
+        self.time_edit.setPlaceholderText("Jump to time (YYYY-MM-DD HH:MM:SS or HH:MM:SS)")
+        self.time_edit.returnPressed.connect(self.jump_to_time)
+        self.follow_box = QCheckBox("Follow", self)
+        self.follow_box.setChecked(True)
+        self.follow_box.toggled.connect(self.view.set_follow)
+        self.view.follow_changed.connect(self.follow_box.setChecked)
+        self.status = QLabel(self)
+
+        tools = QHBoxLayout()
+        tools.addWidget(self.search_edit, 2)
+        tools.addWidget(previous_button)
+        tools.addWidget(next_button)
+        tools.addWidget(self.time_edit, 2)
+        tools.addWidget(self.follow_box)
+        layout = QVBoxLayout(self)
+        layout.addLayout(tools)
+        layout.addWidget(self.view)
+        layout.addWidget(self.status)
+
+        self.index_worker = IndexWorker(self.index, self)
+        self.index_worker.progress.connect(self._on_indexed)
+        self.index_worker.start()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self._show_status()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(self.REFRESH_MS)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        for worker in (self.index_worker, self.locate_worker):
+            if worker is not None:
+                worker.stop()
+                worker.wait()
+        self.index.close()
+        super().closeEvent(event)
+
+    def refresh(self):
+        """Shows the lines appended to the log. If the log was truncated, it is indexed again."""
+        if self.index.refresh():
+            if not self.index.complete and self.index_worker.isFinished():
+                self.index_worker.start()
+            self.view.update_range()
+            self._show_status()
+
+    def find_next(self):
+        """Searches for the text of the search box after the highlighted line."""
+        self._find(backward=False)
+
+    def find_previous(self):
+        """Searches for the text of the search box before the highlighted line."""
+        self._find(backward=True)
+
+    def jump_to_time(self):
+        """Scrolls to the first line at or after the time entered in the time box."""
+        key = parse_time(self.time_edit.text())
+        if key is None:
+            self._show_status("Enter a time as YYYY-MM-DD HH:MM:SS or HH:MM:SS.")
+            return
+        near = self.index.offset(self.view.top)
+        self._locate(
+            partial(self.index.offset_of_time, key, near),
+            "Jumping to {}...".format(self.time_edit.text().strip()),
+            "No timestamps were found.",
+        )
+
+    def _find(self, backward):
+        text = self.search_edit.text()
+        if not text:
+            return
+        try:
+            pattern = re.compile(text.encode(ENCODING), re.MULTILINE)
+        except re.error as err:
+            self._show_status("{} is not a valid regular expression: {}.".format(text, err))
+            return
+        # The search starts after (or before) the highlighted line if it is visible, and
+        # includes the visible lines otherwise.
+        top, current = self.view.top, self.view.current
+        if current is not None and top <= current < top + self.view.rows():
+            offset = self.index.offset(current if backward else current + 1)
+        else:
+            offset = self.index.offset(top + self.view.rows() if backward else top)
+        self._locate(
+            partial(self.index.search, pattern, offset, backward),
+            "Searching for {}...".format(text),
+            "{} was not found.".format(text),
+        )
+
+    def _locate(self, find, message, failure):
+        if self.locate_worker is not None:
+            self.locate_worker.stop()
+            self.locate_worker.wait()
+        self.locate_worker = LocateWorker(self.index, find, self)
+        self.locate_worker.located.connect(partial(self._on_located, self.locate_worker, failure))
+        self.locate_worker.finished.connect(self.locate_worker.deleteLater)
+        self.locate_worker.start()
+        self._show_status(message)
+
+    def _on_located(self, worker, failure, line):
+        if worker is not self.locate_worker:
+            return
+        self.locate_worker = None
+        if line is None:
+            self._show_status(failure)
+            return
+        self.view.scroll_to(line)
+        self._show_status()
+
+    def _on_indexed(self):
+        self.view.update_range()
+        if self.locate_worker is None:
+            self._show_status()
+
+    def _show_status(self, message=None):
+        if message is None:
+            if self.index.complete:
+                message = "{:,} lines".format(self.index.line_count)
+                if self.view.current is not None:
+                    message = "Line {:,} of {}".format(
+                        self.index.line_number(self.view.current), message
+                    )
+            else:
+                message = "Indexing lines... {:.0%}".format(self.index.progress())
+        self.status.setText(
+            "{} ({:,.1f} MB)   {}".format(self.path, self.index.size / 1e6, message)
+        )
@@ -0,0 +1,303 @@
+"""Counters and histograms of the tray launcher, exposed in the Prometheus text format.
+
+Metrics are created once at import time of the module that records them, e.g.
+
+    _SPAWN_SECONDS = metrics.histogram("tray_launcher_spawn_seconds", "Time to start a script")
+    _SPAWN_SECONDS.observe(elapsed)
+
+Recording takes one lock and a few additions, so it is cheap enough for the hot paths (it is
+done per command, per process table read and per chunk of captured output, never per line).
+Metrics with labels create one child per combination of label values on first use.
+
+This module only uses the standard library, like protocol, so that it can be used from any
+thread and by code that does not import Qt.
+"""
+
+import abc
+import bisect
+import math
+import threading
+import time as _t
+
+# Upper bounds of the histogram buckets in seconds, from 100 us to 1 min.
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric(abc.ABC):
+    TYPE = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Create a metric.
+
+        Args:
+            name: str, the name of the metric.
+            documentation: str, the help text of the metric.
+            labelnames: tuple of str, the names of the labels. A metric with labels is only
+                recorded through the children returned by labels().
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Returns the child of the metric for the given label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError("{} expects labels {}.".format(self.name, self.labelnames))
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self):
+        """Returns a list of (str, tuple of (str, str), float), the suffix, labels and value of
+        every sample of the metric.
+        """
+        if not self.labelnames:
+            return self._samples(())
+        samples = []
+        for values, child in sorted(self._children.items()):
+            samples += child._samples(tuple(zip(self.labelnames, values)))
+        return samples
+
+    def exposition(self):
+        """Returns the metric in the Prometheus text format."""
+        lines = [
+            "# HELP {} {}".format(self.name, self.documentation),
+            "# TYPE {} {}".format(self.name, self.TYPE),
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(
+                "{}{}{} {}".format(self.name, suffix, _format_labels(labels), _format_value(value))
+            )
+        return "\n".join(lines)
+
+    def _new_child(self):
+        return type(self)(self.name, self.documentation)
+
+    @abc.abstractmethod
+    def _samples(self, labels):
+        """Returns the samples of the metric, or of a child, as in samples().
+
+        Args:
+            labels: tuple of (str, str), the labels of the samples.
+        """
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. a number of events or of bytes."""
+
+    TYPE = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def _samples(self, labels):
+        return [("", labels, self.value)]
+
+
+class Gauge(_Metric):
+    """A value that is read when the metrics are collected, from a function."""
+
+    TYPE = "gauge"
+
+    def __init__(self, name, documentation, function=None):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def _samples(self, labels):
+        try:
+            value = self.function() if self.function is not None else 0
+        except Exception:
+            value = math.nan
+        return [("", labels, value)]
+
+
+class Histogram(_Metric):
+    """Counts observations, e.g. durations in seconds, in buckets with fixed upper bounds."""
+
+    TYPE = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self):
+        """Returns a context manager that observes the time spent in its block."""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Estimates a quantile from the buckets, interpolating linearly within the bucket
+        it falls into, like histogram_quantile() of Prometheus. Returns nan without
+        observations.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return math.nan
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def _new_child(self):
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def _samples(self, labels):
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            samples.append(("_bucket", labels + (("le", _format_value(bound)),), cumulative))
+        samples.append(("_count", labels, count))
+        samples.append(("_sum", labels, total))
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = _t.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(_t.perf_counter() - self.started)
+
+
+class Registry:
+    """The metrics of one process, keyed by name."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Adds a metric, or returns the metric already registered under its name."""
+        with self._lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def exposition(self):
+        """Returns all metrics in the Prometheus text format."""
+        return "".join(metric.exposition() + "\n" for _, metric in sorted(self.metrics.items()))
+
+    def summary(self):
+        """Returns lines describing every recorded metric for a terminal: the value of counters
+        and gauges, and the count, mean, p50, p99 and total of histograms.
+        """
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            if metric.labelnames:
+                children = [
+                    (",".join(values), child) for values, child in sorted(metric._children.items())
+                ]
+            else:
+                children = [("", metric)]
+            for labels, child in children:
+                label = "{}{{{}}}".format(name, labels) if labels else name
+                lines += _summary_line(label, child)
+        return lines
+
+
+def _summary_line(label, metric):
+    if isinstance(metric, Histogram):
+        if not metric.count:
+            return []
+        return [
+            "{:<64}{:>8} x {:>9.3f} ms (p50 {:.3f} ms, p99 {:.3f} ms, total {:.3f} s)".format(
+                label,
+                metric.count,
+                1000 * metric.sum / metric.count,
+                1000 * metric.quantile(0.5),
+                1000 * metric.quantile(0.99),
+                metric.sum,
+            )
+        ]
+    value = metric._samples(())[0][2]
+    return ["{:<64}{:>8}".format(label, _format_value(value))]
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    """Returns the counter registered under the name, creating it if needed."""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Returns the histogram registered under the name, creating it if needed."""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge(name, documentation, function):
+    """Registers a gauge reading its value from function, replacing any previous function."""
+    metric = REGISTRY.register(Gauge(name, documentation))
+    metric.function = function
+    return metric
@@ -0,0 +1,96 @@
+import logging
+import os
+from functools import partial
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtNetwork import QHostAddress, QTcpServer
+
+from tray_launcher import metrics
+
+
+def metrics_port():
+    """Returns the port of the metrics endpoint, read from the environment variable
+    TRAY_LAUNCHER_METRICS_PORT, or None if the endpoint is disabled (the default).
+    """
+    try:
+        port = int(os.environ.get("TRAY_LAUNCHER_METRICS_PORT", 0))
+    except ValueError:
+        logging.warning("TRAY_LAUNCHER_METRICS_PORT is not a port number.")
+        return None
+    return port if port > 0 else None
+
+
+class MetricsServer(QObject):
+    """Serves the metrics in the Prometheus text format at http://127.0.0.1:<port>/metrics.
+
+    Only the request line is looked at, and every connection is closed after its response.
+    The requests are served on the event loop, like the commands of the control server.
+    """
+
+    READ_TIMEOUT_MS = 5000
+    MAX_REQUEST_SIZE = 8192
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, port, registry=metrics.REGISTRY, parent=None):
+        """Create a MetricsServer instance.
+
+        Args:
+            port: int, the port to listen to on 127.0.0.1.
+            registry: Registry, the metrics to serve.
+            parent: QObject, the parent of the server.
+        """
+        super().__init__(parent)
+
+        self.registry = registry
+        self._buffers = {}
+        self.server = QTcpServer(self)
+        if not self.server.listen(QHostAddress("127.0.0.1"), port):
+            logging.warning("Failed to listen to port {} for metrics.".format(port))
+            return
+        self.server.newConnection.connect(self._on_new_connection)
+        logging.info("Metrics are served at http://127.0.0.1:{}/metrics.".format(port))
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self._buffers[socket] = bytearray()
+            socket.readyRead.connect(partial(self._on_ready_read, socket))
+            socket.disconnected.connect(partial(self._on_disconnected, socket))
+            timer = QTimer(socket)
+            timer.setSingleShot(True)
+            timer.timeout.connect(socket.abort)
+            timer.start(self.READ_TIMEOUT_MS)
+
+    def _on_ready_read(self, socket):
+        if socket not in self._buffers:
+            socket.readAll()
+            return
+        buffer = self._buffers[socket]
+        buffer += bytes(socket.readAll())
+        if b"\n" not in buffer:
+            if len(buffer) > self.MAX_REQUEST_SIZE:
+                self._respond(socket, "431 Request Header Fields Too Large", "")
+            return
+
+        request_line = bytes(buffer[: buffer.find(b"\n")]).decode("latin-1").split()
+        if len(request_line) < 2 or request_line[0] not in ("GET", "HEAD"):
+            self._respond(socket, "405 Method Not Allowed", "")
+        elif request_line[1].split("?")[0] != "/metrics":
+            self._respond(socket, "404 Not Found", "")
+        else:
+            body = self.registry.exposition()
+            length = len(body.encode("utf-8"))
+            self._respond(socket, "200 OK", body if request_line[0] == "GET" else "", length)
+
+    def _respond(self, socket, status, body, length=None):
+        del self._buffers[socket]
+        payload = body.encode("utf-8")
+        header = (
+            "HTTP/1.0 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+        ).format(status, self.CONTENT_TYPE, len(payload) if length is None else length)
+        socket.write(header.encode("latin-1") + payload)
+        socket.disconnectFromHost()
+
+    def _on_disconnected(self, socket):
+        self._buffers.pop(socket, None)
+        socket.deleteLater()
@@ -0,0 +1,160 @@
+import os
+import threading
+from collections import deque
+
+ENCODING = "utf-8"
+
+DEFAULT_SCRIPT_KB = 256
+DEFAULT_TOTAL_MB = 16
+
+
+def _size_from_environment(name, default, unit):
+    try:
+        size = float(os.environ.get(name, default))
+    except ValueError:
+        size = default
+    return max(int(size * unit), 0)
+
+
+def script_capacity():
+    """Returns the number of bytes of recent output kept per script, read from the environment
+    variable TRAY_LAUNCHER_RECENT_OUTPUT_KB.
+    """
+    return _size_from_environment("TRAY_LAUNCHER_RECENT_OUTPUT_KB", DEFAULT_SCRIPT_KB, 1 << 10)
+
+
+def total_capacity():
+    """Returns the number of bytes of recent output kept for all scripts together, read from
+    the environment variable TRAY_LAUNCHER_RECENT_OUTPUT_TOTAL_MB.
+    """
+    return _size_from_environment("TRAY_LAUNCHER_RECENT_OUTPUT_TOTAL_MB", DEFAULT_TOTAL_MB, 1 << 20)
+
+
+class OutputRing:
+    """The most recent output of one script, as a queue of the chunks read from its pipe.
+
+    Chunks are appended by the capture thread of the script and the oldest bytes are dropped
+    once the ring is over its capacity, or when the pool needs room for other scripts. Create
+    rings with OutputPool.create().
+    """
+
+    def __init__(self, pool, capacity):
+        self.pool = pool
+        self.capacity = capacity
+        self.size = 0
+        self.dropped = 0
+        self.released = False
+        self._chunks = deque()
+
+    def append(self, data):
+        """Adds output. Called by the capture thread."""
+        with self.pool.lock:
+            if self.released or not data:
+                return
+            self._chunks.append(bytes(data))
+            self.size += len(data)
+            self.pool.size += len(data)
+            self._drop(self.size - min(self.capacity, self.pool.share()))
+            if self.pool.size > self.pool.total:
+                self.pool.make_room()
+
+    def release(self):
+        """Frees the memory of the ring. Output appended afterwards is ignored."""
+        self.pool.release(self)
+
+    def lines(self, count):
+        """Returns the last lines of the output.
+
+        Args:
+            count: int, the maximum number of lines.
+
+        Returns:
+            list of str, the lines. The first line of the ring is left out if its beginning
+                was dropped, and so is an empty line after the final line break.
+        """
+        if count <= 0:
+            return []
+        with self.pool.lock:
+            chunks = []
+            newlines = 0
+            for chunk in reversed(self._chunks):
+                chunks.append(chunk)
+                newlines += chunk.count(b"\n")
+                if newlines > count:
+                    break
+            complete = len(chunks) == len(self._chunks) and not self.dropped
+        lines = b"".join(reversed(chunks)).split(b"\n")
+        if not complete:
+            del lines[0]
+        if lines and not lines[-1]:
+            lines.pop()
+        return [
+            str(line.rstrip(b"\r"), encoding=ENCODING, errors="replace") for line in lines[-count:]
+        ]
+
+    def _drop(self, excess):
+        """Drops at least excess bytes from the start. Must be called with the pool's lock."""
+        while excess > 0 and self._chunks:
+            chunk = self._chunks[0]
+            if len(chunk) <= excess:
+                self._chunks.popleft()
+                dropped = len(chunk)
+            else:
+                self._chunks[0] = chunk[excess:]
+                dropped = excess
+            excess -= dropped
+            self.size -= dropped
+            self.dropped += dropped
+            self.pool.size -= dropped
+
+
+class OutputPool:
+    """The OutputRings of all running scripts, which together keep at most a total number
+    of bytes. Every ring keeps at most an equal share of the total (or its capacity if that is
+    less), so a script that writes a lot cannot push out the output of quiet scripts.
+    """
+
+    def __init__(self, capacity=None, total=None):
+        """Create an OutputPool instance.
+
+        Args:
+            capacity: int, bytes kept per script, defaults to script_capacity().
+            total: int, bytes kept for all scripts, defaults to total_capacity().
+        """
+        self.capacity = script_capacity() if capacity is None else capacity
+        self.total = total_capacity() if total is None else total
+        self.size = 0
+        self.lock = threading.Lock()
+        self._rings = []
+
+    def create(self):
+        """Returns a new ring for a script, or None if recent output is disabled."""
+        if not self.capacity or not self.total:
+            return None
+        ring = OutputRing(self, self.capacity)
+        with self.lock:
+            self._rings.append(ring)
+        return ring
+
+    def release(self, ring):
+        """Frees the memory of a ring, e.g. when its script has exited."""
+        with self.lock:
+            if ring.released:
+                return
+            ring.released = True
+            ring._drop(ring.size)
+            self._rings.remove(ring)
+
+    def share(self):
+        """Returns the number of bytes every ring may keep. Must be called with the lock."""
+        return self.total // len(self._rings)
+
+    def make_room(self):
+        """Shrinks the rings to their share until the pool is within its total, which is only
+        needed after new rings have reduced the share. Must be called with the lock.
+        """
+        share = self.share()
+        for ring in sorted(self._rings, key=lambda ring: ring.size, reverse=True):
+            if self.size <= self.total:
+                break
+            ring._drop(ring.size - share)
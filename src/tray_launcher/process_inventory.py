@@ -0,0 +1,162 @@
+import threading
+import time as _t
+from collections import defaultdict, deque
+
+import psutil as _ps
+
+from tray_launcher import metrics
+
+_READ_SECONDS = metrics.histogram(
+    "tray_launcher_process_table_read_seconds", "Time to read a snapshot of the process table"
+)
+
+
+class ProcessSnapshot:
+    def __init__(self, records, taken_at):
+        """Create a ProcessSnapshot instance.
+
+        A snapshot is an immutable view of the whole process table at one point in time,
+        indexed by parent PID so child lookups do not need to scan the table.
+
+        Args:
+            records: iterable of (int, int, float), pid, parent pid and creation time
+                of every process in the table.
+            taken_at: float, monotonic time when the snapshot was taken.
+        """
+        self.taken_at = taken_at
+        self.parents = {}
+        self.create_times = {}
+        self._children = defaultdict(list)
+
+        for pid, ppid, create_time in records:
+            self.parents[pid] = ppid
+            self.create_times[pid] = create_time
+            self._children[ppid].append(pid)
+
+    def exists(self, pid, create_time=None):
+        """Checks if the process is in the snapshot.
+
+        Args:
+            pid: int, process id.
+            create_time: float, if given, the creation time must also match,
+                which guards against the pid having been reused.
+        """
+        if pid not in self.create_times:
+            return False
+        return create_time is None or self.create_times[pid] == create_time
+
+    def children(self, pid):
+        """Returns the pids of the direct children of the process."""
+        return list(self._children.get(pid, ()))
+
+    def tree(self, pid, create_time):
+        """Returns the pids of a script's process tree: the root, if it still exists, and its
+        descendants created after it. Descendants are found even after the root has exited on
+        Windows, which does not reparent orphaned processes.
+
+        Args:
+            pid: int, pid of the root process.
+            create_time: float, creation time of the root process.
+        """
+        if pid in self.create_times and self.create_times[pid] != create_time:
+            # The pid has been reused, so its descendants belong to another process.
+            return []
+        pids = [pid] if pid in self.create_times else []
+        pids += [
+            child for child in self.descendants(pid) if self.create_times[child] >= create_time
+        ]
+        return pids
+
+    def descendants(self, pid):
+        """Returns the pids of all processes below the process, breadth first."""
+        found = []
+        seen = {pid}
+        queue = deque(self._children.get(pid, ()))
+        while queue:
+            child = queue.popleft()
+            if child in seen:
+                continue
+            seen.add(child)
+            found.append(child)
+            queue.extend(self._children.get(child, ()))
+        return found
+
+
+class PsutilBackend:
+    """Reads the process table of the local machine."""
+
+    def records(self):
+        for proc in _ps.process_iter(["pid", "ppid", "create_time"]):
+            info = proc.info
+            if info["ppid"] is None or info["create_time"] is None:
+                continue
+            yield info["pid"], info["ppid"], info["create_time"]
+
+
+class FakeBackend:
+    """A process table that is edited by hand, used to exercise the inventory without
+    spawning real processes.
+    """
+
+    def __init__(self, records=()):
+        self.table = {}
+        self.reads = 0
+        for pid, ppid, create_time in records:
+            self.add(pid, ppid, create_time)
+
+    def add(self, pid, ppid, create_time=0.0):
+        self.table[pid] = (ppid, create_time)
+
+    def remove(self, pid):
+        self.table.pop(pid, None)
+
+    def records(self):
+        self.reads += 1
+        return [(pid, ppid, ct) for pid, (ppid, ct) in self.table.items()]
+
+
+class ProcessInventory:
+    TTL = 0.5
+
+    def __init__(self, backend=None, ttl=None, clock=_t.monotonic):
+        """Create a ProcessInventory instance.
+
+        The inventory serves all ChildScript instances from one shared snapshot of the process
+        table. A snapshot is reused until it is older than the TTL, so a burst of commands only
+        reads the process table once.
+
+        Args:
+            backend: object with a records() method, defaults to PsutilBackend.
+            ttl: float, seconds a snapshot stays valid, defaults to ProcessInventory.TTL.
+            clock: callable returning the current monotonic time.
+        """
+        self.backend = backend if backend is not None else PsutilBackend()
+        self.ttl = self.TTL if ttl is None else ttl
+        self.clock = clock
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, max_age=None):
+        """Returns a snapshot that is at most max_age (default: the TTL) seconds old."""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            now = self.clock()
+            if self._snapshot is None or now - self._snapshot.taken_at > max_age:
+                with _READ_SECONDS.time():
+                    self._snapshot = ProcessSnapshot(self.backend.records(), now)
+            return self._snapshot
+
+    def refresh(self):
+        """Forces a new snapshot to be taken and returns it."""
+        return self.snapshot(max_age=-1)
+
+    def invalidate(self):
+        """Drops the cached snapshot, e.g. after a process was started or killed."""
+        with self._lock:
+            self._snapshot = None
+
+    def children(self, pid):
+        return self.snapshot().children(pid)
+
+    def descendants(self, pid):
+        return self.snapshot().descendants(pid)
@@ -0,0 +1,262 @@
+import logging
+import os
+import subprocess
+import time as _t
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil as _ps
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+from tray_launcher import metrics
+
+DEFAULT_GRACE_PERIOD = 5.0
+KILL_TIMEOUT = 2.0
+
+_TERMINATION_SECONDS = metrics.histogram(
+    "tray_launcher_termination_seconds", "Time to terminate the process tree of a script"
+)
+_KILLED = metrics.counter(
+    "tray_launcher_processes_killed_total", "Processes killed after the grace period"
+)
+
+TerminationResult = namedtuple("TerminationResult", ["pid", "graceful", "killed", "survivors"])
+TerminationResult.__doc__ = """Outcome of terminating one process tree.
+
+pid is the root of the tree; graceful, killed and survivors are lists of the pids that exited
+after the graceful request, that had to be killed, and that could not be killed.
+"""
+
+
+def grace_period():
+    """Returns the number of seconds processes are given to exit after the graceful request,
+    read from the environment variable TRAY_LAUNCHER_GRACE_PERIOD_S.
+    """
+    try:
+        return max(float(os.environ.get("TRAY_LAUNCHER_GRACE_PERIOD_S", DEFAULT_GRACE_PERIOD)), 0)
+    except ValueError:
+        return DEFAULT_GRACE_PERIOD
+
+
+class PosixBackend:
+    """Asks processes to exit with SIGTERM and kills them with SIGKILL."""
+
+    def request_exit(self, processes):
+        """Asks processes to exit.
+
+        Returns:
+            bool, whether the processes can exit by themselves, i.e. whether waiting for the
+                grace period is worthwhile.
+        """
+        for process in processes:
+            try:
+                process.terminate()
+            except _ps.Error:
+                pass
+        return True
+
+    def kill(self, processes):
+        for process in processes:
+            try:
+                process.kill()
+            except _ps.Error:
+                pass
+
+
+class WindowsBackend(PosixBackend):
+    """Asks processes to close their windows with a single taskkill (without /F) for the whole
+    tree, and kills them with TerminateProcess.
+
+    Console processes started without a window cannot be asked to exit, so a tree without any
+    visible top-level window is killed right away instead of after the grace period.
+    """
+
+    def request_exit(self, processes):
+        try:
+            windowed = self.windowed_pids()
+        except Exception as err:
+            logging.error("{}: Failed to list the windows of processes.".format(err))
+            windowed = None
+        if windowed is not None and not any(process.pid in windowed for process in processes):
+            return False
+
+        arguments = ["taskkill"]
+        for process in processes:
+            arguments += ["/PID", str(process.pid)]
+        try:
+            subprocess.run(
+                arguments,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                creationflags=subprocess.CREATE_NO_WINDOW,
+            )
+        except OSError as err:
+            logging.error("{}: Failed to run taskkill.".format(err))
+        return True
+
+    def windowed_pids(self):
+        """Returns the set of pids of the processes with a visible top-level window."""
+        # Imported here, so the tray launcher starts without loading pywin32.
+        from win32gui import EnumWindows, IsWindowVisible
+        from win32process import GetWindowThreadProcessId
+
+        def callback(hwnd, pids):
+            if IsWindowVisible(hwnd):
+                pids.add(GetWindowThreadProcessId(hwnd)[1])
+            return True
+
+        pids = set()
+        EnumWindows(callback, pids)
+        return pids
+
+
+def default_backend():
+    return WindowsBackend() if os.name == "nt" else PosixBackend()
+
+
+class ProcessTerminator:
+    """Terminates process trees in parallel on a worker pool.
+
+    The trees of all scripts in one request are collected from a single fresh snapshot of the
+    process table. Each tree is then terminated on a worker: all of its processes are asked to
+    exit, the worker waits for them up to the grace period, and the survivors are killed.
+    """
+
+    MAX_WORKERS = 8
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, inventory, backend=None, grace_period=None):
+        """Create a ProcessTerminator instance.
+
+        Args:
+            inventory: ProcessInventory, shared snapshot of the process table.
+            backend: PosixBackend or WindowsBackend, how processes are signalled.
+                Defaults to the backend of the current platform.
+            grace_period: float, seconds processes are given to exit before they are killed.
+                Defaults to grace_period().
+        """
+        self.inventory = inventory
+        self.backend = default_backend() if backend is None else backend
+        self.grace_period = grace_period
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.MAX_WORKERS, thread_name_prefix="tray_launcher_terminator"
+        )
+
+    def submit(self, roots):
+        """Starts terminating process trees.
+
+        Args:
+            roots: list of (int, float), pid and creation time of the root of every tree.
+
+        Returns:
+            list of Future of TerminationResult, one per root.
+        """
+        snapshot = self.inventory.refresh()
+        grace = grace_period() if self.grace_period is None else self.grace_period
+        futures = []
+        for pid, create_time in roots:
+            processes = self.collect(snapshot, pid, create_time)
+            futures.append(self.pool.submit(self._terminate, pid, processes, grace))
+        return futures
+
+    def collect(self, snapshot, pid, create_time):
+        """Returns psutil.Process objects for the root and every descendant of the tree.
+
+        The root is skipped if its pid has been reused, and so are descendants older than
+        the root, which cannot have been started by it.
+        """
+        processes = []
+        for child in snapshot.tree(pid, create_time):
+            try:
+                process = _ps.Process(child)
+                if process.create_time() == snapshot.create_times[child]:
+                    processes.append(process)
+            except _ps.Error:
+                pass
+        return processes
+
+    def _terminate(self, pid, processes, grace):
+        started = _t.perf_counter()
+        if not self.backend.request_exit(processes):
+            grace = 0
+        gone, alive = self._wait(processes, grace)
+        if alive:
+            self.backend.kill(alive)
+            killed, alive = self._wait(alive, KILL_TIMEOUT)
+        else:
+            killed = []
+
+        self.inventory.invalidate()
+        result = TerminationResult(
+            pid, [p.pid for p in gone], [p.pid for p in killed], [p.pid for p in alive]
+        )
+        _TERMINATION_SECONDS.observe(_t.perf_counter() - started)
+        _KILLED.inc(len(killed))
+        if result.survivors:
+            logging.error(
+                "Child Script PID: {}: Processes {} could not be terminated.".format(
+                    pid, result.survivors
+                )
+            )
+        return result
+
+    def _wait(self, processes, timeout):
+        """Waits for processes to exit. Zombies count as exited, since they are only reaped
+        once their parent waits for them.
+
+        Returns:
+            (list of psutil.Process, list of psutil.Process), the processes that exited,
+                and the processes still alive after the timeout.
+        """
+        deadline = _t.monotonic() + timeout
+        gone, alive = [], list(processes)
+        while True:
+            exited, alive = _ps.wait_procs(alive, timeout=min(self.POLL_INTERVAL, timeout))
+            gone += exited
+            for process in list(alive):
+                try:
+                    zombie = process.status() == _ps.STATUS_ZOMBIE
+                except _ps.Error:
+                    zombie = True
+                if zombie:
+                    alive.remove(process)
+                    gone.append(process)
+            if not alive or _t.monotonic() >= deadline:
+                return gone, alive
+
+
+class TerminationBatch(QObject):
+    """Reports the results of terminations on the thread the batch was created in."""
+
+    terminated = pyqtSignal(str, object)
+    finished = pyqtSignal()
+    _done = pyqtSignal(str, object)
+
+    def __init__(self, futures, parent=None):
+        """Create a TerminationBatch instance.
+
+        Args:
+            futures: dict of Future of TerminationResult, keyed by a label, e.g. the stem of
+                the script. terminated(label, result) is emitted as each future completes,
+                and finished() once all have completed. Must not be empty.
+            parent: QObject, the parent of the batch.
+        """
+        super().__init__(parent)
+
+        self.pending = len(futures)
+        # Queued even within one thread, so futures that are already done are reported after
+        # the caller has connected to the signals.
+        self._done.connect(self._on_done, Qt.QueuedConnection)
+        for label, future in futures.items():
+            future.add_done_callback(lambda f, label=label: self._done.emit(label, f))
+
+    def _on_done(self, label, future):
+        try:
+            self.terminated.emit(label, future.result())
+        except Exception as err:
+            logging.error("{}: Failed to terminate {}.".format(err, label))
+            self.terminated.emit(label, None)
+        self.pending -= 1
+        if self.pending == 0:
+            self.finished.emit()
+            self.deleteLater()
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time as _t
+
+import psutil as _ps
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from tray_launcher import metrics
+
+_UPDATE_SECONDS = metrics.histogram(
+    "tray_launcher_watcher_update_seconds",
+    "Time to refresh the watched process trees after an exit or for discovery",
+)
+_EXITED = metrics.counter(
+    "tray_launcher_scripts_exited_total", "Scripts whose process tree exited by itself"
+)
+
+
+class ProcessWatcher(QThread):
+    """Waits for script process trees to exit on a worker thread.
+
+    The worker blocks in psutil.wait_procs() on every process of every watched tree. When a
+    process exits (and every few seconds, to pick up newly spawned descendants), the trees are
+    refreshed from one process table snapshot. script_exited is emitted once a whole tree is gone,
+    with the exit code of the root process if it is known.
+    """
+
+    script_exited = pyqtSignal(float, object)
+
+    WAIT_TIMEOUT = 0.5
+    DISCOVERY_INTERVAL = 5.0
+
+    def __init__(self, inventory, parent=None):
+        """Create a ProcessWatcher instance.
+
+        Args:
+            inventory: ProcessInventory, shared snapshot of the process table.
+            parent: QObject, the parent of the watcher.
+        """
+        super().__init__(parent)
+
+        self.inventory = inventory
+        self._roots = {}
+        self._trees = {}
+        self._returncodes = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def watch(self, key, pid, create_time, pids=()):
+        """Starts watching the process tree rooted at pid.
+
+        Args:
+            key: float, the timestamp of the ChildScript, emitted when the tree exits.
+            pid: int, pid of the root process of the script.
+            create_time: float, creation time of the root process.
+            pids: iterable of int, processes of the tree that are already known,
+                e.g. when a script is reattached.
+        """
+        with self._lock:
+            self._roots[key] = (pid, create_time)
+            self._trees[key] = {}
+            for tree_pid in dict.fromkeys([pid, *pids]):
+                self._add_process(self._trees[key], tree_pid)
+        self._wake.set()
+
+    def unwatch(self, key):
+        """Stops watching a tree, e.g. when it is terminated through the tray launcher."""
+        with self._lock:
+            self._roots.pop(key, None)
+            self._trees.pop(key, None)
+            self._returncodes.pop(key, None)
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        self.wait()
+
+    def run(self):
+        last_discovery = _t.monotonic()
+        while not self._stopping:
+            with self._lock:
+                procs = [p for tree in self._trees.values() for p in tree.values()]
+                empty = not all(self._trees.values())
+
+            if empty:
+                # A script that exited before it was watched is reported right away.
+                with _UPDATE_SECONDS.time():
+                    self._update_trees({})
+                last_discovery = _t.monotonic()
+                continue
+
+            if not procs:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            try:
+                gone, _ = _ps.wait_procs(procs, timeout=self.WAIT_TIMEOUT)
+            except Exception as e:
+                logging.error("Process watcher: {}".format(e))
+                gone = []
+
+            if gone or _t.monotonic() - last_discovery > self.DISCOVERY_INTERVAL:
+                with _UPDATE_SECONDS.time():
+                    self._update_trees({p.pid: getattr(p, "returncode", None) for p in gone})
+                last_discovery = _t.monotonic()
+
+    def _update_trees(self, gone_pids):
+        """Refreshes every tree from one process table snapshot,
+        and emits script_exited for every tree that is now empty.
+
+        Args:
+            gone_pids: dict of int, the exit codes (None if unknown) of the processes
+                that have exited, keyed by pid.
+        """
+        snapshot = self.inventory.refresh()
+
+        with self._lock:
+            for key, (root_pid, _) in self._roots.items():
+                if root_pid in gone_pids and root_pid in self._trees[key]:
+                    self._returncodes[key] = gone_pids[root_pid]
+            exited = [
+                key
+                for key, tree in self._trees.items()
+                if not self._update_tree(tree, self._roots[key], snapshot, gone_pids)
+            ]
+            returncodes = [self._returncodes.pop(key, None) for key in exited]
+            for key in exited:
+                del self._roots[key]
+                del self._trees[key]
+
+        _EXITED.inc(len(exited))
+        for key, returncode in zip(exited, returncodes):
+            self.script_exited.emit(key, returncode)
+
+    def _update_tree(self, tree, root, snapshot, gone_pids):
+        """Drops exited processes from a tree and adds processes spawned since the last update.
+
+        Children of the root pid are kept even after the root exits, as long as they were
+        created after it, since Windows does not reparent orphaned processes.
+
+        Returns:
+            bool, True if any process of the tree is still running.
+        """
+        for pid, proc in list(tree.items()):
+            if pid in gone_pids or not snapshot.exists(pid, proc.create_time()):
+                del tree[pid]
+
+        candidates = snapshot.tree(*root)
+        for pid in list(tree):
+            candidates.extend(snapshot.descendants(pid))
+
+        for pid in candidates:
+            if pid not in tree:
+                self._add_process(tree, pid)
+        return bool(tree)
+
+    def _add_process(self, tree, pid):
+        try:
+            proc = _ps.Process(pid)
+            proc.create_time()
+        except _ps.Error:
+            return
+        tree[pid] = proc
@@ -0,0 +1,95 @@
+"""Wire format of the control channel between the launcher and its clients.
+
+A request is a sequence of newline-terminated lines followed by an empty line. The first line
+is the command and the remaining lines are its arguments.
+
+Version 1 clients send ASCII lines and receive one QDataStream block: a UInt16 block size
+followed by a QByteArray-style string (UInt32 length including a trailing NUL). Responses are
+therefore limited to 64 KiB.
+
+Version 2 clients send HELLO as their first line and UTF-8 lines after it. The response is a
+stream of frames, each a UInt32 payload length and a one byte frame type followed by the
+payload. DATA frames carry one UTF-8 message each and are sent as soon as they are produced;
+an END frame closes the response.
+
+This module only uses the standard library so that clients do not need to import Qt.
+"""
+
+import struct
+
+VERSION = 2
+HELLO = "@v2"
+ENCODING = "utf-8"
+
+FRAME_DATA = 1
+FRAME_END = 2
+
+_FRAME_HEADER = struct.Struct(">IB")
+_V1_BLOCK_SIZE = struct.Struct(">H")
+_V1_STRING_SIZE = struct.Struct(">I")
+V1_MAX_MESSAGE_SIZE = 0xFFFF - _V1_STRING_SIZE.size - 1
+
+
+def encode_request(command, data, version=VERSION):
+    """Returns the bytes of a request.
+
+    Args:
+        command: str, the command.
+        data: list of str, the arguments of the command.
+        version: int, protocol version of the request.
+    """
+    lines = [command] + list(data)
+    if version >= 2:
+        lines.insert(0, HELLO)
+        encoding = ENCODING
+    else:
+        encoding = "ascii"
+    return "".join(line + "\n" for line in lines).encode(encoding) + b"\n"
+
+
+def decode_line(line):
+    """Decodes one request line. Version 1 lines are ASCII, which is a subset of UTF-8."""
+    return str(line, encoding=ENCODING, errors="replace")
+
+
+def encode_frame(frame_type, payload=b""):
+    return _FRAME_HEADER.pack(len(payload), frame_type) + payload
+
+
+def encode_data(message):
+    return encode_frame(FRAME_DATA, message.encode(ENCODING))
+
+
+def encode_end():
+    return encode_frame(FRAME_END)
+
+
+def encode_v1(message):
+    """Returns a version 1 response block holding the message.
+
+    Characters outside ASCII are replaced, and messages that do not fit in one block
+    are truncated.
+    """
+    payload = message.encode("ascii", errors="replace")[:V1_MAX_MESSAGE_SIZE] + b"\0"
+    block = _V1_STRING_SIZE.pack(len(payload)) + payload
+    return _V1_BLOCK_SIZE.pack(len(block)) + block
+
+
+class FrameDecoder:
+    """Splits a stream of bytes into version 2 frames."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Adds received bytes and returns a list of (frame_type, payload) of complete frames."""
+        self._buffer += data
+        frames = []
+        while len(self._buffer) >= _FRAME_HEADER.size:
+            size, frame_type = _FRAME_HEADER.unpack_from(self._buffer)
+            end = _FRAME_HEADER.size + size
+            if len(self._buffer) < end:
+                break
+            frames.append((frame_type, bytes(self._buffer[_FRAME_HEADER.size : end])))
+            del self._buffer[:end]
+        return frames
@@ -0,0 +1,168 @@
+import os
+import time as _t
+from array import array
+
+import psutil as _ps
+from PyQt5.QtCore import QObject, QTimer
+
+from tray_launcher import metrics
+
+METRICS = ("cpu_percent", "rss_mb", "threads", "handles", "read_kbps", "write_kbps")
+
+_SAMPLE_SECONDS = metrics.histogram(
+    "tray_launcher_sampler_tick_seconds", "Time to sample the resources of all running scripts"
+)
+
+
+class RingBuffer:
+    """A fixed-size history of samples, stored in one array per metric."""
+
+    def __init__(self, capacity):
+        """Create a RingBuffer instance.
+
+        Args:
+            capacity: int, the number of samples kept. Older samples are overwritten.
+        """
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = {metric: array("d", bytes(8 * capacity)) for metric in METRICS}
+        self.count = 0
+        self._next = 0
+
+    def append(self, time, sample):
+        """Adds a sample.
+
+        Args:
+            time: float, monotonic time of the sample.
+            sample: dict of float, the value of every metric in METRICS.
+        """
+        self.times[self._next] = time
+        for metric in METRICS:
+            self.values[metric][self._next] = sample[metric]
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self):
+        """Returns the newest sample as a dict, or None if there is none."""
+        if not self.count:
+            return None
+        index = (self._next - 1) % self.capacity
+        return {metric: self.values[metric][index] for metric in METRICS}
+
+    def window(self, since):
+        """Returns the indices of the samples taken at or after since, newest first."""
+        indices = []
+        for age in range(1, self.count + 1):
+            index = (self._next - age) % self.capacity
+            if self.times[index] < since:
+                break
+            indices.append(index)
+        return indices
+
+    def summary(self, since):
+        """Returns {metric: (min, mean, max, p95)} over the samples taken at or after since."""
+        indices = self.window(since)
+        if not indices:
+            return {}
+        summary = {}
+        for metric in METRICS:
+            values = sorted(self.values[metric][index] for index in indices)
+            p95 = values[min(int(len(values) * 0.95), len(values) - 1)]
+            summary[metric] = (values[0], sum(values) / len(values), values[-1], p95)
+        return summary
+
+
+class ResourceSampler(QObject):
+    """Periodically samples the resources used by the process tree of every running script.
+
+    Each tick reads the trees from the shared process table snapshot and queries every tree
+    process once (psutil oneshot). CPU and I/O rates are computed from the change since the
+    previous tick. The history of every script is kept in a RingBuffer.
+    """
+
+    INTERVAL_MS = 2000
+    HISTORY_SECONDS = 3600
+
+    def __init__(self, inventory, scripts_of, parent=None):
+        """Create a ResourceSampler instance.
+
+        Args:
+            inventory: ProcessInventory, shared snapshot of the process table.
+            scripts_of: callable returning a dict of the running ChildScripts,
+                keyed by their timestamps.
+            parent: QObject, the parent of the sampler.
+        """
+        super().__init__(parent)
+
+        self.inventory = inventory
+        self.scripts_of = scripts_of
+        self.histories = {}
+        self.process_counts = {}
+        self._processes = {}
+        self._previous = {}
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.sample)
+
+    def start(self):
+        self.timer.start(self.INTERVAL_MS)
+
+    def sample(self):
+        with _SAMPLE_SECONDS.time():
+            self._sample()
+
+    def _sample(self):
+        now = _t.monotonic()
+        snapshot = self.inventory.snapshot()
+        scripts = self.scripts_of()
+        seen = set()
+
+        for timestamp, script in scripts.items():
+            # Skips a reused pid, which would charge another process tree to the script.
+            pids = snapshot.tree(script.child_script_PID, script.create_time)
+
+            total = dict.fromkeys(METRICS, 0.0)
+            for pid in pids:
+                key = (pid, snapshot.create_times.get(pid))
+                seen.add(key)
+                self._add_process_sample(key, now, total)
+
+            if timestamp not in self.histories:
+                capacity = self.HISTORY_SECONDS * 1000 // self.INTERVAL_MS
+                self.histories[timestamp] = RingBuffer(capacity)
+            self.histories[timestamp].append(now, total)
+            self.process_counts[timestamp] = len(pids)
+
+        for key in set(self._processes) - seen:
+            del self._processes[key]
+            self._previous.pop(key, None)
+        for timestamp in set(self.histories) - set(scripts):
+            del self.histories[timestamp]
+            del self.process_counts[timestamp]
+
+    def _add_process_sample(self, key, now, total):
+        """Adds the resources used by one process to total."""
+        try:
+            process = self._processes.get(key)
+            if process is None:
+                process = self._processes[key] = _ps.Process(key[0])
+            with process.oneshot():
+                cpu = sum(process.cpu_times()[:2])
+                total["rss_mb"] += process.memory_info().rss / (1 << 20)
+                total["threads"] += process.num_threads()
+                total["handles"] += process.num_handles() if os.name == "nt" else process.num_fds()
+                io = process.io_counters() if hasattr(process, "io_counters") else None
+        except (_ps.Error, OSError):
+            self._processes.pop(key, None)
+            return
+
+        read_bytes = io.read_bytes if io is not None else 0
+        write_bytes = io.write_bytes if io is not None else 0
+        previous = self._previous.get(key)
+        self._previous[key] = (now, cpu, read_bytes, write_bytes)
+        if previous is None or now <= previous[0]:
+            return
+        elapsed = now - previous[0]
+        total["cpu_percent"] += 100 * (cpu - previous[1]) / elapsed
+        total["read_kbps"] += (read_bytes - previous[2]) / elapsed / 1024
+        total["write_kbps"] += (write_bytes - previous[3]) / elapsed / 1024
@@ -0,0 +1,91 @@
+import logging
+import os
+from pathlib import Path
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, pyqtSignal
+
+
+class ScriptCatalog(QObject):
+    """In-memory index of the loaded scripts, keyed by stem.
+
+    The scripts directory is scanned once, and again whenever a QFileSystemWatcher reports that
+    it changed. As a fallback for file systems that do not report changes, revalidate() compares
+    the modification time of the directory with the one seen at the last scan, which costs a
+    single stat. Lookups never touch the file system, and every change is announced as a
+    script_added or script_removed signal, so menus can be updated instead of rebuilt.
+    """
+
+    SUFFIX = ".bat"
+
+    script_added = pyqtSignal(str)
+    script_removed = pyqtSignal(str)
+
+    def __init__(self, directory, parent=None):
+        """Create a ScriptCatalog instance.
+
+        Args:
+            directory: Path, the directory the scripts are loaded to.
+            parent: QObject, the parent of the catalog.
+        """
+        super().__init__(parent)
+
+        self.directory = directory
+        self.scripts = {}
+        self._mtime = None
+
+        self.watcher = QFileSystemWatcher(self)
+        if not self.watcher.addPath(str(directory)):
+            logging.warning("Changes to {} are detected by polling.".format(directory))
+        self.watcher.directoryChanged.connect(self.rescan)
+        self.rescan()
+
+    def __contains__(self, stem):
+        return stem in self.scripts
+
+    def __len__(self):
+        return len(self.scripts)
+
+    def get(self, stem):
+        """Returns the Path of the loaded script with the given stem, or None."""
+        return self.scripts.get(stem)
+
+    def stems(self):
+        """Returns the stems of all loaded scripts, sorted."""
+        return sorted(self.scripts)
+
+    def add(self, path):
+        """Adds a script that was just copied to the directory, without waiting for the
+        watcher to report it.
+        """
+        if path.stem not in self.scripts:
+            self.scripts[path.stem] = path
+            self.script_added.emit(path.stem)
+
+    def revalidate(self):
+        """Rescans the directory if its modification time changed since the last scan."""
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.rescan()
+
+    def rescan(self):
+        try:
+            self._mtime = os.stat(self.directory).st_mtime_ns
+            with os.scandir(self.directory) as entries:
+                scripts = {
+                    Path(entry.name).stem: Path(entry.path)
+                    for entry in entries
+                    if entry.name.endswith(self.SUFFIX) and entry.is_file()
+                }
+        except OSError as err:
+            logging.error("{}: Failed to scan {}.".format(err, self.directory))
+            return
+        removed = self.scripts.keys() - scripts.keys()
+        added = scripts.keys() - self.scripts.keys()
+        self.scripts = scripts
+        for stem in sorted(removed):
+            self.script_removed.emit(stem)
+        for stem in sorted(added):
+            self.script_added.emit(stem)
@@ -0,0 +1,329 @@
+"""Groups of scripts that are started together, declared in ~/.tray_launcher/groups.json:
+
+    {
+        "daq": {
+            "daq_server": {"ready": {"log": "Listening on port \\d+"}, "timeout": 120},
+            "analysis": {"after": ["daq_server"]},
+            "plotter": {"after": ["daq_server"], "ready": {"port": 5555}},
+            "monitor": {"ready": {"delay": 2}}
+        }
+    }
+
+Each group maps script stems to their settings. A script is started once all scripts listed in
+"after" are ready. A script is ready as soon as it has started, unless it has a "ready" gate:
+"log" waits for a line of its log to match a regular expression, "port" waits for a TCP port
+(on "host", default 127.0.0.1) to accept connections, and "delay" waits a number of seconds.
+A gate that has not passed after "timeout" seconds (default 60) fails the script, and scripts
+that depend on a failed script are skipped.
+"""
+
+import json
+import math
+import re
+import time as _t
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtNetwork import QTcpSocket
+
+DEFAULT_TIMEOUT = 60.0
+
+
+class GroupEntry:
+    def __init__(self, stem, settings):
+        """Create a GroupEntry instance.
+
+        Args:
+            stem: str, the stem of the script.
+            settings: dict, the settings of the script in the group configuration.
+
+        Raises:
+            ValueError: if the settings are not valid.
+        """
+        if not isinstance(settings, dict):
+            raise ValueError("the settings of {} must be an object".format(stem))
+        self.stem = stem
+        self.after = settings.get("after", [])
+        if not isinstance(self.after, list) or not all(isinstance(s, str) for s in self.after):
+            raise ValueError('"after" of {} must be a list of script stems'.format(stem))
+        self.timeout = _number(settings.get("timeout", DEFAULT_TIMEOUT))
+        if self.timeout is None or self.timeout <= 0:
+            raise ValueError('"timeout" of {} must be a positive number'.format(stem))
+        self.ready = settings.get("ready")
+        if self.ready is not None:
+            self._check_ready()
+
+    def _check_ready(self):
+        if not isinstance(self.ready, dict) or len(self.ready.keys() - {"host"}) != 1:
+            raise ValueError(
+                '"ready" of {} must have one of "log", "port" or "delay"'.format(self.stem)
+            )
+        if not isinstance(self.ready.get("host", ""), str):
+            raise ValueError('"host" of {} must be a string'.format(self.stem))
+        if "log" in self.ready:
+            try:
+                self.ready["log"] = re.compile(self.ready["log"])
+            except (re.error, TypeError) as err:
+                raise ValueError("{}: invalid log pattern: {}".format(self.stem, err)) from None
+        elif "port" in self.ready:
+            port = self.ready["port"]
+            if type(port) is not int or not 0 < port < 65536:
+                raise ValueError('"port" of {} must be a TCP port number'.format(self.stem))
+        elif "delay" in self.ready:
+            self.ready["delay"] = _number(self.ready["delay"])
+            if self.ready["delay"] is None or self.ready["delay"] < 0:
+                raise ValueError('"delay" of {} must be a number of seconds'.format(self.stem))
+        else:
+            raise ValueError(
+                '"ready" of {} must have one of "log", "port" or "delay"'.format(self.stem)
+            )
+
+
+def _number(value):
+    """Returns value as a finite float if it is a JSON number, or None."""
+    if type(value) not in (int, float) or not math.isfinite(value):
+        return None
+    return float(value)
+
+
+def load_group(path, name):
+    """Reads one group from the group configuration. Other groups are not validated.
+
+    Args:
+        path: Path, the configuration file.
+        name: str, the name of the group.
+
+    Returns:
+        list of GroupEntry, the entries of the group in dependency order.
+
+    Raises:
+        ValueError: if the group is not defined or not valid.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    except (OSError, ValueError) as err:
+        raise ValueError("{} cannot be read: {}".format(path, err)) from None
+
+    if not isinstance(config, dict) or name not in config:
+        raise ValueError("{} is not a group defined in {}".format(name, path))
+    scripts = config[name]
+    if not isinstance(scripts, dict):
+        raise ValueError("group {} must be an object of scripts".format(name))
+    entries = [GroupEntry(stem, settings) for stem, settings in scripts.items()]
+    return dependency_order(name, entries)
+
+
+def dependency_order(name, entries):
+    """Returns the entries sorted so that every entry comes after the entries it depends on.
+
+    Raises:
+        ValueError: if an entry depends on a script outside the group, or on itself
+            through a cycle.
+    """
+    by_stem = {entry.stem: entry for entry in entries}
+    for entry in entries:
+        for dependency in entry.after:
+            if dependency not in by_stem:
+                raise ValueError(
+                    "{} in group {} depends on {}, which is not in the group".format(
+                        entry.stem, name, dependency
+                    )
+                )
+
+    ordered = []
+    done = set()
+    remaining = list(entries)
+    while remaining:
+        ready = [entry for entry in remaining if done.issuperset(entry.after)]
+        if not ready:
+            raise ValueError(
+                "group {} has a dependency cycle between {}".format(
+                    name, [entry.stem for entry in remaining]
+                )
+            )
+        ordered += ready
+        done.update(entry.stem for entry in ready)
+        remaining = [entry for entry in remaining if entry.stem not in done]
+    return ordered
+
+
+class _LogGate:
+    def __init__(self, pattern, log_path_of, stem):
+        self.pattern = pattern
+        self.log_path_of = log_path_of
+        self.stem = stem
+        self.path = None
+        self.offset = 0
+        self.partial = b""
+
+    def check(self):
+        path = self.log_path_of(self.stem)
+        if path is None:
+            return False
+        if path != self.path:
+            self.path, self.offset, self.partial = path, 0, b""
+        try:
+            with open(path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return False
+        self.offset += len(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        return any(
+            self.pattern.search(str(line, encoding="utf-8", errors="replace")) for line in lines
+        )
+
+    def close(self):
+        pass
+
+
+class _PortGate:
+    def __init__(self, host, port, parent):
+        self.host = host
+        self.port = port
+        self.connected = False
+        self.socket = QTcpSocket(parent)
+        self.socket.connected.connect(self._on_connected)
+
+    def check(self):
+        if not self.connected and self.socket.state() == QTcpSocket.UnconnectedState:
+            self.socket.connectToHost(self.host, self.port)
+        return self.connected
+
+    def close(self):
+        self.socket.abort()
+        self.socket.deleteLater()
+
+    def _on_connected(self):
+        self.connected = True
+        self.socket.disconnectFromHost()
+
+
+class _DelayGate:
+    def __init__(self, seconds):
+        self.until = _t.monotonic() + seconds
+
+    def check(self):
+        return _t.monotonic() >= self.until
+
+    def close(self):
+        pass
+
+
+class GroupStarter(QObject):
+    """Starts the scripts of a group, each as soon as the scripts it depends on are ready.
+
+    Scripts whose dependencies are ready are started in the same tick, so independent branches
+    come up concurrently, and the readiness gates of all started scripts are checked on every
+    poll of the event loop.
+    """
+
+    POLL_INTERVAL_MS = 100
+
+    message = pyqtSignal(str)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, name, entries, core, parent=None):
+        """Create a GroupStarter instance. Call start() after connecting to its signals.
+
+        Args:
+            name: str, the name of the group.
+            entries: list of GroupEntry, the scripts of the group in dependency order.
+            core: LauncherCore, used to start scripts and to find their logs.
+            parent: QObject, the parent of the starter.
+        """
+        super().__init__(parent)
+
+        self.name = name
+        self.entries = entries
+        self.core = core
+        self.ready = set()
+        self.failed = set()
+        self.waiting = {}
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.poll()
+        if self.waiting or self._pending():
+            self.timer.start(self.POLL_INTERVAL_MS)
+
+    def poll(self):
+        self._check_gates()
+        self._start_ready_entries()
+        if not self.waiting and not self._pending():
+            self.timer.stop()
+            self.message.emit(
+                "[@{}] {} of {} script(s) ready.".format(
+                    self.name, len(self.ready), len(self.entries)
+                )
+            )
+            self.finished.emit()
+            self.deleteLater()
+
+    def _pending(self):
+        done = self.ready | self.failed | self.waiting.keys()
+        return [entry for entry in self.entries if entry.stem not in done]
+
+    def _start_ready_entries(self):
+        for entry in self._pending():
+            if self.failed.intersection(entry.after):
+                self._fail(entry, "skipped, because a script it depends on failed")
+            elif self.ready.issuperset(entry.after):
+                self._start(entry)
+
+    def _start(self, entry):
+        if entry.stem in self.core.running_scripts:
+            self._set_ready(entry, "is already running")
+            return
+
+        file_path = self.core.to_loaded_path(entry.stem)
+        if file_path is None or not self.core.run_new_file(file_path):
+            self._fail(entry, "is not a valid script")
+            return
+        if entry.stem not in self.core.running_scripts:
+            self._fail(entry, "could not be started")
+            return
+
+        if entry.ready is None:
+            self._set_ready(entry, "is now running")
+            return
+        self.message.emit(
+            "[@{}] {} is now running, waiting for it to be ready.".format(self.name, entry.stem)
+        )
+        self.waiting[entry.stem] = (entry, self._gate(entry), _t.monotonic() + entry.timeout)
+
+    def _gate(self, entry):
+        if "log" in entry.ready:
+            return _LogGate(entry.ready["log"], self.core.current_log_path, entry.stem)
+        if "port" in entry.ready:
+            return _PortGate(entry.ready.get("host", "127.0.0.1"), entry.ready["port"], self)
+        return _DelayGate(entry.ready["delay"])
+
+    def _check_gates(self):
+        now = _t.monotonic()
+        for stem, (entry, gate, deadline) in list(self.waiting.items()):
+            if gate.check():
+                self._set_ready(entry, "is ready")
+            elif stem not in self.core.running_scripts:
+                self._fail(entry, "exited before it was ready")
+            elif now >= deadline:
+                self._fail(entry, "was not ready within {:g} s".format(entry.timeout))
+            else:
+                continue
+            gate.close()
+            del self.waiting[stem]
+
+    def _set_ready(self, entry, status):
+        self.ready.add(entry.stem)
+        self.message.emit("[@{}] SUCCESS: {} {}.".format(self.name, entry.stem, status))
+
+    def _fail(self, entry, reason):
+        self.failed.add(entry.stem)
+        self.error.emit("[@{}] {} {}.".format(self.name, entry.stem, reason))
@@ -0,0 +1,263 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time as _t
+
+from tray_launcher import metrics
+
+_WRITE_SECONDS = metrics.histogram(
+    "tray_launcher_journal_write_seconds", "Time to append and fsync events to the journal"
+)
+
+
+class StateJournal:
+    """Append-only record of the scripts started by the tray launcher.
+
+    Every start, restart and exit is appended to a JSON lines file. The events are written by a
+    writer thread, which writes all events queued at once and flushes them to disk with one
+    fsync, so recording an event never blocks the event loop. A crash loses at most the events
+    not written yet. Replaying the journal yields the scripts that were running. When most of
+    the journal describes scripts that have exited, the writer thread compacts it: the scripts
+    that were running when the compaction was requested are written to a temporary file, which
+    then atomically replaces the journal. Events queued after the request are appended to the
+    compacted journal.
+    """
+
+    COMPACT_MIN_EVENTS = 256
+    STOP_TIMEOUT = 5.0
+
+    def __init__(self, path, legacy_track_file=None):
+        """Create a StateJournal instance.
+
+        Args:
+            path: Path, the journal file.
+            legacy_track_file: Path, the "pid create_time stem" track file written by older
+                versions. Its entries are moved to the journal if the journal does not exist yet.
+        """
+        self.path = path
+        self.live = {}
+        # Lines in the journal file, including those queued. Guarded by _lock.
+        self.events = 0
+        self._lock = threading.Lock()
+        self._compacting = False
+        self._closed = False
+        # Encoded events (bytes), running scripts to compact the journal to (dict), or None to
+        # stop the writer.
+        self._queue = queue.Queue()
+
+        if not path.exists() and legacy_track_file is not None and legacy_track_file.exists():
+            self._migrate(legacy_track_file)
+        torn = self._replay()
+        self._file = open(self.path, "ab")
+        if torn:
+            # Ends the line cut short by a crash, so the next event starts on a line of its own.
+            self._file.write(b"\n")
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+        # Writes the events still queued when the interpreter exits.
+        atexit.register(self.close)
+
+    def entries(self):
+        """Returns the entries of the scripts that were running, as dicts with the keys "pid",
+        "create_time", "key" (the timestamp of the ChildScript), "stem", "log" (the path of
+        the log when the script started, or None) and "capture" (the pid and creation time of
+        its capture process, or None).
+        """
+        return [dict(entry) for entry in self.live.values()]
+
+    def record_start(self, child, restart=False):
+        """Records that a script started.
+
+        Args:
+            child: ChildScript, the script.
+            restart: bool, whether the script was started again after it exited or was
+                terminated.
+        """
+        entry = {
+            "pid": child.child_script_PID,
+            "create_time": child.create_time,
+            "key": child.timestamp,
+            "stem": child.script_path.stem,
+            "log": None if child.log_path is None else str(child.log_path),
+            "capture": None if child.capture_process is None else list(child.capture_process),
+        }
+        # Updated first, so a compaction requested by this event keeps the script.
+        self.live[child.timestamp] = entry
+        self._append([dict(entry, event="restart" if restart else "start")])
+
+    def record_exit(self, key):
+        """Records that the script with the given timestamp exited or was terminated."""
+        self.record_exits([key])
+
+    def record_exits(self, keys):
+        """Records that scripts exited or were terminated, with a single write to disk."""
+        self._append(
+            [{"event": "exit", "key": key} for key in keys if self.live.pop(key, None) is not None]
+        )
+
+    def close(self):
+        """Writes the queued events and stops the writer. Events recorded afterwards are lost."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(None)
+        self._thread.join(self.STOP_TIMEOUT)
+
+    def _append(self, events):
+        if not events or self._closed:
+            return
+        now = _t.time()
+        self._queue.put(
+            "".join(
+                json.dumps(dict(event, time=now), ensure_ascii=False) + "\n" for event in events
+            ).encode("utf-8")
+        )
+        with self._lock:
+            self.events += len(events)
+            compact = not self._compacting and self.events >= max(
+                self.COMPACT_MIN_EVENTS, 4 * len(self.live)
+            )
+            if compact:
+                self._compacting = True
+                self.events = len(self.live)
+        if compact:
+            self._queue.put(dict(self.live))
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            data = []
+            for item in batch:
+                if isinstance(item, bytes):
+                    data.append(item)
+                    continue
+                self._write(b"".join(data))
+                data = []
+                if item is None:
+                    self._file.close()
+                    return
+                self._compact(item)
+            self._write(b"".join(data))
+
+    def _write(self, data):
+        if not data:
+            return
+        try:
+            with _WRITE_SECONDS.time():
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        except (OSError, ValueError) as err:
+            logging.error("{}: Failed to write to {}.".format(err, self.path))
+
+    def _replay(self):
+        """Replays the journal, and returns True if its last line is incomplete."""
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return False
+        line = "\n"
+        with f:
+            for number, line in enumerate(f, 1):
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    # A line cut short by a crash, or written by a newer version.
+                    logging.warning("Skipped line {} of {}.".format(number, self.path))
+                self.events += 1
+        return not line.endswith("\n")
+
+    def _apply(self, event):
+        # Journals written before keys were recorded use the creation time as the key.
+        key = float(event.get("key", event.get("create_time")))
+        if event["event"] in ("start", "restart"):
+            self.live[key] = {
+                "pid": int(event["pid"]),
+                "create_time": float(event["create_time"]),
+                "key": key,
+                "stem": str(event["stem"]),
+                "log": event.get("log"),
+                "capture": event.get("capture"),
+            }
+        elif event["event"] == "exit":
+            self.live.pop(key, None)
+
+    def _migrate(self, track_file):
+        try:
+            with open(track_file) as f:
+                lines = f.read().splitlines()
+        except OSError as err:
+            logging.error("{}: Failed to read {}.".format(err, track_file))
+            return
+        for line in lines:
+            fields = line.split(" ", 2)
+            try:
+                pid, create_time, stem = int(fields[0]), float(fields[1]), fields[2]
+            except (ValueError, IndexError):
+                continue
+            self.live[create_time] = {
+                "pid": pid,
+                "create_time": create_time,
+                "key": create_time,
+                "stem": stem,
+                "log": None,
+                "capture": None,
+            }
+        self._write_compacted(dict(self.live))
+        count = len(self.live)
+        self.live.clear()
+        try:
+            os.replace(track_file, track_file.with_name(track_file.name + ".migrated"))
+        except OSError as err:
+            logging.error("{}: Failed to rename {}.".format(err, track_file))
+        logging.info("Moved {} tracked scripts from {} to the journal.".format(count, track_file))
+
+    def _compact(self, live):
+        """Replaces the journal with one holding only the running scripts. Called by the writer
+        thread, once the events recorded before live was taken have been written.
+        """
+        try:
+            temporary_path = self._write_compacted(live, replace=False)
+            if temporary_path is None:
+                return
+            # Windows cannot replace a file that is open.
+            self._file.close()
+            try:
+                os.replace(temporary_path, self.path)
+            finally:
+                self._file = open(self.path, "ab")
+        except OSError as err:
+            logging.error("{}: Failed to compact {}.".format(err, self.path))
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _write_compacted(self, live, replace=True):
+        """Writes the live entries to a temporary file and, if replace is True, atomically
+        replaces the journal with it.
+
+        Returns:
+            Path, the temporary file if replace is False, otherwise None.
+        """
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                for entry in live.values():
+                    f.write(json.dumps(dict(entry, event="start"), ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if not replace:
+                return temporary_path
+            os.replace(temporary_path, self.path)
+        except OSError as err:
+            logging.error("{}: Failed to write {}.".format(err, temporary_path))
+        return None
@@ -0,0 +1,217 @@
+"""Restarts scripts that exit, according to their restart policy in
+~/.tray_launcher/restart.json:
+
+    {
+        "default": {"policy": "never"},
+        "daq_server": {"policy": "always", "backoff": 1, "max_backoff": 60,
+                       "max_restarts": 5, "window": 600}
+    }
+
+"policy" is "never", "on-failure" (restart after a non-zero exit code) or "always". Restarts are
+delayed by an exponential backoff with jitter, starting at "backoff" seconds and doubling with
+every restart in the last "window" seconds, up to "max_backoff". A script that needs more than
+"max_restarts" restarts within the window is in a crash loop and is parked: it is not restarted
+again until it is started by hand.
+"""
+
+import json
+import logging
+import random
+import time as _t
+from collections import deque
+
+from PyQt5.QtCore import QObject, QTimer
+
+POLICIES = ("never", "on-failure", "always")
+
+
+class RestartPolicy:
+    DEFAULTS = {
+        "policy": "never",
+        "backoff": 1.0,
+        "max_backoff": 60.0,
+        "max_restarts": 5,
+        "window": 600.0,
+    }
+
+    def __init__(self, settings):
+        """Create a RestartPolicy instance.
+
+        Args:
+            settings: dict, the settings of the script in the restart configuration.
+
+        Raises:
+            ValueError: if the settings are not valid.
+        """
+        settings = dict(self.DEFAULTS, **settings)
+        self.policy = settings["policy"]
+        if self.policy not in POLICIES:
+            raise ValueError("{} is not a restart policy".format(self.policy))
+        self.backoff = float(settings["backoff"])
+        self.max_backoff = float(settings["max_backoff"])
+        self.max_restarts = int(settings["max_restarts"])
+        self.window = float(settings["window"])
+
+    def should_restart(self, returncode):
+        """Checks if a script that exited with returncode is restarted. An unknown exit code
+        (None, e.g. for scripts reattached after the tray launcher restarted) counts as a failure.
+        """
+        if self.policy == "always":
+            return True
+        return self.policy == "on-failure" and returncode != 0
+
+    def delay(self, restarts):
+        """Returns the seconds to wait before a restart, given the number of restarts in the
+        window. Half of the delay is random, so scripts that crashed together do not all
+        restart at the same moment.
+        """
+        delay = min(self.backoff * 2**restarts, self.max_backoff)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+def load_policy(path, stem):
+    """Returns the RestartPolicy of a script, falling back to the "default" entry. An invalid
+    configuration is logged, and the script is then never restarted.
+
+    Args:
+        path: Path, the restart configuration file.
+        stem: str, the stem of the script.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return RestartPolicy(config.get(stem, config.get("default", {})))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError, AttributeError) as err:
+        logging.error("{}: Invalid restart configuration {}.".format(err, path))
+    return RestartPolicy({})
+
+
+class _ScriptState:
+    def __init__(self):
+        self.restarts = deque()
+        self.returncode = None
+        self.timer = None
+        self.restart_at = None
+        self.parked = False
+
+
+class Supervisor(QObject):
+    """Schedules restarts of exited scripts on Qt timers and detects crash loops."""
+
+    def __init__(self, config_path, start_script, parent=None):
+        """Create a Supervisor instance.
+
+        Args:
+            config_path: Path, the restart configuration file. It is read whenever a script
+                exits, so changes apply without restarting the tray launcher.
+            start_script: callable taking the Path of a script and starting it. It returns
+                False if the script was not started since it is already running.
+            parent: QObject, the parent of the supervisor.
+        """
+        super().__init__(parent)
+
+        self.config_path = config_path
+        self.start_script = start_script
+        self.states = {}
+        self._restarting = False
+
+    def script_exited(self, script_path, returncode):
+        """Schedules a restart of a script that exited by itself, if its policy asks for it.
+
+        Args:
+            script_path: Path, the path to the script.
+            returncode: int, the exit code of the script, or None if it is unknown.
+        """
+        stem = script_path.stem
+        policy = load_policy(self.config_path, stem)
+        state = self.states.setdefault(stem, _ScriptState())
+        state.returncode = returncode
+        if not policy.should_restart(returncode):
+            return
+
+        now = _t.monotonic()
+        while state.restarts and state.restarts[0] < now - policy.window:
+            state.restarts.popleft()
+        if len(state.restarts) >= policy.max_restarts:
+            state.parked = True
+            logging.error(
+                "{} exited {} times within {:g} s and is no longer restarted.".format(
+                    stem, len(state.restarts) + 1, policy.window
+                )
+            )
+            return
+
+        delay = policy.delay(len(state.restarts))
+        state.restart_at = now + delay
+        state.timer = QTimer(self)
+        state.timer.setSingleShot(True)
+        state.timer.timeout.connect(lambda: self._restart(script_path))
+        state.timer.start(int(delay * 1000))
+        logging.info(
+            "{} exited with code {}. Restarting it in {:.1f} s.".format(stem, returncode, delay)
+        )
+
+    def script_started(self, stem):
+        """Called whenever a script is started. A script started by hand is no longer parked
+        and any restart scheduled for it is cancelled.
+        """
+        if self._restarting:
+            return
+        state = self.states.pop(stem, None)
+        if state is not None and state.timer is not None:
+            state.timer.stop()
+            state.timer.deleteLater()
+
+    def status(self, running):
+        """Returns the supervision state of scripts.
+
+        Args:
+            running: iterable of str, the stems of the running scripts.
+
+        Returns:
+            list of (str, str, str, int, int or None), the stem, state, restart policy,
+                restarts in the current window, and last exit code of every script that is
+                running or has exited.
+        """
+        rows = []
+        now = _t.monotonic()
+        for stem in dict.fromkeys(list(running) + list(self.states)):
+            policy = load_policy(self.config_path, stem)
+            state = self.states.get(stem, _ScriptState())
+            if stem in running:
+                description = "running"
+            elif state.parked:
+                description = "parked (crash loop)"
+            elif state.timer is not None and state.timer.isActive():
+                description = "restarting in {:.1f} s".format(max(state.restart_at - now, 0))
+            else:
+                description = "exited"
+            restarts = sum(1 for t in state.restarts if t >= now - policy.window)
+            rows.append((stem, description, policy.policy, restarts, state.returncode))
+        return rows
+
+    def _restart(self, script_path):
+        state = self.states.get(script_path.stem)
+        if state is not None and state.timer is not None:
+            state.timer.deleteLater()
+            state.timer = None
+        self._restarting = True
+        try:
+            started = self.start_script(script_path)
+        except Exception as err:
+            logging.error("{}: Failed to restart {}.".format(err, script_path.stem))
+            return
+        finally:
+            self._restarting = False
+        if not started:
+            logging.info(
+                "{} was not restarted by the supervisor, it is already running.".format(
+                    script_path.stem
+                )
+            )
+            return
+        if state is not None:
+            state.restarts.append(_t.monotonic())
+        logging.info("{} was restarted by the supervisor.".format(script_path.stem))
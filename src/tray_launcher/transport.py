@@ -0,0 +1,145 @@
+r"""Addresses of the control channel, and the client side of its transports.
+
+The launcher listens on a local socket by default: a Unix domain socket at
+~/.tray_launcher/control.sock, or the named pipe \\.\pipe\tray_launcher-<user> on Windows.
+Only the user running the launcher can connect to it. TCP on 127.0.0.1:<TRAY_LAUNCHER_PORT> is
+used instead if the environment variable TRAY_LAUNCHER_TRANSPORT is "tcp", or if the local
+socket cannot be created. Clients try the local socket first and fall back to TCP.
+
+This module only uses the standard library so that clients do not need to import Qt. The
+server side is control_server.ControlServer.
+"""
+
+import errno
+import os
+import socket
+import time as _t
+
+LOCAL = "local"
+TCP = "tcp"
+TRANSPORTS = (LOCAL, TCP)
+
+DEFAULT_PORT = 7686
+
+# Whether the local socket is a named pipe (Windows) rather than a Unix domain socket.
+LOCAL_IS_PIPE = os.name == "nt"
+
+# Windows error raised while all instances of a named pipe are connected to other clients.
+_ERROR_PIPE_BUSY = 231
+_PIPE_BUSY_RETRY_S = 0.002
+
+
+def transport():
+    """Returns the transport selected with the environment variable TRAY_LAUNCHER_TRANSPORT,
+    LOCAL (the default) or TCP.
+    """
+    selected = os.environ.get("TRAY_LAUNCHER_TRANSPORT", LOCAL).strip().lower()
+    return selected if selected in TRANSPORTS else LOCAL
+
+
+def tcp_address():
+    """Returns the (host, port) of the TCP transport."""
+    return ("127.0.0.1", int(os.environ.get("TRAY_LAUNCHER_PORT", DEFAULT_PORT)))
+
+
+def local_name():
+    """Returns the name QLocalServer listens on: the path of the Unix domain socket, or the
+    name of the named pipe on Windows.
+    """
+    if LOCAL_IS_PIPE:
+        # Imported here, since importing getpass is slow and it is only needed on Windows.
+        import getpass
+
+        return "tray_launcher-" + getpass.getuser()
+    # os.path instead of pathlib, which would add to the start-up time of every command.
+    return os.path.join(os.path.expanduser("~"), ".tray_launcher", "control.sock")
+
+
+def connect(timeout):
+    """Connects to the launcher, over the local socket unless TCP is selected, and over TCP
+    if the local socket is not available.
+
+    Args:
+        timeout: float, timeout in seconds of connecting and of every read.
+
+    Returns:
+        socket.socket or PipeConnection, the connection.
+
+    Raises:
+        OSError: if the launcher cannot be reached.
+    """
+    if transport() == LOCAL:
+        try:
+            return connect_local(timeout)
+        except OSError:
+            pass
+    return socket.create_connection(tcp_address(), timeout=timeout)
+
+
+def connect_local(timeout):
+    """Connects to the local socket of the launcher.
+
+    Raises:
+        OSError: if the launcher does not listen on a local socket.
+    """
+    if LOCAL_IS_PIPE:
+        return PipeConnection.open("\\\\.\\pipe\\" + local_name(), timeout)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # Connecting in blocking mode waits while the backlog of the socket is full, where a
+        # socket with a timeout would fail at once.
+        client.connect(local_name())
+    except OSError:
+        client.close()
+        raise
+    client.settimeout(timeout)
+    return client
+
+
+class PipeConnection:
+    """The client end of a named pipe, with the methods of a socket that the client uses.
+
+    Reads from a named pipe opened with the standard library cannot time out, so
+    settimeout() only applies to waiting for a free pipe instance.
+    """
+
+    def __init__(self, file):
+        self._file = file
+
+    @classmethod
+    def open(cls, path, timeout):
+        deadline = _t.monotonic() + timeout
+        while True:
+            try:
+                return cls(open(path, "r+b", buffering=0))
+            except OSError as err:
+                busy = getattr(err, "winerror", None) == _ERROR_PIPE_BUSY
+                if not busy or _t.monotonic() > deadline:
+                    raise
+            _t.sleep(_PIPE_BUSY_RETRY_S)
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, data):
+        view = memoryview(data)
+        while view:
+            written = self._file.write(view)
+            if not written:
+                raise OSError(errno.EPIPE, "The pipe was closed.")
+            view = view[written:]
+
+    def recv(self, size):
+        try:
+            return self._file.read(size) or b""
+        except BrokenPipeError:
+            return b""
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,80 +1,76 @@
-import os
+from tray_launcher import protocol, transport
 
-from PyQt5.QtCore import QDataStream, QIODevice, QObject
-from PyQt5.QtNetwork import QTcpSocket
 
+class TrayLauncherClient:
+    """Sends one command to the tray launcher and prints its response.
 
-class TrayLauncherClient(QObject):
-    def __init__(self, command, data):
+    Only the standard library is used, so a command does not pay for importing Qt.
+    """
+
+    TIMEOUT_S = 30.0
+    RECEIVE_SIZE = 65536
+
+    def __init__(self, command, data, stream=False):
         """Initiate the client.
 
         Args:
             command: str
             data: str
+            stream: bool, whether the response is streamed until the user interrupts it,
+                in which case there is no timeout.
         """
-        super().__init__()
-
-        self.blockSize = 0
-
-        self.client = QTcpSocket(self)
+        self.decoder = protocol.FrameDecoder()
 
         self.command = command
         self.data = data
+        self.stream = stream
 
     @classmethod
     def check_connection(cls):
-        """Attempts to connect to the tray launcher TCP server
+        """Attempts to connect to the tray launcher server
         to check if there is already one tray launcher instance running
         """
-        instance = cls("test", "empty")
-        instance.client.connectToHost(
-            "127.0.0.1", int(os.environ.get("TRAY_LAUNCHER_PORT", 7686)), QIODevice.ReadWrite
-        )
-        success_connect = instance.client.waitForConnected()
-
-        if not success_connect:
+        instance = cls("test", ["empty"])
+        try:
+            with transport.connect(cls.TIMEOUT_S) as client:
+                client.sendall(protocol.encode_request(instance.command, instance.data))
+                while client.recv(cls.RECEIVE_SIZE):
+                    pass
+            return True
+        except OSError:
             return False
-        else:
-            try:
-                instance.client.write(bytes(instance.command + "\n", encoding="ascii"))
-                instance.client.write(bytes((instance.data + "\n"), encoding="ascii"))
-                instance.client.waitForDisconnected()
-                return True
-            except Exception:
-                return False
 
     def attempt_connect(self):
         """Connects to the tray launcher server."""
-        self.client.connectToHost(
-            "127.0.0.1", int(os.environ.get("TRAY_LAUNCHER_PORT", 7686)), QIODevice.ReadWrite
-        )
-        success_connect = self.client.waitForConnected()
-
-        if not success_connect:
+        try:
+            client = transport.connect(self.TIMEOUT_S)
+        except OSError:
             print(
                 (
                     "Failed to connect to the launcher server. Run tray launcher first,"
-                    " and check if the port supposedly used by the tray launcher is occupied."
+                    " and check that TRAY_LAUNCHER_TRANSPORT and TRAY_LAUNCHER_PORT are the same"
+                    " as for the tray launcher."
                 )
             )
             return
 
-        self.client.readyRead.connect(self.read_from_server)
-
-        self.client.write(bytes(self.command + "\n", encoding="ascii"))
-
-        for entry in self.data:
-            self.client.write(bytes((entry + "\n"), encoding="ascii"))
-
-        self.client.waitForDisconnected()
-
-    def read_from_server(self):
-        instr = QDataStream(self.client)
-        instr.setVersion(QDataStream.Qt_5_0)
-        if self.blockSize == 0:
-            if self.client.bytesAvailable() < 2:
-                return
-            self.blockSize = instr.readUInt16()
-        if self.client.bytesAvailable() < self.blockSize:
-            return
-        print(str(instr.readString(), encoding="ascii"))
+        with client:
+            if self.stream:
+                client.settimeout(None)
+            try:
+                client.sendall(protocol.encode_request(self.command, self.data))
+                while True:
+                    received = client.recv(self.RECEIVE_SIZE)
+                    if not received:
+                        return
+                    self.read_from_server(received)
+            except KeyboardInterrupt:
+                pass
+            except OSError as err:
+                print("The connection to the launcher server was lost: {}".format(err))
+
+    def read_from_server(self, received):
+        """Prints every message of the response as soon as its frame is complete."""
+        for frame_type, payload in self.decoder.feed(received):
+            if frame_type == protocol.FRAME_DATA:
+                print(payload.decode(protocol.ENCODING), flush=True)
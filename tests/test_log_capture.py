@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import time as _t
+from pathlib import Path
+
+import psutil as _ps
+
+from tray_launcher import log_capture
+
+SRC = Path(log_capture.__file__).resolve().parent.parent
+
+# Starts a script whose output goes to a capture process, prints the pid of the script and
+# exits without waiting for it, like a launcher that quits while its scripts keep running.
+LAUNCHER = """
+import subprocess, sys
+from pathlib import Path
+from tray_launcher import log_capture
+
+capture = log_capture.CaptureProcess(Path(sys.argv[1]), int(sys.argv[2]))
+script = subprocess.Popen(
+    [sys.executable, "-c", sys.argv[3]],
+    stdout=capture.pipe,
+    stderr=subprocess.STDOUT,
+    start_new_session=True,
+)
+capture.close_pipe()
+print(script.pid, flush=True)
+"""
+
+SCRIPT = """
+import time
+for i in range(20):
+    print("line", i, flush=True)
+    time.sleep(0.05)
+"""
+
+
+def run_launcher(first_segment, max_segment_size):
+    """Runs LAUNCHER until it exits, and returns the psutil.Process of its script."""
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [str(SRC)] + [p for p in [os.environ.get("PYTHONPATH")] if p]
+    )
+    launcher = subprocess.run(
+        [sys.executable, "-c", LAUNCHER, str(first_segment), str(max_segment_size), SCRIPT],
+        stdout=subprocess.PIPE,
+        env=environment,
+        check=True,
+        timeout=30,
+    )
+    return _ps.Process(int(launcher.stdout))
+
+
+def wait_for_lines(first_segment, count, timeout=10.0):
+    """Returns the lines of all uncompressed segments once there are count of them."""
+    deadline = _t.monotonic() + timeout
+    while True:
+        segments = sorted(first_segment.parent.glob(first_segment.stem + "*.log"))
+        lines = b"".join(segment.read_bytes() for segment in segments).splitlines()
+        if len(lines) >= count or _t.monotonic() > deadline:
+            return lines
+        _t.sleep(0.05)
+
+
+def test_script_keeps_logging_after_the_launcher_exits(tmp_path):
+    first_segment = tmp_path / "writer-00_00_00.log"
+    script = run_launcher(first_segment, 1 << 20)
+
+    # The launcher has exited; the script must neither be killed by a broken pipe, nor lose
+    # the output it writes afterwards.
+    script.wait(timeout=10)
+    lines = wait_for_lines(first_segment, 20)
+    assert lines == [b"line %d" % i for i in range(20)]
+
+
+def test_log_rotates_after_the_launcher_exits(tmp_path):
+    first_segment = tmp_path / "writer-00_00_00.log"
+    script = run_launcher(first_segment, 64)
+
+    script.wait(timeout=10)
+    deadline = _t.monotonic() + 10
+    while not first_segment.with_suffix(".manifest.json").exists():
+        assert _t.monotonic() < deadline
+        _t.sleep(0.05)
+    latest = log_capture.latest_segment(first_segment)
+    assert latest != first_segment
+    assert latest.read_bytes().endswith(b"line 19\n")
@@ -0,0 +1,94 @@
+from tray_launcher.process_inventory import FakeBackend, ProcessInventory
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_inventory(records):
+    clock = Clock()
+    backend = FakeBackend(records)
+    return ProcessInventory(backend, ttl=0.5, clock=clock), backend, clock
+
+
+# 10 (created at 1.0) started 11 and 12, and 11 started 13. 20 is unrelated.
+RECORDS = [(10, 1, 1.0), (11, 10, 2.0), (12, 10, 3.0), (13, 11, 4.0), (20, 1, 5.0)]
+
+
+def test_descendants_are_breadth_first():
+    inventory, _, _ = make_inventory(RECORDS)
+    snapshot = inventory.snapshot()
+    assert snapshot.children(10) == [11, 12]
+    assert snapshot.descendants(10) == [11, 12, 13]
+    assert snapshot.descendants(13) == []
+    assert inventory.descendants(11) == [13]
+
+
+def test_tree_includes_the_root():
+    inventory, _, _ = make_inventory(RECORDS)
+    assert inventory.snapshot().tree(10, 1.0) == [10, 11, 12, 13]
+
+
+def test_tree_after_the_root_exited():
+    inventory, backend, _ = make_inventory(RECORDS)
+    backend.remove(10)
+    # Windows does not reparent orphaned processes.
+    assert inventory.refresh().tree(10, 1.0) == [11, 12, 13]
+
+
+def test_tree_of_a_reused_pid_is_empty():
+    inventory, backend, _ = make_inventory(RECORDS)
+    backend.add(10, 1, 50.0)
+    snapshot = inventory.refresh()
+    assert snapshot.exists(10)
+    assert not snapshot.exists(10, 1.0)
+    assert snapshot.tree(10, 1.0) == []
+
+
+def test_tree_skips_children_older_than_the_root():
+    # The root exited and its pid was not reused, but an older process has it as parent pid.
+    inventory, _, _ = make_inventory([(30, 1, 10.0), (31, 10, 5.0), (32, 10, 12.0)])
+    assert inventory.snapshot().tree(10, 8.0) == [32]
+
+
+def test_tree_of_a_cycle_terminates():
+    inventory, _, _ = make_inventory([(40, 41, 1.0), (41, 40, 2.0)])
+    assert inventory.snapshot().tree(40, 1.0) == [40, 41]
+
+
+def test_snapshot_is_reused_within_the_ttl():
+    inventory, backend, clock = make_inventory(RECORDS)
+    first = inventory.snapshot()
+    clock.now += 0.4
+    assert inventory.snapshot() is first
+    assert inventory.children(10) == [11, 12]
+    assert backend.reads == 1
+
+    clock.now += 0.2
+    assert inventory.snapshot() is not first
+    assert backend.reads == 2
+
+
+def test_max_age_and_refresh():
+    inventory, backend, clock = make_inventory(RECORDS)
+    first = inventory.snapshot()
+    clock.now += 0.1
+    assert inventory.snapshot(max_age=1.0) is first
+    assert inventory.snapshot(max_age=0.05) is not first
+    inventory.refresh()
+    assert backend.reads == 3
+
+
+def test_invalidate_reads_the_table_again():
+    inventory, backend, _ = make_inventory(RECORDS)
+    assert inventory.children(11) == [13]
+    backend.add(14, 11, 6.0)
+    assert inventory.children(11) == [13]
+
+    inventory.invalidate()
+    assert inventory.children(11) == [13, 14]
+    assert backend.reads == 2
@@ -0,0 +1,134 @@
+import os
+import subprocess
+import sys
+import time as _t
+
+import psutil as _ps
+import pytest
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer
+
+from tray_launcher.process_inventory import ProcessInventory
+from tray_launcher.process_terminator import PosixBackend, ProcessTerminator, TerminationBatch
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="uses the POSIX backend and sh")
+
+# A script that started two processes and waits for them.
+TREE = "sleep 30 & sleep 30 & wait"
+# The same, but the shell then ignores SIGTERM, so it has to be killed.
+STUBBORN_TREE = 'sleep 30 & sleep 30 & trap "" TERM; while true; do sleep 0.1; done'
+
+# Started with sh -c, so the shell is replaced by python.
+ZOMBIE_PARENT = (
+    "exec {} -c 'import signal, subprocess, time; "
+    "signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+    'child = subprocess.Popen(["sleep", "30"], '
+    "preexec_fn=lambda: signal.signal(signal.SIGTERM, signal.SIG_DFL)); "
+    "time.sleep(30)'".format(sys.executable)
+)
+
+
+@pytest.fixture
+def terminator():
+    terminator = ProcessTerminator(ProcessInventory(), PosixBackend(), grace_period=0.5)
+    yield terminator
+    terminator.pool.shutdown(wait=True)
+
+
+@pytest.fixture
+def spawn():
+    """Starts sh -c command, and returns (pid, create_time) once it has started count
+    children. Processes that are left over are killed after the test.
+    """
+    started = []
+
+    def spawn(command, count=2):
+        process = subprocess.Popen(["sh", "-c", command])
+        started.append(process)
+        root = _ps.Process(process.pid)
+        deadline = _t.monotonic() + 5
+        while len(root.children()) < count:
+            assert _t.monotonic() < deadline, "the tree did not start"
+            _t.sleep(0.01)
+        return process.pid, root.create_time()
+
+    yield spawn
+    for process in started:
+        try:
+            for child in _ps.Process(process.pid).children(recursive=True):
+                child.kill()
+        except _ps.Error:
+            pass
+        process.kill()
+        process.wait()
+
+
+def test_tree_exits_within_the_grace_period(terminator, spawn):
+    pid, create_time = spawn(TREE)
+    children = [p.pid for p in _ps.Process(pid).children()]
+
+    started = _t.monotonic()
+    result = terminator.submit([(pid, create_time)])[0].result(timeout=10)
+
+    assert _t.monotonic() - started < 0.5
+    assert result.pid == pid
+    assert sorted(result.graceful) == sorted([pid] + children)
+    assert result.killed == [] and result.survivors == []
+
+
+def test_survivors_are_killed_after_the_grace_period(terminator, spawn):
+    pid, create_time = spawn(STUBBORN_TREE)
+    sleeps = [p.pid for p in _ps.Process(pid).children() if p.cmdline() == ["sleep", "30"]]
+
+    started = _t.monotonic()
+    result = terminator.submit([(pid, create_time)])[0].result(timeout=10)
+
+    assert _t.monotonic() - started >= 0.5
+    assert result.killed == [pid]
+    assert len(sleeps) == 2 and set(sleeps) <= set(result.graceful)
+    assert result.survivors == []
+
+
+def test_zombies_count_as_exited(terminator, spawn):
+    # The root ignores SIGTERM and never waits for its child, so the child stays a zombie
+    # until the root is killed.
+    pid, create_time = spawn(ZOMBIE_PARENT, count=1)
+    child = _ps.Process(pid).children()[0].pid
+
+    result = terminator.submit([(pid, create_time)])[0].result(timeout=10)
+
+    assert result.graceful == [child]
+    assert result.killed == [pid]
+
+
+def test_a_reused_pid_is_not_terminated(terminator, spawn):
+    pid, create_time = spawn(TREE)
+
+    result = terminator.submit([(pid, create_time - 1)])[0].result(timeout=10)
+
+    assert result == (pid, [], [], [])
+    assert _ps.Process(pid).status() != _ps.STATUS_ZOMBIE
+
+
+def test_termination_batch_reports_every_tree():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    assert app is not None
+
+    terminator = ProcessTerminator(ProcessInventory(), PosixBackend(), grace_period=0.5)
+    processes = [subprocess.Popen(["sleep", "30"]) for _ in range(3)]
+    roots = [(p.pid, _ps.Process(p.pid).create_time()) for p in processes]
+    futures = terminator.submit(roots)
+    futures[0].result(timeout=10)
+
+    batch = TerminationBatch(dict(zip(["a", "b", "c"], futures)))
+    reported = []
+    batch.terminated.connect(lambda label, result: reported.append((label, result.pid)))
+    loop = QEventLoop()
+    batch.finished.connect(loop.quit)
+    QTimer.singleShot(10000, loop.quit)
+    loop.exec_()
+
+    # The future that was already done is reported too, after the signals were connected.
+    assert sorted(reported) == [("a", roots[0][0]), ("b", roots[1][0]), ("c", roots[2][0])]
+    for process in processes:
+        process.wait(timeout=5)
+    terminator.pool.shutdown(wait=True)
@@ -0,0 +1,44 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+from tray_launcher.state_journal import StateJournal
+
+
+def child(pid):
+    return SimpleNamespace(
+        child_script_PID=pid,
+        create_time=float(pid),
+        timestamp=float(pid),
+        script_path=Path("script_{}.py".format(pid)),
+        log_path=None,
+        capture_process=(pid + 1, 2.0),
+    )
+
+
+def test_replay_after_close(tmp_path):
+    journal = StateJournal(tmp_path / "journal.jsonl")
+    for pid in range(1, 4):
+        journal.record_start(child(pid))
+    journal.record_exit(2.0)
+    journal.close()
+
+    replayed = StateJournal(tmp_path / "journal.jsonl")
+    assert sorted(entry["pid"] for entry in replayed.entries()) == [1, 3]
+    assert replayed.entries()[0]["capture"] == [2, 2.0]
+    replayed.close()
+
+
+def test_compaction_keeps_running_scripts(tmp_path):
+    journal = StateJournal(tmp_path / "journal.jsonl")
+    journal.COMPACT_MIN_EVENTS = 8
+    for pid in range(1, 200):
+        journal.record_start(child(pid))
+        if pid % 3:
+            journal.record_exit(float(pid))
+    journal.close()
+
+    replayed = StateJournal(tmp_path / "journal.jsonl")
+    assert sorted(replayed.live) == sorted(journal.live)
+    lines = (tmp_path / "journal.jsonl").read_bytes().count(b"\n")
+    assert lines == replayed.events < 199 + 133
+    replayed.close()
@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from tray_launcher.supervisor import Supervisor
+
+SCRIPT = Path("daq_server.bat")
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "restart.json"
+    path.write_text(json.dumps({"default": {"policy": "always", "backoff": 60}}))
+    return path
+
+
+def restart_now(supervisor):
+    """Runs the scheduled restart of SCRIPT without waiting for its timer."""
+    state = supervisor.states[SCRIPT.stem]
+    state.timer.stop()
+    supervisor._restart(SCRIPT)
+    return state
+
+
+def test_a_restart_is_counted(config, caplog):
+    started = []
+    supervisor = Supervisor(config, lambda path: started.append(path) or True)
+    supervisor.script_exited(SCRIPT, 1)
+    assert supervisor.status([])[0][3] == 0
+
+    with caplog.at_level("INFO"):
+        restart_now(supervisor)
+
+    assert started == [SCRIPT]
+    assert supervisor.status([SCRIPT.stem])[0][:4] == ("daq_server", "running", "always", 1)
+    assert "daq_server was restarted by the supervisor." in caplog.messages
+
+
+def test_a_script_that_is_already_running_is_not_counted(config, caplog):
+    supervisor = Supervisor(config, lambda path: False)
+    supervisor.script_exited(SCRIPT, 1)
+
+    with caplog.at_level("INFO"):
+        restart_now(supervisor)
+
+    assert supervisor.status([SCRIPT.stem])[0][3] == 0
+    assert "daq_server was restarted by the supervisor." not in caplog.messages
+    assert "daq_server was not restarted by the supervisor, it is already running." in (
+        caplog.messages
+    )